@@ -0,0 +1,134 @@
+# conversions.py
+"""
+Per-conversion attribution written to the `conversions` table.
+
+Journeys are sorted and cut once; every configured rule-based model then runs
+over the same arrays, and the (journey, campaign) pairs are found once and
+shared by all of them. Each model's row credits are summed into those pairs
+with one bincount. The rows of every model and chunk go to the database in a
+single COPY into a staging table. In the same transaction the window's earlier
+credits of those models are deleted and the new ones merged, so re-running a
+window replaces its credits, including campaigns that no longer get any.
+
+    python -m attribution.conversions --start 2024-01-01 --models first_touch last_touch linear
+"""
+import argparse
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from attribution.models import ATTRIBUTION_MODELS, Journeys, build_journeys, complete_journeys
+from database.connection import bump_table_versions, db_manager
+from etl.extractors.extract import stream_user_touchpoints
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CONVERSION_COLUMNS = ['user_id', 'conversion_timestamp', 'conversion_type', 'attributed_campaign_id',
+                      'attribution_model', 'credit']
+
+CONVERSIONS_UPSERT = """(user_id, conversion_timestamp, conversion_type, attribution_model,
+attributed_campaign_id) DO UPDATE SET credit = EXCLUDED.credit"""
+
+# every conversion of the window's journeys is timestamped inside the window
+CONVERSIONS_REPLACED = """
+DELETE FROM conversions
+WHERE attribution_model = ANY(%s)
+  AND conversion_type = %s
+  AND conversion_timestamp >= COALESCE(%s, '-infinity'::timestamp)
+  AND conversion_timestamp < COALESCE(%s, 'infinity'::timestamp)
+"""
+
+
+def _check_models(models: Optional[Iterable[str]]) -> list:
+    models = list(models or ATTRIBUTION_MODELS)
+    unsupported = [model for model in models if model not in ATTRIBUTION_MODELS]
+    if unsupported:
+        raise ValueError(f"Models {unsupported} credit channels, not conversions, and cannot be written "
+                         f"per conversion")
+    return models
+
+
+def conversion_credits(journeys: Journeys, models: Optional[Iterable[str]] = None,
+                       model_params: Optional[Dict[str, Dict]] = None,
+                       conversion_type: str = 'click') -> pd.DataFrame:
+    """
+    One row per converting journey, model and credited campaign (credit > 0),
+    in the `conversions` column layout
+    """
+    models = _check_models(models)
+    model_params = model_params or {}
+    converting = journeys.converting()
+    if converting.n_touchpoints == 0:
+        return pd.DataFrame(columns=CONVERSION_COLUMNS)
+
+    # (journey, campaign) pairs, shared by every model
+    n_channels = len(converting.channels)
+    pairs, pair_of_row = np.unique(converting.group.astype(np.int64) * n_channels + converting.channel,
+                                   return_inverse=True)
+    pair_journey, pair_channel = pairs // n_channels, pairs % n_channels
+    last_rows = converting.starts + converting.lengths - 1
+    user_ids = pd.Index(converting.user_ids)[converting.user[converting.starts]]
+    conversion_times = converting.timestamp[last_rows].view('datetime64[ns]')
+
+    frames = []
+    for model in models:
+        credit = ATTRIBUTION_MODELS[model](converting, **model_params.get(model, {}))
+        pair_credit = np.bincount(pair_of_row, weights=credit, minlength=len(pairs))
+        credited = pair_credit > 0
+        journey = pair_journey[credited]
+        frames.append(pd.DataFrame({
+            'user_id': user_ids[journey],
+            'conversion_timestamp': conversion_times[journey],
+            'conversion_type': conversion_type,
+            'attributed_campaign_id': pd.Index(converting.channels)[pair_channel[credited]],
+            'attribution_model': model,
+            'credit': pair_credit[credited],
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def attribute_conversions(chunks: Iterable[pd.DataFrame], models: Optional[Iterable[str]] = None,
+                          model_params: Optional[Dict[str, Dict]] = None,
+                          conversion_type: str = 'click') -> Iterator[pd.DataFrame]:
+    """conversion_credits of a touchpoint stream ordered by user_id, one frame per chunk of journeys"""
+    models = _check_models(models)
+    for journeys_df in complete_journeys(chunks):
+        journeys = build_journeys(journeys_df, 'campaign_id', conversion_type)
+        yield conversion_credits(journeys, models, model_params, conversion_type)
+
+
+def write_conversions(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                      models: Optional[Iterable[str]] = None, model_params: Optional[Dict[str, Dict]] = None,
+                      conversion_type: str = 'click', chunk_size: int = 50_000) -> int:
+    """
+    Attribute the journeys of touchpoints in [start, end) with every model and
+    replace the window's credits in `conversions` in one staged bulk write
+    """
+    models = _check_models(models)
+    rows = attribute_conversions(stream_user_touchpoints(start, end, chunk_size), models, model_params,
+                                 conversion_type)
+    written = db_manager.copy_insert('conversions', rows, on_conflict=CONVERSIONS_UPSERT,
+                                     before_merge=(CONVERSIONS_REPLACED, (models, conversion_type, start, end)))
+    # the window's old credits were deleted even when nothing new was written
+    bump_table_versions('conversions')
+    logger.info(f"Wrote {written} conversion credits for models {models}")
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write per-conversion attribution credits')
+    parser.add_argument('--start', type=pd.Timestamp, default=None)
+    parser.add_argument('--end', type=pd.Timestamp, default=None)
+    parser.add_argument('--models', nargs='+', default=None, choices=list(ATTRIBUTION_MODELS))
+    parser.add_argument('--conversion-type', default='click')
+    args = parser.parse_args()
+
+    try:
+        write_conversions(args.start, args.end, args.models, conversion_type=args.conversion_type)
+    except Exception as e:
+        logger.error(f"Writing conversions failed: {e}")
+        raise
@@ -0,0 +1,472 @@
+# models.py
+"""
+Rule-based multi-touch attribution over the `user_touchpoints` frame.
+
+The touchpoints are sorted once by (user_id, timestamp) and every model works on
+flat NumPy arrays using the group boundaries of each user, so there is no
+per-user Python loop or groupby().apply anywhere on the hot path.
+
+A user converts on their first `click`; touchpoints after the conversion are
+dropped and only converting journeys receive credit. The Markov and Shapley
+models also learn from the journeys that never converted.
+"""
+import logging
+from math import factorial
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NANOSECONDS_PER_DAY = 86_400 * 10 ** 9
+
+
+class Journeys:
+    """Touchpoints sorted by (user, timestamp) with NumPy group boundaries"""
+
+    def __init__(self, user: np.ndarray, channel: np.ndarray, timestamp: np.ndarray,
+                 converted: np.ndarray, user_ids: pd.Index, channels: pd.Index):
+        self.user = user              # row -> user code, grouped and ascending by timestamp
+        self.channel = channel        # row -> channel code
+        self.timestamp = timestamp    # row -> int64 epoch nanoseconds
+        self.user_ids = user_ids      # user code -> user_id
+        self.channels = channels      # channel code -> campaign_id / platform
+        self.starts = _group_starts(user)
+        self.lengths = np.diff(np.append(self.starts, len(user)))
+        self.converted = converted    # per journey, True if it ended with a conversion
+
+    @property
+    def n_touchpoints(self) -> int:
+        return len(self.user)
+
+    @property
+    def n_users(self) -> int:
+        return len(self.starts)
+
+    @property
+    def group(self) -> np.ndarray:
+        """Journey index of every row"""
+        return np.repeat(np.arange(self.n_users), self.lengths)
+
+    @property
+    def rank(self) -> np.ndarray:
+        """Position of every row inside its journey (0 = first touch)"""
+        return np.arange(self.n_touchpoints) - np.repeat(self.starts, self.lengths)
+
+    def converting(self) -> 'Journeys':
+        """Subset holding only the journeys that ended in a conversion"""
+        if self.converted.all():
+            return self
+        keep = np.repeat(self.converted, self.lengths)
+        return Journeys(self.user[keep], self.channel[keep], self.timestamp[keep],
+                        self.converted[self.converted], self.user_ids, self.channels)
+
+
+def _group_starts(codes: np.ndarray) -> np.ndarray:
+    if len(codes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1])))
+
+
+def build_journeys(touchpoints_df: pd.DataFrame, channel_column: str = 'campaign_id',
+                   conversion_type: str = 'click') -> Journeys:
+    """Sort touchpoints once by (user_id, timestamp) and cut every journey at its conversion"""
+    df = touchpoints_df.dropna(subset=['user_id', 'timestamp', channel_column])
+
+    user_codes, user_ids = pd.factorize(df['user_id'])
+    channel_codes, channels = pd.factorize(df[channel_column])
+    timestamps = pd.to_datetime(df['timestamp']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+    is_conversion = (df['touchpoints_type'] == conversion_type).to_numpy()
+    return cut_journeys(user_codes, channel_codes, timestamps, is_conversion, user_ids, channels)
+
+
+def cut_journeys(user_codes: np.ndarray, channel_codes: np.ndarray, timestamps: np.ndarray,
+                 is_conversion: np.ndarray, user_ids, channels: pd.Index,
+                 presorted: bool = False) -> Journeys:
+    """
+    Journeys from integer-coded touchpoints: sort by (user, timestamp) unless
+    `presorted`, and cut every journey at its first conversion
+    """
+    if not presorted:
+        order = np.lexsort((timestamps, user_codes))
+        user_codes = user_codes[order]
+        channel_codes = channel_codes[order]
+        timestamps = timestamps[order]
+        is_conversion = is_conversion[order]
+
+    # First conversion row of every user (n when the user never converted)
+    n = len(user_codes)
+    starts = _group_starts(user_codes)
+    lengths = np.diff(np.append(starts, n))
+    positions = np.arange(n)
+    if n:
+        first_conversion = np.minimum.reduceat(np.where(is_conversion, positions, n), starts)
+    else:
+        first_conversion = np.zeros(0, dtype=np.int64)
+
+    # Drop touchpoints that happened after the conversion
+    keep = positions <= np.repeat(first_conversion, lengths)
+    if keep.all():
+        return Journeys(user_codes, channel_codes, timestamps, first_conversion < n, user_ids, channels)
+
+    return Journeys(user_codes[keep], channel_codes[keep], timestamps[keep],
+                    first_conversion < n, user_ids, channels)
+
+
+def first_touch_credit(journeys: Journeys) -> np.ndarray:
+    """All credit to the first touchpoint of the journey"""
+    return (journeys.rank == 0).astype(np.float64)
+
+
+def last_touch_credit(journeys: Journeys) -> np.ndarray:
+    """All credit to the touchpoint that converted"""
+    return (journeys.rank == np.repeat(journeys.lengths - 1, journeys.lengths)).astype(np.float64)
+
+
+def linear_credit(journeys: Journeys) -> np.ndarray:
+    """Equal credit to every touchpoint of the journey"""
+    return np.repeat(1.0 / journeys.lengths, journeys.lengths)
+
+
+def time_decay_credit(journeys: Journeys, half_life_days: float = 7.0) -> np.ndarray:
+    """Credit halves for every `half_life_days` a touchpoint happened before the conversion"""
+    if journeys.n_touchpoints == 0:
+        return np.zeros(0)
+    conversion_time = journeys.timestamp[journeys.starts + journeys.lengths - 1]
+    age_days = (np.repeat(conversion_time, journeys.lengths) - journeys.timestamp) / NANOSECONDS_PER_DAY
+    weights = np.exp2(-age_days / half_life_days)
+    totals = np.add.reduceat(weights, journeys.starts)
+    return weights / np.repeat(totals, journeys.lengths)
+
+
+def position_based_credit(journeys: Journeys, first_weight: float = 0.4,
+                          last_weight: float = 0.4) -> np.ndarray:
+    """U-shaped credit: fixed shares for first and last touch, the rest spread over the middle"""
+    lengths = np.repeat(journeys.lengths, journeys.lengths)
+    rank = journeys.rank
+    middle_weight = (1.0 - first_weight - last_weight) / np.maximum(lengths - 2, 1)
+
+    credit = np.where(rank == 0, first_weight,
+                      np.where(rank == lengths - 1, last_weight, middle_weight))
+    # Short journeys have no middle: one touch takes everything, two touches share pro rata
+    two_touch = np.where(rank == 0, first_weight, last_weight) / (first_weight + last_weight)
+    credit = np.where(lengths == 2, two_touch, credit)
+    return np.where(lengths == 1, 1.0, credit)
+
+
+ATTRIBUTION_MODELS: Dict[str, Callable[..., np.ndarray]] = {
+    'first_touch': first_touch_credit,
+    'last_touch': last_touch_credit,
+    'linear': linear_credit,
+    'time_decay': time_decay_credit,
+    'position_based': position_based_credit,
+}
+
+
+def collapse_paths(journeys: Journeys):
+    """
+    Collapse identical journeys into unique (path, count, converted) rows.
+    Returns a -1 padded matrix of channel codes with the path length, count and
+    conversion flag of every unique path.
+    """
+    width = int(journeys.lengths.max()) if journeys.n_users else 0
+    dtype = np.int16 if len(journeys.channels) < np.iinfo(np.int16).max else np.int32
+    padded = np.full((journeys.n_users, width + 1), -1, dtype=dtype)
+    padded[journeys.group, journeys.rank] = journeys.channel
+    padded[:, width] = journeys.converted
+
+    unique, counts = np.unique(padded, axis=0, return_counts=True)
+    paths = unique[:, :width]
+    lengths = (paths >= 0).sum(axis=1)
+    converted = unique[:, width].astype(bool)
+    return paths, lengths, counts, converted
+
+
+def markov_transition_matrix(paths: np.ndarray, lengths: np.ndarray, counts: np.ndarray,
+                             converted: np.ndarray, n_channels: int) -> sparse.csr_matrix:
+    """
+    Sparse row-stochastic transition matrix over the states
+    START (0), channels (1..n_channels), CONVERSION (n_channels + 1), NULL (n_channels + 2).
+    """
+    n_paths, width = paths.shape
+    conversion_state, null_state = n_channels + 1, n_channels + 2
+
+    states = np.full((n_paths, width + 2), -1, dtype=np.int64)
+    states[:, 0] = 0
+    states[:, 1:width + 1] = np.where(paths >= 0, paths.astype(np.int64) + 1, -1)
+    states[np.arange(n_paths), lengths + 1] = np.where(converted, conversion_state, null_state)
+
+    source, target = states[:, :-1], states[:, 1:]
+    valid = (source >= 0) & (target >= 0)
+    weights = np.broadcast_to(counts[:, None], source.shape)[valid].astype(np.float64)
+
+    n_states = n_channels + 3
+    counts_matrix = sparse.coo_matrix((weights, (source[valid], target[valid])),
+                                      shape=(n_states, n_states)).tocsr()
+    row_totals = np.asarray(counts_matrix.sum(axis=1)).ravel()
+    row_totals[row_totals == 0] = 1.0
+    return sparse.diags(1.0 / row_totals) @ counts_matrix
+
+
+def markov_removal_effects(journeys: Journeys, chunk_size: int = 512,
+                           dense_fill_ratio: float = 0.25):
+    """
+    Removal effect of every channel from one sparse LU factorization.
+
+    With M = I - Q over the transient states and x = M^-1 r the conversion
+    probability from each state, removing channel j (sending its traffic to NULL)
+    gives x'_start = x_start - x_j * G[start, j] / G[j, j] with G = M^-1.
+    Only the start row and the diagonal of G are needed, so all removals are
+    answered by batched solves against the same factorization.
+    """
+    n_channels = len(journeys.channels)
+    paths, lengths, counts, converted = collapse_paths(journeys)
+    transitions = markov_transition_matrix(paths, lengths, counts, converted, n_channels)
+    logger.info(f"Collapsed {journeys.n_users} journeys into {len(counts)} unique paths, "
+                f"{transitions.nnz} transitions")
+
+    n_transient = n_channels + 1
+    transient = transitions[:n_transient, :n_transient]
+    to_conversion = transitions[:n_transient, n_channels + 1].toarray().ravel()
+    system = (sparse.identity(n_transient, format='csc') - transient).tocsc()
+    lu = splu(system)
+
+    conversion_prob = lu.solve(to_conversion)
+    base = conversion_prob[0]
+    if base <= 0:
+        return np.zeros(n_channels), 0.0
+
+    start_row = np.zeros(n_transient)
+    start_row[0] = 1.0
+    start_row = lu.solve(start_row, trans='T')  # G[start, :]
+
+    if lu.L.nnz + lu.U.nnz > dense_fill_ratio * n_transient ** 2:
+        # Heavily cross-linked campaigns fill in the factors; dense LAPACK is faster then
+        diagonal = np.diag(np.linalg.inv(system.toarray()))
+    else:
+        diagonal = np.empty(n_transient)
+        for offset in range(0, n_transient, chunk_size):
+            columns = np.arange(offset, min(offset + chunk_size, n_transient))
+            identity_block = np.zeros((n_transient, len(columns)))
+            identity_block[columns, np.arange(len(columns))] = 1.0
+            diagonal[columns] = lu.solve(identity_block)[columns, np.arange(len(columns))]
+
+    removed = base - conversion_prob[1:] * start_row[1:] / diagonal[1:]
+    removal_effects = 1.0 - np.clip(removed, 0.0, None) / base
+    return np.clip(removal_effects, 0.0, None), base
+
+
+def markov_credit(journeys: Journeys, chunk_size: int = 512,
+                  dense_fill_ratio: float = 0.25) -> np.ndarray:
+    """Conversions per channel, split by normalized Markov removal effect"""
+    removal_effects, _ = markov_removal_effects(journeys, chunk_size, dense_fill_ratio)
+    total_effect = removal_effects.sum()
+    if total_effect == 0:
+        return removal_effects
+    return removal_effects / total_effect * journeys.converted.sum()
+
+
+def collapse_channel_sets(journeys: Journeys):
+    """
+    Collapse journeys into their distinct sets of channels.
+    Returns the sets as a -1 padded matrix of sorted channel codes with the number
+    of users and conversions behind every set.
+    """
+    n_channels = max(len(journeys.channels), 1)
+    pairs = np.unique(journeys.group.astype(np.int64) * n_channels + journeys.channel)
+    users, channels = np.divmod(pairs, n_channels)
+
+    starts = _group_starts(users)
+    sizes = np.diff(np.append(starts, len(users)))
+    width = int(sizes.max()) if len(sizes) else 0
+    padded = np.full((journeys.n_users, width), -1, dtype=np.int64)
+    padded[users, np.arange(len(users)) - np.repeat(starts, sizes)] = channels
+
+    sets, inverse = np.unique(padded, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    user_counts = np.bincount(inverse, minlength=len(sets))
+    conversions = np.bincount(inverse, weights=journeys.converted, minlength=len(sets))
+    return sets, user_counts, conversions
+
+
+def _channel_mask(members: Iterable[int]) -> int:
+    mask = 0
+    for channel in members:
+        mask |= 1 << int(channel)
+    return mask
+
+
+def _subset_values(members: np.ndarray, coalition_values: Dict[int, float]) -> np.ndarray:
+    """Coalition value of every subset of `members`, indexed by local bitmask"""
+    bits = [1 << int(channel) for channel in members]
+    global_masks = [0] * (1 << len(members))
+    values = np.zeros(1 << len(members))
+    for local in range(1, len(global_masks)):
+        lowest = local & -local
+        global_masks[local] = global_masks[local ^ lowest] | bits[lowest.bit_length() - 1]
+        values[local] = coalition_values.get(global_masks[local], 0.0)
+    return values
+
+
+def _exact_shapley(values: np.ndarray, n_members: int) -> np.ndarray:
+    """Shapley values from a bitmask-indexed array of all 2^n coalition values"""
+    masks = np.arange(1 << n_members)
+    sizes = np.zeros(len(masks), dtype=np.int64)
+    for bit in range(n_members):
+        sizes += (masks >> bit) & 1
+    weights = np.array([factorial(size) * factorial(n_members - size - 1) / factorial(n_members)
+                        for size in range(n_members)])
+
+    shapley = np.empty(n_members)
+    for bit in range(n_members):
+        without = masks[((masks >> bit) & 1) == 0]
+        marginal = values[without | (1 << bit)] - values[without]
+        shapley[bit] = np.dot(weights[sizes[without]], marginal)
+    return shapley
+
+
+def _sampled_shapley(members: np.ndarray, coalition_values: Dict[int, float],
+                     n_samples: int, rng: np.random.Generator) -> np.ndarray:
+    """Monte Carlo Shapley values from `n_samples` random orderings of the members"""
+    bits = [1 << int(channel) for channel in members]
+    shapley = np.zeros(len(members))
+    for order in np.argsort(rng.random((n_samples, len(members))), axis=1):
+        mask, previous = 0, 0.0
+        for position in order:
+            mask |= bits[position]
+            value = coalition_values.get(mask, 0.0)
+            shapley[position] += value - previous
+            previous = value
+    return shapley / n_samples
+
+
+def shapley_credit(journeys: Journeys, max_exact_channels: int = 12, n_samples: int = 1000,
+                   seed: Optional[int] = None) -> np.ndarray:
+    """
+    Conversions per channel, split by the Shapley value of each channel in the
+    user's journey.
+
+    The value of a coalition is the conversion rate of users exposed to exactly
+    that set of channels. It is computed once per distinct channel set and kept
+    keyed by channel bitmask; Shapley values are then solved once per distinct
+    converting set and reused for every user sharing it. Sets with more than
+    `max_exact_channels` members fall back to `n_samples` sampled orderings.
+    """
+    sets, user_counts, conversions = collapse_channel_sets(journeys)
+    set_members = [row[row >= 0] for row in sets]
+    coalition_values = {_channel_mask(members): conv / users
+                        for members, users, conv in zip(set_members, user_counts, conversions)}
+
+    rng = np.random.default_rng(seed)
+    credit = np.zeros(len(journeys.channels))
+    for members, conv in zip(set_members, conversions):
+        if conv == 0 or len(members) == 0:
+            continue
+        if len(members) <= max_exact_channels:
+            values = _subset_values(members, coalition_values)
+            shapley = _exact_shapley(values, len(members))
+        else:
+            shapley = _sampled_shapley(members, coalition_values, n_samples, rng)
+
+        # Every conversion hands out exactly one unit of credit
+        shapley = np.clip(shapley, 0.0, None)
+        total = shapley.sum()
+        share = shapley / total if total > 0 else np.full(len(members), 1.0 / len(members))
+        credit[members] += conv * share
+
+    logger.info(f"Solved Shapley values for {int((conversions > 0).sum())} distinct channel sets "
+                f"from {len(coalition_values)} coalitions")
+    return credit
+
+
+# Models that learn from every journey and score channels directly
+CHANNEL_MODELS: Dict[str, Callable[..., np.ndarray]] = {
+    'markov': markov_credit,
+    'shapley': shapley_credit,
+}
+
+
+def credit_by_channel(journeys: Journeys, credit: np.ndarray) -> np.ndarray:
+    """Sum row credits into one value per channel code"""
+    return np.bincount(journeys.channel, weights=credit, minlength=len(journeys.channels))
+
+
+def attribute(journeys: Journeys, models: Optional[Iterable[str]] = None,
+              model_params: Optional[Dict[str, Dict]] = None,
+              channel_column: str = 'campaign_id') -> pd.DataFrame:
+    """Attributed conversions per channel, one column per model"""
+    models = list(models or [*ATTRIBUTION_MODELS, *CHANNEL_MODELS])
+    model_params = model_params or {}
+    converting = journeys.converting()
+
+    results = {}
+    for model in models:
+        params = model_params.get(model, {})
+        if model in ATTRIBUTION_MODELS:
+            credit = ATTRIBUTION_MODELS[model](converting, **params)
+            results[model] = credit_by_channel(converting, credit)
+        elif model in CHANNEL_MODELS:
+            results[model] = CHANNEL_MODELS[model](journeys, **params)
+        else:
+            raise ValueError(f"Unknown attribution model: {model}")
+
+    result = pd.DataFrame(results, index=pd.Index(journeys.channels, name=channel_column))
+    logger.info(f"Attributed {converting.n_users} conversions over "
+                f"{converting.n_touchpoints} touchpoints with models {models}")
+    return result.reset_index()
+
+
+def run_attribution(touchpoints_df: pd.DataFrame, models: Optional[Iterable[str]] = None,
+                    model_params: Optional[Dict[str, Dict]] = None,
+                    channel_column: str = 'campaign_id') -> pd.DataFrame:
+    """Build journeys from a `user_touchpoints` frame and attribute them"""
+    journeys = build_journeys(touchpoints_df, channel_column=channel_column)
+    return attribute(journeys, models, model_params, channel_column)
+
+
+def complete_journeys(chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """
+    Re-cut a stream of touchpoint chunks ordered by user_id so that no journey
+    spans two chunks; the trailing user of every chunk is carried into the next.
+    """
+    carry = None
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        users = chunk['user_id'].to_numpy()
+        tail = users == users[-1]
+        carry = chunk[tail]
+        if not tail.all():
+            yield chunk[~tail]
+    if carry is not None:
+        yield carry
+
+
+def attribute_chunks(chunks: Iterable[pd.DataFrame], models: Optional[Iterable[str]] = None,
+                     model_params: Optional[Dict[str, Dict]] = None,
+                     channel_column: str = 'campaign_id') -> pd.DataFrame:
+    """
+    Rule-based attribution over a lazily consumed stream of touchpoint chunks
+    ordered by (user_id, timestamp), e.g. from extract.stream_user_touchpoints.
+    Only one chunk of journeys is resident at a time.
+    """
+    models = list(models or ATTRIBUTION_MODELS)
+    unsupported = [model for model in models if model not in ATTRIBUTION_MODELS]
+    if unsupported:
+        raise ValueError(f"Models {unsupported} need every journey at once and cannot be streamed")
+
+    total = None
+    for journeys_df in complete_journeys(chunks):
+        partial = run_attribution(journeys_df, models, model_params, channel_column)
+        partial = partial.set_index(channel_column)
+        total = partial if total is None else total.add(partial, fill_value=0.0)
+
+    if total is None:
+        return pd.DataFrame(columns=[channel_column, *models])
+    return total.reset_index()
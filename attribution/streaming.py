@@ -0,0 +1,378 @@
+# streaming.py
+"""
+Streaming rule-based attribution over touchpoint events.
+
+Events (dicts with the user_touchpoints columns) come from a pluggable source:
+an in-process queue, a tailed newline-delimited JSON file standing in for the
+event bus, or any iterable. Every user has an open session holding the
+touchpoints of the last `lookback` window, as compact arrays. When a
+conversion (`click`) arrives, the journey in [conversion - lookback, conversion]
+is credited with the same models as attribution.models, and the running
+campaign credits change immediately. The session then restarts, so a later
+click starts a new journey instead of being ignored as in the batch models.
+
+Memory is bounded three ways:
+- touchpoints older than the lookback are pruned
+- users idle for `idle_timeout` of event time are evicted
+- the least recently active users are evicted above `max_users`
+
+Event lag (wall clock minus event timestamp) and state size are reported with
+stats() and logged every `report_interval` seconds.
+
+    python -m attribution.streaming events.jsonl --models linear last_touch
+"""
+import argparse
+import bisect
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from attribution.models import ATTRIBUTION_MODELS, Journeys
+from config.config import STREAMING_CONFIG
+from database.connection import Histogram
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0, 86_400.0)
+
+END_OF_STREAM = object()
+
+
+class QueueSource:
+    """Events put on an in-process queue; put END_OF_STREAM to stop"""
+
+    def __init__(self, events: Optional[queue.Queue] = None, poll_interval: float = 1.0):
+        self.events = events if events is not None else queue.Queue()
+        self.poll_interval = poll_interval
+
+    def put(self, event: Dict[str, Any]):
+        self.events.put(event)
+
+    def close(self):
+        self.events.put(END_OF_STREAM)
+
+    def __iter__(self) -> Iterator[Optional[Dict[str, Any]]]:
+        while True:
+            try:
+                event = self.events.get(timeout=self.poll_interval)
+            except queue.Empty:
+                yield None  # idle heartbeat
+                continue
+            if event is END_OF_STREAM:
+                return
+            yield event
+
+
+class JsonLinesSource:
+    """
+    Events appended to a newline-delimited JSON file, read like `tail -f`.
+    Incomplete trailing lines wait for their newline, and a truncated or
+    replaced file is reopened from the start.
+    """
+
+    def __init__(self, path: str, follow: bool = True, from_start: bool = True,
+                 poll_interval: float = 0.5):
+        self.path = path
+        self.follow = follow
+        self.from_start = from_start
+        self.poll_interval = poll_interval
+        self.malformed = 0
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _parse(self, line: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            self.malformed += 1
+            logger.warning(f"Skipping malformed event in {self.path}: {line[:200]!r}")
+            return None
+
+    def __iter__(self) -> Iterator[Optional[Dict[str, Any]]]:
+        handle, inode, partial = None, None, ''
+        from_start = self.from_start
+        try:
+            while not self._stopped.is_set():
+                if handle is None:
+                    try:
+                        handle = open(self.path, encoding='utf-8')
+                    except FileNotFoundError:
+                        if not self.follow:
+                            return
+                        time.sleep(self.poll_interval)
+                        yield None
+                        continue
+                    inode = os.fstat(handle.fileno()).st_ino
+                    if not from_start:
+                        handle.seek(0, os.SEEK_END)
+
+                line = handle.readline()
+                if line:
+                    partial += line
+                    if partial.endswith('\n'):
+                        line, partial = partial, ''
+                        if line.strip():
+                            event = self._parse(line)
+                            if event is not None:
+                                yield event
+                    continue
+
+                if not self.follow:
+                    if partial.strip():
+                        event = self._parse(partial)
+                        if event is not None:
+                            yield event
+                    return
+                try:
+                    stat = os.stat(self.path)
+                    replaced = stat.st_ino != inode or stat.st_size < handle.tell()
+                except FileNotFoundError:
+                    replaced = True
+                if replaced:
+                    logger.info(f"{self.path} was truncated or replaced, reopening")
+                    handle.close()
+                    handle, partial, from_start = None, '', True
+                time.sleep(self.poll_interval)
+                yield None
+        finally:
+            if handle is not None:
+                handle.close()
+
+
+class UserSession:
+    """Touchpoints of one user inside the lookback window, in timestamp order"""
+
+    __slots__ = ('timestamps', 'channels', 'last_seen')
+
+    def __init__(self):
+        self.timestamps = array('q')  # epoch nanoseconds
+        self.channels = array('i')    # channel codes
+        self.last_seen = 0            # latest event time, epoch nanoseconds
+
+    def add(self, timestamp: int, channel: int):
+        if not self.timestamps or timestamp >= self.timestamps[-1]:
+            self.timestamps.append(timestamp)
+            self.channels.append(channel)
+        else:  # late arrival
+            position = bisect.bisect_right(self.timestamps, timestamp)
+            self.timestamps.insert(position, timestamp)
+            self.channels.insert(position, channel)
+        self.last_seen = max(self.last_seen, timestamp)
+
+    def drop_before(self, position: int):
+        del self.timestamps[:position]
+        del self.channels[:position]
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
+def _epoch_ns(value) -> int:
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return pd.Timestamp(value).value
+
+
+class StreamingAttribution:
+    """Per-user session state and running credits per channel and model"""
+
+    # rough CPython cost of a session: object, two arrays and the OrderedDict entry
+    SESSION_OVERHEAD = 400
+
+    def __init__(self, models: Optional[Iterable[str]] = None,
+                 model_params: Optional[Dict[str, Dict]] = None,
+                 channel_column: str = 'campaign_id', conversion_type: str = 'click',
+                 lookback: timedelta = timedelta(days=STREAMING_CONFIG['lookback_days']),
+                 idle_timeout: timedelta = timedelta(hours=STREAMING_CONFIG['idle_timeout_hours']),
+                 max_users: int = STREAMING_CONFIG['max_users'],
+                 report_interval: float = STREAMING_CONFIG['report_interval'],
+                 on_conversion: Optional[Callable[[str, pd.Timestamp, Dict[str, Dict[str, float]]], None]] = None):
+        self.models = list(models or ATTRIBUTION_MODELS)
+        unsupported = [model for model in self.models if model not in ATTRIBUTION_MODELS]
+        if unsupported:
+            raise ValueError(f"Models {unsupported} need every journey at once and cannot be streamed")
+        self.model_params = model_params or {}
+        self.channel_column = channel_column
+        self.conversion_type = conversion_type
+        self.lookback = int(lookback / timedelta(microseconds=1)) * 1000
+        self.idle_timeout = int(idle_timeout / timedelta(microseconds=1)) * 1000
+        self.max_users = max_users
+        self.report_interval = report_interval
+        self.on_conversion = on_conversion
+
+        self.sessions: 'OrderedDict[str, UserSession]' = OrderedDict()  # least recently active first
+        self.channels: List[str] = []
+        self._channel_codes: Dict[str, int] = {}
+        self._credit = np.zeros((len(self.models), 64))
+        self._touchpoints = 0
+        self.event_time = 0  # highest event timestamp seen, epoch nanoseconds
+        self.lag = Histogram(LAG_BUCKETS)
+        self.last_lag: Optional[float] = None
+        self.counters = {'events': 0, 'conversions': 0, 'late_dropped': 0, 'invalid': 0,
+                         'evicted_idle': 0, 'evicted_capacity': 0}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._last_report = self._started
+
+    # -- processing ------------------------------------------------------------------------
+
+    def _channel_code(self, channel: str) -> int:
+        code = self._channel_codes.get(channel)
+        if code is None:
+            code = self._channel_codes[channel] = len(self.channels)
+            self.channels.append(channel)
+            if code >= self._credit.shape[1]:
+                self._credit = np.hstack([self._credit, np.zeros_like(self._credit)])
+        return code
+
+    def process(self, event: Dict[str, Any]):
+        """Fold one touchpoint event into its user's session, crediting it if it converts"""
+        user_id, channel = event.get('user_id'), event.get(self.channel_column)
+        if user_id is None or channel is None or event.get('timestamp') is None:
+            self.counters['invalid'] += 1
+            return
+        timestamp = _epoch_ns(event['timestamp'])
+        with self._lock:
+            self.counters['events'] += 1
+            self.last_lag = (pd.Timestamp.now().value - timestamp) / 1e9
+            self.lag.observe(max(self.last_lag, 0.0))
+            if timestamp < self.event_time - self.lookback:
+                self.counters['late_dropped'] += 1
+                return
+            self.event_time = max(self.event_time, timestamp)
+
+            session = self.sessions.get(user_id)
+            if session is None:
+                session = self.sessions[user_id] = UserSession()
+            else:
+                self.sessions.move_to_end(user_id)
+            before = len(session)
+            session.add(timestamp, self._channel_code(channel))
+            # keep only what a conversion at the user's latest touch could still credit
+            session.drop_before(bisect.bisect_left(session.timestamps, session.last_seen - self.lookback))
+
+            if event.get('touchpoints_type') == self.conversion_type:
+                self._convert(user_id, session, timestamp)
+            self._touchpoints += len(session) - before
+            if not len(session):
+                del self.sessions[user_id]
+            self._evict()
+
+    def _convert(self, user_id: str, session: UserSession, timestamp: int):
+        start = bisect.bisect_left(session.timestamps, timestamp - self.lookback)
+        end = bisect.bisect_right(session.timestamps, timestamp)
+        channels = np.array(session.channels[start:end], dtype=np.int64)
+        timestamps = np.array(session.timestamps[start:end], dtype=np.int64)
+        journey = Journeys(np.zeros(len(channels), dtype=np.int64), channels, timestamps,
+                           np.ones(1, dtype=bool), [user_id], self.channels)
+        credits = {}
+        for i, model in enumerate(self.models):
+            credit = ATTRIBUTION_MODELS[model](journey, **self.model_params.get(model, {}))
+            np.add.at(self._credit[i], journey.channel, credit)
+            credits[model] = credit
+        self.counters['conversions'] += 1
+        session.drop_before(end)
+
+        if self.on_conversion is not None:
+            names = [self.channels[code] for code in journey.channel]
+            per_model = {}
+            for model, credit in credits.items():
+                per_channel = per_model.setdefault(model, {})
+                for name, value in zip(names, credit):
+                    per_channel[name] = per_channel.get(name, 0.0) + float(value)
+            self.on_conversion(user_id, pd.Timestamp(timestamp), per_model)
+
+    def _evict(self):
+        """Drop idle users from the least recently active end, then any above max_users"""
+        idle_before = self.event_time - self.idle_timeout
+        while self.sessions:
+            user_id, session = next(iter(self.sessions.items()))
+            if len(self.sessions) > self.max_users:
+                self.counters['evicted_capacity'] += 1
+            elif session.last_seen < idle_before:
+                self.counters['evicted_idle'] += 1
+            else:
+                break
+            self._touchpoints -= len(session)
+            del self.sessions[user_id]
+
+    def run(self, source: Iterable[Optional[Dict[str, Any]]], max_events: Optional[int] = None) -> Dict[str, Any]:
+        """Consume a source until it ends (or max_events), returns the final stats"""
+        processed = 0
+        for event in source:
+            if event is not None:
+                self.process(event)
+                processed += 1
+            if time.monotonic() - self._last_report >= self.report_interval:
+                self.report()
+            if max_events is not None and processed >= max_events:
+                break
+        self.report()
+        return self.stats()
+
+    # -- results and metrics ---------------------------------------------------------------
+
+    def credits(self) -> pd.DataFrame:
+        """Running attributed conversions per channel, one column per model"""
+        with self._lock:
+            n = len(self.channels)
+            result = pd.DataFrame(self._credit[:, :n].T.copy(), columns=self.models,
+                                  index=pd.Index(list(self.channels), name=self.channel_column))
+        return result.reset_index()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            return {
+                **self.counters,
+                'users': len(self.sessions),
+                'touchpoints': self._touchpoints,
+                'state_bytes': self._touchpoints * 12 + len(self.sessions) * self.SESSION_OVERHEAD,
+                'channels': len(self.channels),
+                'event_time': pd.Timestamp(self.event_time) if self.event_time else None,
+                'events_per_second': self.counters['events'] / elapsed if elapsed > 0 else 0.0,
+                'lag_seconds': self.last_lag,
+                'lag': self.lag.snapshot(),
+            }
+
+    def report(self):
+        stats = self.stats()
+        self._last_report = time.monotonic()
+        lag = stats['lag']
+        logger.info(f"{stats['events']} events ({stats['events_per_second']:.0f}/s), "
+                    f"{stats['conversions']} conversions, {stats['users']} users / "
+                    f"{stats['touchpoints']} touchpoints (~{stats['state_bytes'] / 1024 ** 2:.1f}MB), "
+                    f"lag {stats['lag_seconds'] if stats['lag_seconds'] is not None else 0:.1f}s "
+                    f"(p95 <= {lag['p95']}s), evicted {stats['evicted_idle']} idle / "
+                    f"{stats['evicted_capacity']} over capacity, {stats['late_dropped']} late")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Attribute touchpoint events from a JSON-lines file as they arrive')
+    parser.add_argument('path', help='newline-delimited JSON touchpoint events')
+    parser.add_argument('--models', nargs='+', default=None, choices=list(ATTRIBUTION_MODELS))
+    parser.add_argument('--no-follow', action='store_true', help='stop at the end of the file')
+    parser.add_argument('--lookback-days', type=float, default=STREAMING_CONFIG['lookback_days'])
+    parser.add_argument('--max-users', type=int, default=STREAMING_CONFIG['max_users'])
+    args = parser.parse_args()
+
+    engine = StreamingAttribution(args.models, lookback=timedelta(days=args.lookback_days),
+                                  max_users=args.max_users)
+    try:
+        engine.run(JsonLinesSource(args.path, follow=not args.no_follow))
+    except KeyboardInterrupt:
+        pass
+    print(engine.credits().to_string(index=False))
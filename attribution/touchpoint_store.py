@@ -0,0 +1,243 @@
+# touchpoint_store.py
+"""
+Compact columnar store for user touchpoints.
+
+Categorical fields (platform, campaign_id, touchpoints_type, device_type,
+geo_location) are dictionary-encoded into the smallest signed integer codes that
+fit, user ids are interned to int32 codes over a sorted user dictionary, and
+timestamps are int64 epoch nanoseconds. When every user id has the form
+<prefix><number> (e.g. user_000123) the dictionary itself is an int64 array, so
+no per-user Python string is kept at all. Rows are kept sorted by
+(user, timestamp), which lets attribution cut journeys straight from the arrays.
+"""
+import logging
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from attribution.models import Journeys, cut_journeys
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CATEGORICAL_COLUMNS = ('platform', 'campaign_id', 'touchpoints_type', 'device_type', 'geo_location')
+
+
+def _code_dtype(n_categories: int) -> np.dtype:
+    """Smallest signed integer dtype holding codes 0..n-1 and -1 for missing"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _encode_categorical(values: pd.Series):
+    """(codes, categories) of a column, reusing the codes of an existing Categorical"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, categories = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, categories = pd.factorize(values, sort=True)
+        categories = pd.Index(categories)
+    return codes.astype(_code_dtype(len(categories)), copy=False), categories
+
+
+def _remap(codes: np.ndarray, categories: pd.Index, merged: pd.Index) -> np.ndarray:
+    """Translate codes over `categories` into codes over `merged`, keeping -1 as missing"""
+    mapping = merged.get_indexer(categories)
+    remapped = np.where(codes >= 0, mapping[np.maximum(codes, 0)] if len(mapping) else -1, -1)
+    return remapped.astype(_code_dtype(len(merged)), copy=False)
+
+
+class UserDictionary:
+    """
+    Sorted dictionary of user ids. Ids of the form <prefix><number> are stored as
+    an int64 array of numbers plus the prefix and zero-padding width; anything
+    else falls back to an object array of labels.
+    """
+
+    def __init__(self, numbers: Optional[np.ndarray] = None, prefix: str = '', width: int = 0,
+                 labels: Optional[np.ndarray] = None):
+        self.numbers = numbers
+        self.prefix = prefix
+        self.width = width
+        self.labels = labels
+
+    @property
+    def numbered(self) -> bool:
+        return self.numbers is not None
+
+    def __len__(self) -> int:
+        return len(self.numbers if self.numbered else self.labels)
+
+    @property
+    def keys(self) -> np.ndarray:
+        """int64 numbers or string labels, in code order"""
+        return self.numbers if self.numbered else self.labels
+
+    @property
+    def nbytes(self) -> int:
+        if self.numbered:
+            return self.numbers.nbytes
+        return int(pd.Series(self.labels).memory_usage(deep=True, index=False))
+
+    def decode(self, codes: Optional[np.ndarray] = None) -> pd.Index:
+        """user_id labels of `codes` (every user when None)"""
+        keys = self.keys if codes is None else self.keys[codes]
+        if not self.numbered:
+            return pd.Index(keys)
+        return pd.Index(self.prefix + pd.Series(keys).astype(str).str.zfill(self.width))
+
+    @classmethod
+    def encode(cls, user_ids: pd.Series):
+        """(int32 codes, UserDictionary) of a user_id column; user_id is NOT NULL, so nulls raise"""
+        codes, uniques = pd.factorize(user_ids, sort=True)
+        missing = int(np.count_nonzero(codes < 0))
+        if missing:
+            # a -1 code would index the last user of the dictionary
+            raise ValueError(f"{missing} touchpoints have no user_id")
+        uniques = pd.Series(np.asarray(uniques, dtype=object))
+        parts = uniques.str.extract(r'^(\D*)(\d+)$')
+        if len(uniques) and parts[0].notna().all() and parts[0].nunique() == 1:
+            prefix = parts[0].iloc[0]
+            width = int(parts[1].str.len().min())
+            numbers = parts[1].astype(np.int64).to_numpy()
+            candidate = cls(numbers, prefix, width)
+            # only exact round trips qualify, e.g. no mixed zero padding
+            if candidate.decode().equals(pd.Index(uniques)):
+                order = np.argsort(numbers, kind='stable')
+                ranks = np.empty_like(order)
+                ranks[order] = np.arange(len(order))
+                candidate.numbers = numbers[order]
+                return ranks[codes].astype(np.int32), candidate
+        return codes.astype(np.int32), cls(labels=uniques.to_numpy())
+
+    @classmethod
+    def merge(cls, dictionaries: Iterable['UserDictionary']):
+        """Union dictionary and the translation array of every input dictionary"""
+        dictionaries = list(dictionaries)
+        if all(d.numbered for d in dictionaries) and \
+                len({(d.prefix, d.width) for d in dictionaries}) == 1:
+            numbers = np.unique(np.concatenate([d.numbers for d in dictionaries]))
+            merged = cls(numbers, dictionaries[0].prefix, dictionaries[0].width)
+            return merged, [np.searchsorted(numbers, d.numbers).astype(np.int32) for d in dictionaries]
+        labels = pd.Index(np.unique(np.concatenate([d.decode().to_numpy(dtype=object)
+                                                    for d in dictionaries])))
+        return (cls(labels=labels.to_numpy(dtype=object)),
+                [labels.get_indexer(d.decode()).astype(np.int32) for d in dictionaries])
+
+
+class TouchpointStore:
+    """Dictionary-encoded touchpoints sorted by (user, timestamp)"""
+
+    def __init__(self, user: np.ndarray, timestamp: np.ndarray, codes: Dict[str, np.ndarray],
+                 categories: Dict[str, pd.Index], users: UserDictionary):
+        self.user = user              # row -> user code (int32)
+        self.timestamp = timestamp    # row -> int64 epoch nanoseconds
+        self.codes = codes            # column -> row codes (int8/int16/...), -1 = missing
+        self.categories = categories  # column -> code -> value
+        self.users = users
+
+    def __len__(self) -> int:
+        return len(self.user)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the arrays and dictionaries"""
+        return (self.user.nbytes + self.timestamp.nbytes + self.users.nbytes
+                + sum(codes.nbytes for codes in self.codes.values())
+                + sum(categories.memory_usage(deep=True) for categories in self.categories.values()))
+
+    @classmethod
+    def from_frame(cls, touchpoints_df: pd.DataFrame, sort: bool = True) -> 'TouchpointStore':
+        """Encode a `user_touchpoints` frame; columns outside the schema are dropped"""
+        user, users = UserDictionary.encode(touchpoints_df['user_id'])
+        timestamp = pd.to_datetime(touchpoints_df['timestamp']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        codes, categories = {}, {}
+        for column in CATEGORICAL_COLUMNS:
+            if column in touchpoints_df:
+                codes[column], categories[column] = _encode_categorical(touchpoints_df[column])
+        store = cls(user, timestamp, codes, categories, users)
+        return store.sorted() if sort else store
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[pd.DataFrame]) -> 'TouchpointStore':
+        """Encode a stream of chunks (e.g. extract.stream_user_touchpoints) one at a time"""
+        return cls.concat(cls.from_frame(chunk, sort=False) for chunk in chunks if len(chunk))
+
+    @classmethod
+    def concat(cls, stores: Iterable['TouchpointStore'], sort: bool = True) -> 'TouchpointStore':
+        """Merge stores, unioning their dictionaries"""
+        stores = list(stores)
+        if not stores:
+            return cls.from_frame(pd.DataFrame({'user_id': [], 'timestamp': pd.to_datetime([])}))
+        users, translations = UserDictionary.merge(store.users for store in stores)
+        user = np.concatenate([translation[store.user] for store, translation in zip(stores, translations)])
+        timestamp = np.concatenate([store.timestamp for store in stores])
+
+        codes, categories = {}, {}
+        for column in stores[0].codes:
+            merged = stores[0].categories[column]
+            for store in stores[1:]:
+                merged = merged.union(store.categories[column], sort=False)
+            categories[column] = merged
+            codes[column] = np.concatenate([_remap(store.codes[column], store.categories[column], merged)
+                                            for store in stores])
+        store = cls(user, timestamp, codes, categories, users)
+        return store.sorted() if sort else store
+
+    def sorted(self) -> 'TouchpointStore':
+        """Rows ordered by (user, timestamp); returns self when they already are"""
+        if len(self) < 2:
+            return self
+        same_user = self.user[1:] == self.user[:-1]
+        if (np.all(self.user[1:] >= self.user[:-1])
+                and np.all(self.timestamp[1:][same_user] >= self.timestamp[:-1][same_user])):
+            return self
+        order = np.lexsort((self.timestamp, self.user))
+        return TouchpointStore(self.user[order], self.timestamp[order],
+                               {column: codes[order] for column, codes in self.codes.items()},
+                               self.categories, self.users)
+
+    def column(self, name: str) -> pd.Categorical:
+        """A categorical column as a Categorical over the stored codes (no copy of the codes)"""
+        return pd.Categorical.from_codes(self.codes[name], categories=self.categories[name], validate=False)
+
+    def to_frame(self, user_id_dtype: str = 'category') -> pd.DataFrame:
+        """
+        Decode to a `user_touchpoints` frame. user_id is a categorical over the user
+        dictionary by default, or plain labels with user_id_dtype='object'.
+        """
+        if user_id_dtype == 'category':
+            user_id = pd.Categorical.from_codes(self.user, categories=self.users.decode(), validate=False)
+        else:
+            user_id = self.users.decode(self.user).to_numpy(dtype=object)
+        frame = {'user_id': user_id, 'timestamp': self.timestamp.view('datetime64[ns]')}
+        frame.update((column, self.column(column)) for column in self.codes)
+        return pd.DataFrame(frame)
+
+    def journeys(self, channel_column: str = 'campaign_id', conversion_type: str = 'click') -> Journeys:
+        """Journeys for attribution, cut straight from the sorted code arrays"""
+        channel_codes = self.codes[channel_column]
+        present = channel_codes >= 0
+        user, timestamp, types = self.user, self.timestamp, self.codes['touchpoints_type']
+        if not present.all():
+            user, timestamp, types, channel_codes = (user[present], timestamp[present], types[present],
+                                                     channel_codes[present])
+
+        # Only channels that occur become Markov states / Shapley players
+        used = np.flatnonzero(np.bincount(channel_codes, minlength=len(self.categories[channel_column])))
+        if len(used) < len(self.categories[channel_column]):
+            lookup = np.full(len(self.categories[channel_column]), -1, dtype=np.int64)
+            lookup[used] = np.arange(len(used))
+            channel_codes = lookup[channel_codes]
+        channels = self.categories[channel_column][used]
+
+        type_categories = self.categories['touchpoints_type']
+        if conversion_type in type_categories:
+            is_conversion = types == type_categories.get_loc(conversion_type)
+        else:
+            is_conversion = np.zeros(len(user), dtype=bool)
+        # user codes index the store's dictionary keys (numbers for numbered ids)
+        return cut_journeys(user, channel_codes, timestamp, is_conversion, self.users.keys, channels,
+                            presorted=True)
@@ -0,0 +1,152 @@
+# query_plans.py
+"""
+Query plan and timing benchmark for the touchpoint and performance access patterns.
+
+Captures EXPLAIN (ANALYZE, BUFFERS) for the queries the extractors and
+attribution run, optionally applies the pending schema migrations and captures
+them again, then prints a side-by-side comparison and writes both runs to JSON.
+
+    python -m benchmarks.query_plans --apply-migrations --output plans.json
+"""
+import argparse
+import json
+import logging
+import statistics
+from datetime import timedelta
+from typing import Any, Dict, List
+
+from database.connection import db_manager
+from database.migrate import apply_migrations
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BENCHMARK_QUERIES = {
+    # attribution and incremental re-crediting read whole journeys of selected users
+    'journeys_for_users': """
+        SELECT user_id, timestamp, campaign_id, touchpoints_type
+        FROM user_touchpoints
+        WHERE user_id = ANY(%(user_ids)s)
+        ORDER BY user_id, timestamp
+    """,
+    # month-window attribution over the streamed extract
+    'month_window_journeys': """
+        SELECT user_id, timestamp, campaign_id, touchpoints_type
+        FROM user_touchpoints
+        WHERE timestamp >= %(window_start)s AND timestamp < %(window_end)s
+        ORDER BY user_id, timestamp
+    """,
+    # incremental runs read everything ingested past their id watermark
+    'touchpoints_since_watermark': """
+        SELECT user_id, timestamp, platform, campaign_id, touchpoints_type
+        FROM user_touchpoints
+        WHERE id > %(watermark)s AND id <= %(bound)s
+        ORDER BY user_id, timestamp
+    """,
+    # dashboards and budget analysis read one campaign over a date range
+    'campaign_date_range': """
+        SELECT date, impressions, clicks, spend, conversions, revenue
+        FROM daily_performance
+        WHERE campaign_id = %(campaign_id)s AND date BETWEEN %(date_start)s AND %(date_end)s
+        ORDER BY date
+    """,
+}
+
+
+@db_manager.db_operation(autocommit=True)
+def benchmark_parameters(cursor, conn, sample_users: int = 100) -> Dict[str, Any]:
+    """Parameters taken from the loaded data so every query returns rows"""
+    cursor.execute('select max(timestamp), max(id) from user_touchpoints')
+    latest, bound = cursor.fetchone()
+    cursor.execute('select user_id from user_touchpoints where timestamp > %s limit %s',
+                   (latest - timedelta(days=7), sample_users))
+    user_ids = sorted({row[0] for row in cursor.fetchall()})
+    cursor.execute('select campaign_id, max(date) from daily_performance group by campaign_id limit 1')
+    campaign_id, last_date = cursor.fetchone()
+    return {
+        'user_ids': user_ids,
+        'window_start': latest - timedelta(days=30),
+        'window_end': latest,
+        'watermark': bound - 10_000,
+        'bound': bound,
+        'campaign_id': campaign_id,
+        'date_start': last_date - timedelta(days=14),
+        'date_end': last_date,
+    }
+
+
+def _plan_summary(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Node types, scanned relations and indexes of an EXPLAIN JSON plan"""
+    nodes, relations, indexes = [], [], []
+    stack = [plan['Plan']]
+    while stack:
+        node = stack.pop()
+        nodes.append(node['Node Type'])
+        if 'Relation Name' in node:
+            relations.append(node['Relation Name'])
+        if 'Index Name' in node:
+            indexes.append(node['Index Name'])
+        stack.extend(node.get('Plans', []))
+    return {
+        'nodes': sorted(set(nodes)),
+        'relations_scanned': sorted(set(relations)),
+        'indexes_used': sorted(set(indexes)),
+        'shared_blocks': plan['Plan'].get('Shared Hit Blocks', 0) + plan['Plan'].get('Shared Read Blocks', 0),
+    }
+
+
+@db_manager.db_operation(autocommit=True)
+def run_benchmark(cursor, conn, params: Dict[str, Any], repeat: int = 5) -> Dict[str, Any]:
+    """Median execution time and plan summary of every benchmark query"""
+    results = {}
+    for name, query in BENCHMARK_QUERIES.items():
+        timings, plan = [], None
+        for _ in range(repeat):
+            cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}', params)
+            plan = cursor.fetchone()[0][0]
+            timings.append(plan['Execution Time'])
+        results[name] = {
+            'execution_ms': statistics.median(timings),
+            'planning_ms': plan['Planning Time'],
+            'rows': plan['Plan']['Actual Rows'],
+            **_plan_summary(plan),
+        }
+    return results
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]) -> List[str]:
+    lines = [f"{'query':<30} {'before ms':>10} {'after ms':>10} {'speedup':>8}  plan after"]
+    for name in BENCHMARK_QUERIES:
+        old, new = before[name], after[name]
+        speedup = old['execution_ms'] / new['execution_ms'] if new['execution_ms'] else float('inf')
+        lines.append(f"{name:<30} {old['execution_ms']:>10.2f} {new['execution_ms']:>10.2f} "
+                     f"{speedup:>7.1f}x  {', '.join(new['nodes'])}; "
+                     f"{len(new['relations_scanned'])} relation(s)")
+    return lines
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare query plans before and after migrations')
+    parser.add_argument('--apply-migrations', action='store_true',
+                        help='apply pending migrations between the two runs')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default=None, help='write both runs as JSON')
+    args = parser.parse_args()
+
+    params = benchmark_parameters()
+    before = run_benchmark(params, repeat=args.repeat)
+    report = {'before': before}
+    if args.apply_migrations:
+        report['migrations_applied'] = apply_migrations()
+        db_manager.close()  # cached plans and connections predate the new schema
+        after = run_benchmark(params, repeat=args.repeat)
+        report['after'] = after
+        for line in compare(before, after):
+            print(line)
+    else:
+        for name, result in before.items():
+            print(f"{name:<30} {result['execution_ms']:>10.2f} ms  {', '.join(result['nodes'])}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
@@ -0,0 +1,374 @@
+# suite.py
+"""
+Scaling benchmark for the generators, loaders, extractors and attribution models.
+
+Every stage runs at each size (number of users; campaigns and performance rows
+scale along) and records wall time, peak RSS and rows per second. Results are
+appended to a JSON history (.cache/benchmarks/history.json by default, which
+is not under version control), and a stage that gets slower than the median
+of its previous runs by more than the threshold fails the run with exit code 1.
+
+The database is pluggable: `postgres` loads into a throwaway database (created
+on the configured server, or in a temporary cluster started from --pg-bin) with
+schema.sql and the migrations applied; `memory` is an in-process stand-in that
+keeps the loaded frames in pandas, for measuring everything but the database.
+
+    python -m benchmarks.suite --sizes 10k,100k --backend memory
+    python -m benchmarks.suite --pg-bin /usr/lib/postgresql/16/bin --threshold 0.2
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from attribution.models import ATTRIBUTION_MODELS, CHANNEL_MODELS, run_attribution
+from config.config import DB_CONFIG
+from data.generators import facebook_ads_generator as facebook
+from data.generators import google_ads_generator as google
+from data.generators import user_journey_generator as journeys
+from data.generators.pipeline import generate_campaigns
+from database.connection import db_manager
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_HISTORY = Path(__file__).parent.parent / '.cache' / 'benchmarks' / 'history.json'
+SCHEMA_FILE = Path(__file__).parent.parent / 'database' / 'schema.sql'
+PERFORMANCE_DAYS = 30
+# the row-by-row generator needs minutes per 100k users, larger sizes are skipped
+LOOP_GENERATOR_MAX_USERS = 100_000
+
+
+def parse_size(text: str) -> int:
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    text = text.strip().lower()
+    return int(float(text[:-1]) * multipliers[text[-1]]) if text[-1] in multipliers else int(text)
+
+
+def campaigns_per_platform(num_users: int) -> int:
+    return min(max(20, num_users // 1000), 1000)
+
+
+class PeakRSS:
+    """Samples resident memory on a background thread while the block runs"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._done = threading.Event()
+
+    @staticmethod
+    def current() -> int:
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            # no procfs: fall back to the lifetime peak (kilobytes on Linux, bytes on macOS)
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == 'darwin' else peak * 1024
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, self.current())
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+class MemoryBackend:
+    """In-process stand-in for the database: loads keep frames, extracts read them back"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self.tables: Dict[str, List[pd.DataFrame]] = {}
+
+    def setup(self):
+        self.tables.clear()
+
+    def reset(self, table: str):
+        self.tables.pop(table, None)
+
+    def bulk_insert(self, table: str, records: List[Dict]) -> int:
+        self.tables.setdefault(table, []).append(pd.DataFrame.from_records(records))
+        return len(records)
+
+    def copy_insert(self, table: str, df: pd.DataFrame) -> int:
+        self.tables.setdefault(table, []).append(df.copy())
+        return len(df)
+
+    def _table(self, table: str) -> pd.DataFrame:
+        return pd.concat(self.tables.get(table, []), ignore_index=True)
+
+    def stream_touchpoints(self, chunk_size: int = 50_000) -> Iterator[pd.DataFrame]:
+        touchpoints = self._table('user_touchpoints').sort_values(['user_id', 'timestamp'], ignore_index=True)
+        for start in range(0, len(touchpoints), chunk_size):
+            yield touchpoints.iloc[start:start + chunk_size]
+
+    def extract_funnel(self) -> pd.DataFrame:
+        touchpoints = self._table('user_touchpoints')
+        funnel = (touchpoints.groupby(['user_id', 'campaign_id', 'platform', 'touchpoints_type'],
+                                      observed=True)['timestamp'].min()
+                  .unstack('touchpoints_type'))
+        return funnel.reset_index()
+
+    def teardown(self):
+        self.tables.clear()
+
+
+class PostgresBackend:
+    """
+    Throwaway benchmark database. The global db_manager is pointed at it, so the
+    loaders and extractors run exactly as in production.
+    """
+
+    name = 'postgres'
+
+    def __init__(self, db_config: Optional[Dict] = None, database: str = 'ad_attribution_benchmark',
+                 pg_bin: Optional[str] = None):
+        self.db_config = dict(db_config or DB_CONFIG)
+        self.database = database
+        self.pg_bin = pg_bin
+        self._cluster_dir = None
+        self._original_config = db_manager.db_config
+
+    def _start_cluster(self):
+        """initdb and start a temporary cluster on a free port (must not run as root)"""
+        self._cluster_dir = tempfile.mkdtemp(prefix='ad_attribution_pg_')
+        with socket.socket() as s:
+            s.bind(('localhost', 0))
+            port = s.getsockname()[1]
+        bin_dir = Path(self.pg_bin)
+        subprocess.run([bin_dir / 'initdb', '-D', f'{self._cluster_dir}/data', '-U', 'postgres',
+                        '--auth=trust'], check=True, capture_output=True)
+        subprocess.run([bin_dir / 'pg_ctl', '-D', f'{self._cluster_dir}/data', '-l',
+                        f'{self._cluster_dir}/postgres.log', '-w', '-o',
+                        f'-p {port} -k {self._cluster_dir}', 'start'], check=True, capture_output=True)
+        self.db_config.update(host='localhost', port=port, user='postgres', password='')
+
+    def _admin(self, statement: str):
+        conn = psycopg2.connect(**{**self.db_config, 'database': 'postgres'})
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(statement)
+        finally:
+            conn.close()
+
+    def setup(self):
+        from database.migrate import apply_migrations
+
+        if self.pg_bin:
+            self._start_cluster()
+        self._admin(f'DROP DATABASE IF EXISTS {self.database}')
+        self._admin(f'CREATE DATABASE {self.database}')
+        db_manager.close()
+        db_manager.db_config = {**self.db_config, 'database': self.database}
+        with db_manager.get_cursor() as (cursor, conn):
+            cursor.execute(SCHEMA_FILE.read_text())
+        apply_migrations()
+
+    def reset(self, table: str):
+        with db_manager.get_cursor() as (cursor, conn):
+            cursor.execute(f'TRUNCATE {table}')
+
+    def bulk_insert(self, table: str, records: List[Dict]) -> int:
+        return db_manager.bulk_insert(table, records)
+
+    def copy_insert(self, table: str, df: pd.DataFrame) -> int:
+        db_manager.copy_insert(table, df)
+        return len(df)
+
+    def stream_touchpoints(self, chunk_size: int = 50_000) -> Iterator[pd.DataFrame]:
+        from etl.extractors.extract import stream_user_touchpoints
+        return stream_user_touchpoints(chunk_size=chunk_size)
+
+    def extract_funnel(self) -> pd.DataFrame:
+        from etl.extractors.extract import extract_touch_points_data
+        return extract_touch_points_data(refresh=True)
+
+    def teardown(self):
+        db_manager.close()
+        db_manager.db_config = self._original_config
+        try:
+            self._admin(f'DROP DATABASE IF EXISTS {self.database}')
+        finally:
+            if self._cluster_dir:
+                subprocess.run([Path(self.pg_bin) / 'pg_ctl', '-D', f'{self._cluster_dir}/data',
+                                '-m', 'fast', 'stop'], capture_output=True)
+                shutil.rmtree(self._cluster_dir, ignore_errors=True)
+
+
+def run_stage(results: List[Dict], stage: str, size: int, func: Callable[[], int]):
+    """Time one stage; `func` returns the number of rows it processed"""
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        rows = func()
+        seconds = time.perf_counter() - started
+    result = {'stage': stage, 'size': size, 'seconds': round(seconds, 4),
+              'peak_rss_mb': round(rss.peak / 1024 ** 2, 1), 'rows': int(rows),
+              'rows_per_second': round(rows / seconds, 1) if seconds > 0 else None}
+    results.append(result)
+    logger.info(f"{stage:<32} {size:>10,} users  {seconds:>9.3f}s  {result['peak_rss_mb']:>8.1f} MB  "
+                f"{int(rows):>12,} rows")
+
+
+def run_size(backend, size: int, seed: int, results: List[Dict]):
+    """Run every stage at one size against a freshly set up backend"""
+    backend.setup()
+    num_campaigns = campaigns_per_platform(size)
+    campaigns_df = generate_campaigns(num_campaigns, num_campaigns, np.random.SeedSequence(seed))
+    backend.copy_insert('campaigns', campaigns_df)
+    facebook_campaigns = campaigns_df[campaigns_df['platform'] == 'facebook']
+    google_campaigns = campaigns_df[campaigns_df['platform'] == 'google_ads']
+    data = {}
+
+    if size <= LOOP_GENERATOR_MAX_USERS:
+        run_stage(results, 'generate_user_journeys', size,
+                  lambda: len(journeys.generate_user_journeys(campaigns_df, size)))
+
+    def generate_batch():
+        data['touchpoints'] = pd.concat(journeys.generate_user_journeys_batch(campaigns_df, size, seed=seed),
+                                        ignore_index=True)
+        return len(data['touchpoints'])
+    run_stage(results, 'generate_user_journeys_batch', size, generate_batch)
+
+    run_stage(results, 'generate_facebook_performance', size,
+              lambda: len(facebook.generate_facebook_performance(facebook_campaigns, PERFORMANCE_DAYS)))
+    run_stage(results, 'generate_google_performance', size,
+              lambda: len(google.generate_google_performance(google_campaigns, PERFORMANCE_DAYS)))
+
+    def generate_performance_vectorized():
+        data['performance'] = pd.concat([
+            facebook.generate_facebook_performance_vectorized(facebook_campaigns, PERFORMANCE_DAYS, seed),
+            google.generate_google_performance_vectorized(google_campaigns, PERFORMANCE_DAYS, seed),
+        ], ignore_index=True)
+        return len(data['performance'])
+    run_stage(results, 'generate_performance_vectorized', size, generate_performance_vectorized)
+
+    def bulk_insert_touchpoints(slice_size: int = 250_000):
+        # bulk_insert takes a list of dicts; building them slice by slice bounds memory at 1M users
+        touchpoints = data['touchpoints'].astype({'timestamp': object})
+        return sum(backend.bulk_insert('user_touchpoints',
+                                       touchpoints.iloc[start:start + slice_size].to_dict('records'))
+                   for start in range(0, len(touchpoints), slice_size))
+    run_stage(results, 'bulk_insert_touchpoints', size, bulk_insert_touchpoints)
+    backend.reset('user_touchpoints')
+    run_stage(results, 'copy_insert_touchpoints', size,
+              lambda: backend.copy_insert('user_touchpoints', data['touchpoints']))
+    run_stage(results, 'copy_insert_performance', size,
+              lambda: backend.copy_insert('daily_performance', data['performance']))
+
+    def extract_touchpoints():
+        data['extracted'] = pd.concat(backend.stream_touchpoints(), ignore_index=True)
+        return len(data['extracted'])
+    run_stage(results, 'extract_touchpoints', size, extract_touchpoints)
+    run_stage(results, 'extract_funnel', size, lambda: len(backend.extract_funnel()))
+
+    for model in [*ATTRIBUTION_MODELS, *sorted(CHANNEL_MODELS)]:
+        run_stage(results, f'attribution_{model}', size,
+                  lambda: run_attribution(data['extracted'], [model]) is not None and len(data['extracted']))
+    backend.teardown()
+
+
+def load_history(path: Path) -> List[Dict]:
+    if not path.exists():
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def find_regressions(history: List[Dict], run: Dict, threshold: float, baseline_runs: int = 5,
+                     min_seconds: float = 0.05) -> List[str]:
+    """Stages slower than the median of their last `baseline_runs` runs by more than `threshold`"""
+    regressions = []
+    previous = [past for past in history if past['backend'] == run['backend']]
+    for result in run['results']:
+        timings = [past_result['seconds'] for past in previous for past_result in past['results']
+                   if past_result['stage'] == result['stage'] and past_result['size'] == result['size']]
+        if not timings:
+            continue
+        baseline = statistics.median(timings[-baseline_runs:])
+        # tiny stages are all noise, require an absolute slowdown as well
+        if result['seconds'] > baseline * (1 + threshold) and result['seconds'] - baseline > min_seconds:
+            regressions.append(f"{result['stage']} at {result['size']:,} users: {result['seconds']:.3f}s "
+                               f"vs {baseline:.3f}s baseline (+{result['seconds'] / baseline - 1:.0%})")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Scaling benchmark with regression detection')
+    parser.add_argument('--sizes', default=None, help='comma separated user counts (default 10k,100k,1M)')
+    parser.add_argument('--backend', choices=['postgres', 'memory'], default='postgres')
+    parser.add_argument('--pg-bin', default=None,
+                        help='PostgreSQL bin directory; start a temporary cluster instead of using DB_CONFIG')
+    parser.add_argument('--database', default='ad_attribution_benchmark',
+                        help='throwaway database created (and dropped) for the run')
+    parser.add_argument('--history', type=Path, default=DEFAULT_HISTORY)
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='fail when a stage is this much slower than its baseline (0.25 = 25%%)')
+    parser.add_argument('--baseline-runs', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    # per-batch loader logging would dominate the output and the timings
+    logging.getLogger('database.connection').setLevel(logging.WARNING)
+    logging.getLogger('attribution.models').setLevel(logging.WARNING)
+
+    backend = (MemoryBackend() if args.backend == 'memory'
+               else PostgresBackend(database=args.database, pg_bin=args.pg_bin))
+    run = {'started_at': datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(),
+           'backend': backend.name, 'host': platform.node(), 'python': platform.python_version(),
+           'results': []}
+    sizes = [parse_size(size) for size in args.sizes.split(',')] if args.sizes else DEFAULT_SIZES
+    for size in sizes:
+        run_size(backend, size, args.seed, run['results'])
+
+    history = load_history(args.history)
+    regressions = find_regressions(history, run, args.threshold, args.baseline_runs)
+    history.append(run)
+    args.history.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.history, 'w') as f:
+        json.dump(history, f, indent=2)
+
+    for regression in regressions:
+        logger.error(f"Regression: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
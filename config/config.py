@@ -4,4 +4,35 @@ DB_CONFIG = {
     'user': 'postgres',
     'password': 'postgres',
     'database': 'ad_attribution',
-}
\ No newline at end of file
+}
+
+DB_POOL_CONFIG = {
+    'min_connections': 1,
+    'max_connections': 10,
+    'checkout_timeout': 30.0,
+    'health_check_interval': 30.0,
+}
+
+CACHE_CONFIG = {
+    'max_bytes': 256 * 1024 ** 2,
+    'ttl': 600.0,
+    'version_check_interval': 5.0,
+}
+
+SNAPSHOT_CONFIG = {
+    'cache_dir': '.cache/touchpoints',
+    'chunk_size': 50_000,
+}
+
+STREAMING_CONFIG = {
+    'lookback_days': 30,
+    'idle_timeout_hours': 24 * 30,
+    'max_users': 1_000_000,
+    'report_interval': 30.0,
+}
+
+DAG_CONFIG = {
+    'cache_dir': '.cache/dag',
+    'workers': None,  # defaults to os.cpu_count()
+    'keep': 3,        # cached outputs kept per task
+}
@@ -0,0 +1,82 @@
+# async_ingest.py
+"""
+Concurrent ingestion of the independent ad platforms.
+
+Each platform's campaigns must land before its performance rows, but Facebook
+and Google do not depend on each other, so their load chains run as concurrent
+tasks on one event loop. Database round-trips of one platform overlap with
+generation and loading of the other; generation runs in worker threads.
+
+    python -m data.generators.async_ingest --facebook-campaigns 500 --google-campaigns 500 --days 90
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from data.generators.pipeline import PLATFORMS, generate_campaigns
+from database.async_connection import (async_db_manager, load_campaign_data_async,
+                                       load_performance_data_async)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def ingest_platform(platform: str, campaigns_df: pd.DataFrame, days: int, seed,
+                          end_date) -> Dict[str, int]:
+    """Load one platform's campaigns, then generate, validate and load its performance"""
+    _, generate_performance, _, validate_performance = PLATFORMS[platform]
+    started = time.perf_counter()
+    campaigns_loaded = await load_campaign_data_async(campaigns_df)
+
+    performance_df = await asyncio.to_thread(generate_performance, campaigns_df, days, seed, end_date)
+    issues = validate_performance(performance_df)
+    if issues:
+        logger.warning(f"{platform} performance issues: {issues}")
+        raise ValueError(f"{platform} performance issues: {issues}")
+    performance_loaded = await load_performance_data_async(performance_df)
+
+    logger.info(f"{platform}: {len(campaigns_df)} campaigns, {len(performance_df)} performance rows "
+                f"in {time.perf_counter() - started:.2f}s")
+    return {'campaigns': campaigns_loaded, 'performance': performance_loaded}
+
+
+async def ingest(num_facebook_campaigns: int = 20, num_google_campaigns: int = 20, days: int = 30,
+                 seed: Optional[int] = None, end_date=None) -> Dict[str, Dict[str, int]]:
+    """Ingest all platforms concurrently, returns rows loaded per platform and table"""
+    end_date = pd.Timestamp(end_date or pd.Timestamp.now()).normalize().date()
+    campaign_seed, performance_seed = np.random.SeedSequence(seed).spawn(2)
+    # Campaign generation seeds the shared random/Faker state, so it stays sequential
+    campaigns_df = generate_campaigns(num_facebook_campaigns, num_google_campaigns, campaign_seed)
+
+    started = time.perf_counter()
+    platforms = list(PLATFORMS)
+    try:
+        results = await asyncio.gather(*(
+            ingest_platform(platform, campaigns_df[campaigns_df['platform'] == platform], days,
+                            platform_seed, end_date)
+            for platform, platform_seed in zip(platforms, performance_seed.spawn(len(platforms)))
+        ))
+    finally:
+        await async_db_manager.close()
+    logger.info(f"Ingested {len(platforms)} platforms in {time.perf_counter() - started:.2f}s")
+    return dict(zip(platforms, results))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load all ad platforms concurrently')
+    parser.add_argument('--facebook-campaigns', type=int, default=20)
+    parser.add_argument('--google-campaigns', type=int, default=20)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(ingest(args.facebook_campaigns, args.google_campaigns, args.days, seed=args.seed))
+    except Exception as e:
+        logger.error(f"Ingest failed: {e}")
+        raise
@@ -6,6 +6,7 @@ from faker import Faker
 import numpy as np
 import logging
 
+from data.validation import Approx, NonNegative, OneOf, Range, RuleSet
 from database.connection import load_campaign_data, load_performance_data
 
 logging.basicConfig(level=logging.INFO)
@@ -149,31 +150,92 @@ def generate_facebook_performance(campaigns_df, days=30):
 
     return pd.DataFrame(performance_data)
 
+def generate_facebook_performance_vectorized(campaigns_df, days=30, seed=None, end_date=None):
+    """
+    Array-based generate_facebook_performance.
+    Builds the whole (campaign, day) grid at once with the same benchmarks,
+    seasonality and variance; rows come out in the same campaign-major order.
+    """
+    rng = np.random.default_rng(seed)
+    industry_benchmarks = {
+        'awareness': {'ctr_range': (0.8, 1.8), 'cvr_range': (2, 5), 'cpc_range': (0.6, 1.2)},
+        'conversion': {'ctr_range': (0.9, 2.2), 'cvr_range': (5, 12), 'cpc_range': (1.5, 8.5)},
+        'engagement': {'ctr_range': (1.2, 2.8), 'cvr_range': (3, 8), 'cpc_range': (0.4, 1.8)}
+    }
+    n_campaigns = len(campaigns_df)
+    campaign_types = campaigns_df['campaign_type'].to_numpy()
+    budgets = campaigns_df['daily_budget'].to_numpy(dtype=float)[:, None]
+
+    def benchmark_bounds(metric):
+        bounds = np.array([industry_benchmarks[campaign_type][metric] for campaign_type in campaign_types])
+        return bounds[:, :1], bounds[:, 1:]
+
+    # Base performance per campaign, shape (n_campaigns, 1) to broadcast over days
+    base_ctr = rng.uniform(*benchmark_bounds('ctr_range'))
+    base_cvr = rng.uniform(*benchmark_bounds('cvr_range'))
+    base_cpc = rng.uniform(*benchmark_bounds('cpc_range'))
+
+    end = np.datetime64(end_date or datetime.now().date(), 'D')
+    dates = end - np.arange(days)
+    weekday = (dates.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday, Monday = 0
+    day_adjustment = np.select([weekday >= 5, (weekday >= 1) & (weekday <= 3)], [-0.3, 0.2], 0.0)
+
+    shape = (n_campaigns, days)
+    daily_ctr = np.clip(base_ctr + day_adjustment + rng.uniform(-0.2, 0.2, shape), 0.1, 3.0)
+    daily_cpc = base_cpc * rng.uniform(0.9, 1.1, shape)
+    daily_cvr = base_cvr * rng.uniform(0.7, 1.3, shape)
+
+    impressions = (budgets / daily_cpc / (daily_ctr / 100) * rng.uniform(0.5, 1.5, shape)).astype(np.int64)
+    clicks = (impressions * (daily_ctr / 100)).astype(np.int64)
+    cpc = np.round(daily_cpc, 2)
+    spend = clicks * cpc
+    conversions = (clicks * (daily_cvr / 100)).astype(np.int64)
+    revenue = conversions * rng.uniform(500, 5000, shape)
+    cpm = np.divide(spend * 1000, impressions, out=np.zeros(shape), where=impressions > 0)
+
+    return pd.DataFrame({
+        'date': np.tile(dates, n_campaigns),
+        'campaign_id': np.repeat(campaigns_df['campaign_id'].to_numpy(), days),
+        'impressions': impressions.ravel(),
+        'clicks': clicks.ravel(),
+        'spend': np.round(spend, 2).ravel(),
+        'conversions': conversions.ravel(),
+        'revenue': np.round(revenue, 2).ravel(),
+        'cpc': cpc.ravel(),
+        'cpm': np.round(cpm, 2).ravel(),
+        'ctr': np.round(daily_ctr, 2).ravel(),
+    })
+
+def iter_facebook_performance_chunks(campaigns_df, days=30, seed=None, end_date=None,
+                                    campaigns_per_chunk=10_000):
+    """Yield generate_facebook_performance_vectorized output in campaign slices to bound memory"""
+    n_chunks = -(-len(campaigns_df) // campaigns_per_chunk)
+    chunk_seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    for chunk_seed, start in zip(chunk_seeds, range(0, len(campaigns_df), campaigns_per_chunk)):
+        chunk = campaigns_df.iloc[start:start + campaigns_per_chunk]
+        yield generate_facebook_performance_vectorized(chunk, days, chunk_seed, end_date)
+
+CAMPAIGN_RULES = RuleSet('facebook campaigns', [
+    Range('low_budget', 'daily_budget', min=100, message="low budget: {count} campaigns"),  # way too low
+    # suspicious kinda way too high
+    Range('high_budget', 'daily_budget', max=100000, message="high budget: {count} campaigns"),
+    OneOf('invalid_status', 'status', ['active', 'paused', 'draft'], message="invalid status: {count} campaigns"),
+])
+
+PERFORMANCE_RULES = RuleSet('facebook performance', [
+    Range('high_ctr', 'ctr', max=3.5, message="{count} records with CTR > 3.5%"),
+    Approx('spend_cpc_mismatch', 'spend', ('clicks', 'cpc'), tolerance=0.01,
+           message="{count} records with spend/cpc mismatch"),
+    NonNegative('negative_metrics', ('clicks', 'spend', 'impressions'),
+                message="{count} records with negative metrics"),
+])
+
+
 def validate_campaign_data(df):
-    issues = []
-    low_budget_df = df[df['daily_budget'] < 100] # way too low
-    high_budget_df = df[df['daily_budget'] > 100000] # suspicious kinda way too high
-    invalid_status = df[~df['status'].isin(['active', 'paused', 'draft'])]
-    if not low_budget_df.empty:
-        issues.append(f"low budget: {len(low_budget_df)} campaigns")
-    if not high_budget_df.empty:
-        issues.append(f"high budget: {len(high_budget_df)} campaigns")
-    if not invalid_status.empty:
-        issues.append(f"invalid status: {len(invalid_status)} campaigns")
-    return issues
+    return CAMPAIGN_RULES.validate(df).issues()
 
 def validate_performance_data(df):
-    issues = []
-    high_ctr_df = df[df['ctr'] > 3.5]
-    inconsistent_spend_df = df[abs(df['spend'] - (df['clicks'] * df['cpc'])) > 0.01]
-    negative_metrics_df = df[(df['clicks'] < 0) | (df['spend'] < 0) | (df['impressions'] < 0)]
-    if not high_ctr_df.empty:
-        issues.append(f"{len(high_ctr_df)} records with CTR > 3.5%")
-    if not inconsistent_spend_df.empty:
-        issues.append(f"{len(inconsistent_spend_df)} records with spend/cpc mismatch")
-    if not negative_metrics_df.empty:
-        issues.append(f"{len(negative_metrics_df)} records with negative metrics")
-    return issues
+    return PERFORMANCE_RULES.validate(df).issues()
 
 
 if __name__ == "__main__":
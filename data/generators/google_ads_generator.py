@@ -6,6 +6,7 @@ from faker import Faker
 import numpy as np
 import logging
 
+from data.validation import Approx, NonNegative, OneOf, Range, RuleSet
 from database.connection import load_campaign_data, load_performance_data
 
 # Assuming you have similar database connection functions
@@ -160,6 +161,85 @@ def generate_google_performance(campaigns_df, days=30):
     return pd.DataFrame(performance_data)
 
 
+def generate_google_performance_vectorized(campaigns_df, days=30, seed=None, end_date=None):
+    """
+    Array-based generate_google_performance.
+    Builds the whole (campaign, day) grid at once with the same benchmarks,
+    seasonality, variance and order values; rows come out in the same
+    campaign-major order.
+    """
+    rng = np.random.default_rng(seed)
+    industry_benchmarks = {
+        'search': {'ctr_range': (2.0, 5.0), 'cvr_range': (3, 8), 'cpc_range': (1.0, 5.0)},
+        'display': {'ctr_range': (0.4, 1.2), 'cvr_range': (1, 3), 'cpc_range': (0.3, 2.0)},
+        'shopping': {'ctr_range': (0.7, 2.5), 'cvr_range': (5, 15), 'cpc_range': (0.5, 3.0)},
+        'video': {'ctr_range': (0.8, 2.0), 'cvr_range': (2, 6), 'cpc_range': (0.2, 1.5)},
+        'performance_max': {'ctr_range': (1.5, 4.0), 'cvr_range': (4, 12), 'cpc_range': (0.8, 4.0)},
+        'app': {'ctr_range': (1.0, 3.0), 'cvr_range': (8, 20), 'cpc_range': (0.5, 2.5)}
+    }
+    n_campaigns = len(campaigns_df)
+    campaign_types = campaigns_df['campaign_type'].to_numpy()
+    budgets = campaigns_df['daily_budget'].to_numpy(dtype=float)[:, None]
+
+    def benchmark_bounds(metric):
+        bounds = np.array([industry_benchmarks.get(campaign_type, industry_benchmarks['search'])[metric]
+                           for campaign_type in campaign_types])
+        return bounds[:, :1], bounds[:, 1:]
+
+    # Base performance per campaign, shape (n_campaigns, 1) to broadcast over days
+    base_ctr = rng.uniform(*benchmark_bounds('ctr_range'))
+    base_cvr = rng.uniform(*benchmark_bounds('cvr_range'))
+    base_cpc = rng.uniform(*benchmark_bounds('cpc_range'))
+
+    end = np.datetime64(end_date or datetime.now().date(), 'D')
+    dates = end - np.arange(days)
+    weekday = (dates.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday, Monday = 0
+    weekend_peak = np.isin(campaign_types, ['shopping', 'display'])[:, None]
+    day_adjustment = np.where(weekday >= 5, np.where(weekend_peak, 0.1, -0.2),
+                              np.where((weekday >= 1) & (weekday <= 3), 0.15, 0.0))
+
+    shape = (n_campaigns, days)
+    daily_ctr = np.clip(base_ctr + day_adjustment + rng.uniform(-0.15, 0.15, shape), 0.1, 8.0)
+    daily_cpc = base_cpc * rng.uniform(0.85, 1.15, shape)
+    daily_cvr = base_cvr * rng.uniform(0.6, 1.4, shape)
+
+    impressions = (budgets / daily_cpc / (daily_ctr / 100) * rng.uniform(0.4, 1.6, shape)).astype(np.int64)
+    clicks = (impressions * (daily_ctr / 100)).astype(np.int64)
+    cpc = np.round(daily_cpc, 2)
+    cost = clicks * cpc
+    conversions = (clicks * (daily_cvr / 100)).astype(np.int64)
+
+    # Revenue calculation (varies by campaign type)
+    order_value_types = [campaign_types == 'shopping', campaign_types == 'app']
+    aov_low = np.select(order_value_types, [800, 50], 300)[:, None]
+    aov_high = np.select(order_value_types, [3000, 200], 2500)[:, None]
+    revenue = conversions * rng.uniform(aov_low, aov_high, shape)
+    cpm = np.divide(cost * 1000, impressions, out=np.zeros(shape), where=impressions > 0)
+
+    return pd.DataFrame({
+        'date': np.tile(dates, n_campaigns),
+        'campaign_id': np.repeat(campaigns_df['campaign_id'].to_numpy(), days),
+        'impressions': impressions.ravel(),
+        'clicks': clicks.ravel(),
+        'spend': np.round(cost, 2).ravel(),
+        'conversions': conversions.ravel(),
+        'revenue': np.round(revenue, 2).ravel(),
+        'cpc': cpc.ravel(),
+        'cpm': np.round(cpm, 2).ravel(),
+        'ctr': np.round(daily_ctr, 2).ravel(),
+    })
+
+
+def iter_google_performance_chunks(campaigns_df, days=30, seed=None, end_date=None,
+                                  campaigns_per_chunk=10_000):
+    """Yield generate_google_performance_vectorized output in campaign slices to bound memory"""
+    n_chunks = -(-len(campaigns_df) // campaigns_per_chunk)
+    chunk_seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    for chunk_seed, start in zip(chunk_seeds, range(0, len(campaigns_df), campaigns_per_chunk)):
+        chunk = campaigns_df.iloc[start:start + campaigns_per_chunk]
+        yield generate_google_performance_vectorized(chunk, days, chunk_seed, end_date)
+
+
 def generate_keyword_data(campaigns_df, keywords_per_campaign=10):
     """Generate keyword-level data for Google Ads"""
     keyword_data = []
@@ -187,66 +267,34 @@ def generate_keyword_data(campaigns_df, keywords_per_campaign=10):
     return pd.DataFrame(keyword_data)
 
 
-def validate_campaign_data(df):
-    """Validate Google Ads campaign data for realistic constraints"""
-    issues = []
-
+CAMPAIGN_RULES = RuleSet('google ads campaigns', [
     # Budget validation
-    low_budget_df = df[df['daily_budget'] < 100]
-    high_budget_df = df[df['daily_budget'] > 100000]
-
-    # Status validation
-    invalid_status = df[~df['status'].isin(ad_statuses)]
+    Range('low_budget', 'daily_budget', min=100, message="Low budget: {count} campaigns"),
+    Range('high_budget', 'daily_budget', max=100000, message="High budget: {count} campaigns"),
+    OneOf('invalid_status', 'status', ad_statuses, message="Invalid status: {count} campaigns"),
+    OneOf('invalid_type', 'campaign_type', campaign_types, message="Invalid campaign type: {count} campaigns"),
+])
 
-    # Campaign type validation
-    invalid_type = df[~df['campaign_type'].isin(campaign_types)]
+PERFORMANCE_RULES = RuleSet('google ads performance', [
+    # CTR validation (Google Ads can have higher CTRs than Facebook)
+    Range('high_ctr', 'ctr', max=8.0, message="{count} records with CTR > 8.0%"),
+    Range('low_ctr', 'ctr', min=0.1, message="{count} records with CTR < 0.1%"),
+    # Cost consistency check
+    Approx('cost_cpc_mismatch', 'spend', ('clicks', 'cpc'), tolerance=0.1,
+           message="{count} records with cost/cpc mismatch"),
+    NonNegative('negative_metrics', ('clicks', 'spend', 'impressions'),
+                message="{count} records with negative metrics"),
+])
 
-    if not low_budget_df.empty:
-        issues.append(f"Low budget: {len(low_budget_df)} campaigns")
-    if not high_budget_df.empty:
-        issues.append(f"High budget: {len(high_budget_df)} campaigns")
-    if not invalid_status.empty:
-        issues.append(f"Invalid status: {len(invalid_status)} campaigns")
-    if not invalid_type.empty:
-        issues.append(f"Invalid campaign type: {len(invalid_type)} campaigns")
 
-    return issues
+def validate_campaign_data(df):
+    """Validate Google Ads campaign data for realistic constraints"""
+    return CAMPAIGN_RULES.validate(df).issues()
 
 
 def validate_performance_data(df):
     """Validate Google Ads performance data for realistic metrics"""
-    issues = []
-
-    # CTR validation (Google Ads can have higher CTRs than Facebook)
-    high_ctr_df = df[df['ctr'] > 8.0]
-    low_ctr_df = df[df['ctr'] < 0.1]
-
-    # Cost consistency check
-    inconsistent_cost_df = df[abs(df['spend'] - (df['clicks'] * df['cpc'])) > 0.1]
-
-    # Negative metrics check
-    negative_metrics_df = df[(df['clicks'] < 0) | (df['spend'] < 0) | (df['impressions'] < 0)]
-
-    # Quality Score validation
-    # invalid_qs_df = df[(df['quality_score'] < 1) | (df['quality_score'] > 10)]
-
-    # ROAS validation (should be positive when there's revenue)
-    # invalid_roas_df = df[(df['revenue'] > 0) & (df['roas'] <= 0)]
-
-    if not high_ctr_df.empty:
-        issues.append(f"{len(high_ctr_df)} records with CTR > 8.0%")
-    if not low_ctr_df.empty:
-        issues.append(f"{len(low_ctr_df)} records with CTR < 0.1%")
-    if not inconsistent_cost_df.empty:
-        issues.append(f"{len(inconsistent_cost_df)} records with cost/cpc mismatch")
-    if not negative_metrics_df.empty:
-        issues.append(f"{len(negative_metrics_df)} records with negative metrics")
-    # if not invalid_qs_df.empty:
-    #     issues.append(f"{len(invalid_qs_df)} records with invalid Quality Score")
-    # if not invalid_roas_df.empty:
-    #     issues.append(f"{len(invalid_roas_df)} records with invalid ROAS")
-
-    return issues
+    return PERFORMANCE_RULES.validate(df).issues()
 
 
 if __name__ == "__main__":
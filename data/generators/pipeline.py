@@ -0,0 +1,242 @@
+# pipeline.py
+"""
+Parallel synthetic data pipeline.
+
+Campaigns are generated and loaded first (performance rows and touchpoints
+reference them). Performance data is then sharded by campaign and journeys by
+user-id range across a process pool; every shard gets a seed spawned from the
+run seed, so the same seed always yields the same data regardless of worker
+count. Workers generate and validate their shard, and the parent streams each
+finished shard into the COPY loader while the remaining shards are still being
+generated.
+
+    python -m data.generators.pipeline --users 1000000 --facebook-campaigns 100 \
+        --google-campaigns 100 --days 90 --seed 7
+"""
+import argparse
+import hashlib
+import logging
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from data.generators import facebook_ads_generator as facebook
+from data.generators import google_ads_generator as google
+from data.generators import user_journey_generator as journeys
+from database.connection import (clear_load_checkpoints, load_campaign_data, load_journey_data,
+                                 load_performance_data, refresh_performance_rollups, refresh_touchpoint_funnel)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PLATFORMS = {
+    'facebook': (facebook.generate_facebook_campaigns, facebook.generate_facebook_performance_vectorized,
+                 facebook.validate_campaign_data, facebook.validate_performance_data),
+    'google_ads': (google.generate_google_campaigns, google.generate_google_performance_vectorized,
+                   google.validate_campaign_data, google.validate_performance_data),
+}
+
+_worker_campaigns = None
+
+
+class StageStats:
+    """Rows and busy seconds per pipeline stage"""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    def record(self, stage: str, rows: int, seconds: float):
+        stats = self.stages.setdefault(stage, {'rows': 0, 'seconds': 0.0})
+        stats['rows'] += rows
+        stats['seconds'] += seconds
+
+    def merge(self, other: Dict[str, Dict[str, float]]):
+        for stage, stats in other.items():
+            self.record(stage, stats['rows'], stats['seconds'])
+
+    def report(self, wall_seconds: float):
+        for stage, stats in self.stages.items():
+            rate = stats['rows'] / stats['seconds'] if stats['seconds'] > 0 else float('inf')
+            logger.info(f"{stage:<24} {int(stats['rows']):>12,} rows  {stats['seconds']:>8.2f}s busy  "
+                        f"{rate:>12,.0f} rows/s")
+        total_rows = sum(stats['rows'] for stage, stats in self.stages.items() if stage.startswith('load'))
+        logger.info(f"Loaded {int(total_rows):,} rows in {wall_seconds:.2f}s wall "
+                    f"({total_rows / wall_seconds:,.0f} rows/s end to end)")
+
+
+def _init_worker(campaigns_df):
+    global _worker_campaigns
+    _worker_campaigns = campaigns_df
+
+
+def _performance_shard(platform: str, start: int, stop: int, days: int, seed, end_date):
+    """Generate and validate performance rows for one slice of a platform's campaigns"""
+    _, generate_performance, _, validate_performance = PLATFORMS[platform]
+    campaigns_df = _worker_campaigns[_worker_campaigns['platform'] == platform].iloc[start:stop]
+
+    started = time.perf_counter()
+    performance_df = generate_performance(campaigns_df, days, seed, end_date)
+    generated = time.perf_counter()
+    issues = validate_performance(performance_df)
+    validated = time.perf_counter()
+
+    stats = {f'generate {platform}': {'rows': len(performance_df), 'seconds': generated - started},
+             f'validate {platform}': {'rows': len(performance_df), 'seconds': validated - generated}}
+    return 'performance', performance_df, issues, stats
+
+
+def _journey_shard(first_user_id: int, num_users: int, seed, end_time):
+    """Generate and validate the journeys of one user-id range"""
+    started = time.perf_counter()
+    journey_df = pd.concat(journeys.generate_user_journeys_batch(
+        _worker_campaigns, num_users, seed=seed, users_per_chunk=num_users,
+        first_user_id=first_user_id, end_time=end_time), ignore_index=True)
+    generated = time.perf_counter()
+    issues = journeys.validate_journey_data(journey_df)
+    validated = time.perf_counter()
+
+    stats = {'generate journeys': {'rows': len(journey_df), 'seconds': generated - started},
+             'validate journeys': {'rows': len(journey_df), 'seconds': validated - generated}}
+    return 'journeys', journey_df, issues, stats
+
+
+def generate_campaigns(num_facebook_campaigns: int, num_google_campaigns: int, seed) -> pd.DataFrame:
+    """Generate both platforms' campaigns with seeded random/Faker state"""
+    frames = []
+    for platform, num_campaigns in (('facebook', num_facebook_campaigns), ('google_ads', num_google_campaigns)):
+        generate_campaigns_fn, _, validate_campaigns, _ = PLATFORMS[platform]
+        platform_seed = int(seed.generate_state(1)[0]) + len(frames)
+        random.seed(platform_seed)
+        facebook.fake.seed_instance(platform_seed)
+        google.fake.seed_instance(platform_seed)
+        campaigns_df = generate_campaigns_fn(num_campaigns)
+        issues = validate_campaigns(campaigns_df)
+        if issues:
+            logger.warning(f"{platform} campaign issues: {issues}")
+            raise ValueError(f"{platform} campaign issues: {issues}")
+        frames.append(campaigns_df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def run_load_id(*run_args) -> str:
+    """Load id of a run: the same arguments regenerate the same chunks, so they resume the same load"""
+    return 'pipeline-' + hashlib.sha256(repr(run_args).encode()).hexdigest()[:16]
+
+
+def run_pipeline(num_facebook_campaigns: int = 20, num_google_campaigns: int = 20, days: int = 30,
+                 num_users: int = 10000, seed: Optional[int] = None, workers: Optional[int] = None,
+                 users_per_shard: int = 100_000, campaigns_per_shard: int = 1_000,
+                 max_pending: Optional[int] = None, end_date=None, load_id: Optional[str] = None) -> StageStats:
+    """
+    Generate, validate and load a full synthetic dataset across a process pool.
+    With a load_id the loads are checkpointed and a failed run can be resumed:
+    re-running with the same load_id, seed and end_date regenerates identical
+    chunks and skips the committed ones. The checkpoints are dropped once the
+    run succeeds.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    end_date = pd.Timestamp(end_date or pd.Timestamp.now()).normalize()
+    stats = StageStats()
+    started = time.perf_counter()
+
+    campaign_seed, performance_seed, journey_seed = np.random.SeedSequence(seed).spawn(3)
+    campaigns_df = generate_campaigns(num_facebook_campaigns, num_google_campaigns, campaign_seed)
+    load_started = time.perf_counter()
+    load_campaign_data(campaigns_df)
+    stats.record('load campaigns', len(campaigns_df), time.perf_counter() - load_started)
+
+    # Shard list is fixed before submission, so seeds do not depend on scheduling
+    shards = []
+    for platform, num_campaigns in (('facebook', num_facebook_campaigns), ('google_ads', num_google_campaigns)):
+        starts = range(0, num_campaigns, campaigns_per_shard)
+        platform_seeds = performance_seed.spawn(len(starts))
+        shards += [(_performance_shard, platform, start, start + campaigns_per_shard, days,
+                    shard_seed, end_date.date())
+                   for start, shard_seed in zip(starts, platform_seeds)]
+    starts = range(0, num_users, users_per_shard)
+    shards += [(_journey_shard, start + 1, min(users_per_shard, num_users - start), shard_seed, end_date)
+               for start, shard_seed in zip(starts, journey_seed.spawn(len(starts)))]
+    logger.info(f"Running {len(shards)} shards on {workers} workers")
+
+    # Rollups and the funnel are refreshed once at the end instead of after every shard
+    loaders = {'performance': lambda frame: load_performance_data(frame, refresh_rollups=False, load_id=load_id),
+               'journeys': lambda frame: load_journey_data(frame, refresh_funnel=False, load_id=load_id)}
+    performance_dates = []
+    # Spawned, not forked, so workers never inherit the parent's pooled connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(campaigns_df,)) as pool:
+        pending = set()
+        queued = iter(shards)
+        while True:
+            # Keep a bounded number of shards in flight so finished frames do not pile up
+            for shard in queued:
+                pending.add(pool.submit(*shard))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, frame, issues, shard_stats = future.result()
+                stats.merge(shard_stats)
+                if issues:
+                    logger.warning(f"{kind} issues: {issues}")
+                    raise ValueError(f"{kind} issues: {issues}")
+                load_started = time.perf_counter()
+                loaders[kind](frame)
+                stats.record(f'load {kind}', len(frame), time.perf_counter() - load_started)
+                if kind == 'performance' and len(frame):
+                    performance_dates += [frame['date'].min(), frame['date'].max()]
+
+    if performance_dates:
+        rollup_started = time.perf_counter()
+        rollup_rows = refresh_performance_rollups(min(performance_dates), max(performance_dates))
+        stats.record('refresh rollups', rollup_rows, time.perf_counter() - rollup_started)
+    if num_users:
+        funnel_started = time.perf_counter()
+        funnel_rows = refresh_touchpoint_funnel()
+        stats.record('refresh funnel', funnel_rows, time.perf_counter() - funnel_started)
+    if load_id is not None:
+        clear_load_checkpoints(load_id)
+
+    stats.report(time.perf_counter() - started)
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate and load a synthetic ad attribution dataset')
+    parser.add_argument('--facebook-campaigns', type=int, default=20)
+    parser.add_argument('--google-campaigns', type=int, default=20)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--users-per-shard', type=int, default=100_000)
+    parser.add_argument('--campaigns-per-shard', type=int, default=1_000)
+    parser.add_argument('--end-date', default=None)
+    parser.add_argument('--resume', action='store_true',
+                        help='checkpointed loads; re-run with the same --seed and --end-date to resume')
+    args = parser.parse_args()
+    if args.resume and (args.seed is None or args.end_date is None):
+        parser.error('--resume needs --seed and --end-date to regenerate the same chunks')
+    load_id = None
+    if args.resume:
+        load_id = run_load_id(args.facebook_campaigns, args.google_campaigns, args.days, args.users, args.seed,
+                              args.end_date, args.users_per_shard, args.campaigns_per_shard)
+        logger.info(f"Checkpointing loads under {load_id}")
+
+    try:
+        run_pipeline(args.facebook_campaigns, args.google_campaigns, args.days, args.users,
+                     seed=args.seed, workers=args.workers, users_per_shard=args.users_per_shard,
+                     campaigns_per_shard=args.campaigns_per_shard, end_date=args.end_date,
+                     load_id=load_id)
+    except Exception as e:
+        logger.error(f"Pipeline failed: {e}")
+        raise
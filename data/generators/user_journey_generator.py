@@ -1,11 +1,13 @@
 # user_journey_generator.py
 import pandas as pd
+import numpy as np
 import random
 from datetime import datetime, timedelta
 from faker import Faker
 import logging
 from functools import partial
 
+from data.validation import NotNull, OneOf, RuleSet
 from database.connection import read_campaign_data, load_journey_data
 
 logging.basicConfig(level=logging.INFO)
@@ -136,12 +138,93 @@ def generate_user_journeys(campaigns_df, num_users=10000):
     return df
 
 
+TOUCHPOINT_COUNT_WEIGHTS = [30, 25, 20, 15, 5, 3, 1, 1]  # for 1..8 touchpoints per user
+JOURNEY_TYPES = ['impression', 'view', 'click']
+DEVICE_TYPES = ['mobile', 'desktop', 'tablet']
+
+
+def generate_user_journeys_batch(campaigns_df, num_users=10000, seed=None, users_per_chunk=250_000,
+                                 first_user_id=1, p_convert=0.35,
+                                 mid_mix_weights={'impression': 0.7, 'view': 0.3},
+                                 force_first_impression=True, end_time=None, lookback_days=30,
+                                 city_pool_size=1000):
+    """
+    Vectorized counterpart of generate_user_journeys.
+    Draws touchpoint counts, campaigns, gaps, funnel types, devices and cities as
+    NumPy arrays and yields one columnar DataFrame per `users_per_chunk` users.
+    Journeys follow the build_journey_types funnel (impression first, click last
+    for converting users) and timestamps strictly increase within a journey.
+    The same seed and end_time always produce the same data.
+    """
+    rng = np.random.default_rng(seed)
+    city_faker = Faker()
+    city_faker.seed_instance(int(rng.integers(2 ** 31)))
+    cities = pd.Categorical(pd.unique(np.array([city_faker.city() for _ in range(city_pool_size)])))
+
+    campaign_ids = pd.Categorical(campaigns_df['campaign_id'])
+    platforms = pd.Categorical(campaigns_df['platform'])
+    count_weights = np.array(TOUCHPOINT_COUNT_WEIGHTS) / sum(TOUCHPOINT_COUNT_WEIGHTS)
+    mid_events = [JOURNEY_TYPES.index(event) for event in mid_mix_weights]
+    mid_weights = np.array(list(mid_mix_weights.values())) / sum(mid_mix_weights.values())
+
+    end = pd.Timestamp(end_time or datetime.now()).floor('s').value
+    lookback_seconds = lookback_days * 86_400
+
+    for chunk_start in range(0, num_users, users_per_chunk):
+        n_users = min(users_per_chunk, num_users - chunk_start)
+        counts = rng.choice(len(count_weights), size=n_users, p=count_weights) + 1
+        total = int(counts.sum())
+        starts = np.cumsum(counts) - counts
+        last = starts + counts - 1
+        rank = np.arange(total) - np.repeat(starts, counts)
+
+        # Start anywhere in the lookback window, then 1-48h (+0-59 min) between touches
+        user_start = end - rng.integers(0, lookback_seconds, n_users) * 10 ** 9
+        gaps = (rng.integers(1, 49, total) * 3600 + rng.integers(0, 60, total) * 60) * 10 ** 9
+        gaps[starts] = 0
+        elapsed = np.cumsum(gaps)
+        elapsed -= np.repeat(elapsed[starts], counts)
+        timestamps = np.repeat(user_start, counts) + elapsed
+
+        # Funnel: first touch, weighted middle mix, click closing converting journeys
+        types = np.array(mid_events)[rng.choice(len(mid_events), size=total, p=mid_weights)]
+        if force_first_impression:
+            types[starts] = 0
+        else:
+            types[starts] = rng.choice(2, size=n_users, p=[0.8, 0.2])
+        converts = (counts > 1) & (rng.random(n_users) < p_convert)
+        types[last[converts]] = JOURNEY_TYPES.index('click')
+
+        campaign_index = rng.integers(0, len(campaign_ids), total)
+        user_numbers = pd.Series(np.arange(first_user_id + chunk_start, first_user_id + chunk_start + n_users))
+        user_ids = ('user_' + user_numbers.astype(str).str.zfill(6)).to_numpy(dtype=object)
+
+        yield pd.DataFrame({
+            'user_id': np.repeat(user_ids, counts),
+            'timestamp': timestamps.astype('datetime64[ns]'),
+            'platform': platforms.take(campaign_index),
+            'campaign_id': campaign_ids.take(campaign_index),
+            'touchpoints_type': pd.Categorical.from_codes(types, JOURNEY_TYPES),
+            'device_type': pd.Categorical.from_codes(rng.integers(0, len(DEVICE_TYPES), total),
+                                                     DEVICE_TYPES),
+            'geo_location': cities.take(rng.integers(0, len(cities), total)),
+        })
+
+
+JOURNEY_RULES = RuleSet('user journeys', [
+    NotNull('missing_keys', ('user_id', 'timestamp', 'campaign_id'),
+            message="{count} touchpoints without user_id, timestamp or campaign_id"),
+    OneOf('invalid_touchpoints_type', 'touchpoints_type', JOURNEY_TYPES,
+          message="{count} touchpoints with a missing or unknown touchpoints_type"),
+])
+
 def validate_journey_data(df):
-    issues = []
-    null_in_impressions = df[(df['touchpoints_type'] == 'impression') & (df['touchpoints_type'].isnull())]
-    if not null_in_impressions.empty:
-        issues.append('touchpoints_type impression contains null values')
-    return issues
+    return JOURNEY_RULES.validate(df).issues()
+
+def validate_journey_chunks(chunks):
+    """Validate touchpoint chunks lazily, passing every chunk through to the consumer"""
+    return JOURNEY_RULES.validate_chunks(chunks)
+
 
 if __name__ == '__main__':
     campaigns_df = read_campaign_data()
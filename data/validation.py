@@ -0,0 +1,238 @@
+# validation.py
+"""
+Declarative data validation.
+
+A RuleSet is a list of rules: ranges, allowed values, nulls and cross-column
+consistency such as spend ~= clicks * cpc. Each rule returns a boolean
+violation mask computed straight from the chunk's column arrays. Per chunk,
+all rules run in one pass that keeps only counts, a few sample row positions
+and the OR of the masks. No filtered frame is ever built, so validating a
+chunk costs about one byte per row per rule on top of the data.
+
+Chunks may be DataFrames or plain mappings of column name to array (e.g. the
+memory-mapped snapshot partitions), passed one at a time or as a stream:
+
+    report = PERFORMANCE_RULES.validate(stream_of_chunks)
+    report.issues()   # ['12 records with CTR > 3.5%', ...]
+"""
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+Chunk = Union[pd.DataFrame, Mapping[str, Any]]
+
+
+def _column(chunk: Chunk, name: str):
+    """Column values without copying: ndarray, or Categorical for category columns"""
+    values = chunk[name]
+    if isinstance(values, pd.Series):
+        return values.array if isinstance(values.dtype, pd.CategoricalDtype) else values.to_numpy()
+    return values
+
+
+def _numeric(chunk: Chunk, name: str) -> np.ndarray:
+    values = _column(chunk, name)
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'iufb':
+        return values
+    return pd.to_numeric(np.asarray(values), errors='coerce')
+
+
+class Rule:
+    """A named check; violations() is True for every row that breaks it"""
+
+    columns: Sequence[str] = ()
+
+    def __init__(self, name: str, message: Optional[str] = None):
+        self.name = name
+        self.message = message or f"{{count}} records violating {name}"
+
+    def violations(self, chunk: Chunk) -> np.ndarray:
+        raise NotImplementedError
+
+
+class Range(Rule):
+    """Values below `min` or above `max` (bounds themselves are fine, nulls are skipped)"""
+
+    def __init__(self, name: str, column: str, min: Optional[float] = None, max: Optional[float] = None,
+                 message: Optional[str] = None):
+        super().__init__(name, message)
+        self.columns = (column,)
+        self.min, self.max = min, max
+
+    def violations(self, chunk: Chunk) -> np.ndarray:
+        values = _numeric(chunk, self.columns[0])
+        mask = np.zeros(len(values), dtype=bool)
+        if self.min is not None:
+            mask |= values < self.min
+        if self.max is not None:
+            mask |= values > self.max
+        return mask
+
+
+class NonNegative(Rule):
+    """Rows where any of the columns is negative"""
+
+    def __init__(self, name: str, columns: Sequence[str], message: Optional[str] = None):
+        super().__init__(name, message)
+        self.columns = tuple(columns)
+
+    def violations(self, chunk: Chunk) -> np.ndarray:
+        mask = _numeric(chunk, self.columns[0]) < 0
+        for column in self.columns[1:]:
+            mask |= _numeric(chunk, column) < 0
+        return mask
+
+
+class NotNull(Rule):
+    """Rows where any of the columns is missing"""
+
+    def __init__(self, name: str, columns: Sequence[str], message: Optional[str] = None):
+        super().__init__(name, message)
+        self.columns = tuple(columns)
+
+    def violations(self, chunk: Chunk) -> np.ndarray:
+        mask = pd.isna(_column(chunk, self.columns[0]))
+        for column in self.columns[1:]:
+            mask |= pd.isna(_column(chunk, column))
+        return np.asarray(mask, dtype=bool)
+
+
+class OneOf(Rule):
+    """Values outside the allowed set; nulls count as violations unless allow_null"""
+
+    def __init__(self, name: str, column: str, allowed: Iterable, allow_null: bool = False,
+                 message: Optional[str] = None):
+        super().__init__(name, message)
+        self.columns = (column,)
+        self.allowed = pd.Index(list(allowed))
+        self.allow_null = allow_null
+
+    def violations(self, chunk: Chunk) -> np.ndarray:
+        values = _column(chunk, self.columns[0])
+        if isinstance(values, pd.Categorical):
+            # test the categories once and look the codes up
+            bad = np.append(~values.categories.isin(self.allowed), not self.allow_null)
+            return bad[values.codes]
+        mask = self.allowed.get_indexer(values) < 0
+        if self.allow_null:
+            mask &= ~pd.isna(values)
+        return mask
+
+
+class Approx(Rule):
+    """|column - product of `factors`| above `tolerance`, e.g. spend vs clicks * cpc"""
+
+    def __init__(self, name: str, column: str, factors: Sequence[str], tolerance: float,
+                 message: Optional[str] = None):
+        super().__init__(name, message)
+        self.columns = (column, *factors)
+        self.factors = tuple(factors)
+        self.tolerance = tolerance
+
+    def violations(self, chunk: Chunk) -> np.ndarray:
+        expected = _numeric(chunk, self.factors[0]).astype(np.float64)
+        for factor in self.factors[1:]:
+            expected = expected * _numeric(chunk, factor)
+        expected -= _numeric(chunk, self.columns[0])
+        return np.abs(expected, out=expected) > self.tolerance
+
+
+class Check(Rule):
+    """Any other condition: `func(chunk)` returns the violation mask"""
+
+    def __init__(self, name: str, columns: Sequence[str], func: Callable[[Chunk], np.ndarray],
+                 message: Optional[str] = None):
+        super().__init__(name, message)
+        self.columns = tuple(columns)
+        self.func = func
+
+    def violations(self, chunk: Chunk) -> np.ndarray:
+        return np.asarray(self.func(chunk), dtype=bool)
+
+
+class ValidationReport:
+    """Violation counts and sample row positions per rule, accumulated over chunks"""
+
+    def __init__(self, rule_set: 'RuleSet', sample_size: int = 5):
+        self.rule_set = rule_set
+        self.sample_size = sample_size
+        self.rows = 0
+        self.invalid_rows = 0
+        self.counts: Dict[str, int] = {rule.name: 0 for rule in rule_set.rules}
+        self.samples: Dict[str, List[int]] = {rule.name: [] for rule in rule_set.rules}
+
+    @property
+    def ok(self) -> bool:
+        return self.invalid_rows == 0
+
+    def issues(self) -> List[str]:
+        """One message per broken rule, in rule order"""
+        return [rule.message.format(count=self.counts[rule.name]) for rule in self.rule_set.rules
+                if self.counts[rule.name]]
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({'violations': self.counts, 'sample_rows': self.samples}).rename_axis('rule')
+
+    def __repr__(self) -> str:
+        return (f"ValidationReport({self.rule_set.name}: {self.invalid_rows}/{self.rows} invalid rows, "
+                f"{self.issues()})")
+
+
+class RuleSet:
+    """Named list of rules evaluated together over one chunk or a stream of chunks"""
+
+    def __init__(self, name: str, rules: Sequence[Rule]):
+        self.name = name
+        self.rules = list(rules)
+        names = [rule.name for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate rule names in {name}: {names}")
+
+    def check(self, chunk: Chunk, report: ValidationReport) -> np.ndarray:
+        """Fold one chunk into the report, returns the mask of rows breaking any rule"""
+        missing = sorted({column for rule in self.rules for column in rule.columns} - set(chunk.keys()))
+        if missing:
+            raise ValueError(f"{self.name} rules need missing columns {missing}")
+        n = len(chunk) if isinstance(chunk, pd.DataFrame) else len(next(iter(chunk.values()), ()))
+        invalid = np.zeros(n, dtype=bool)
+        for rule in self.rules:
+            mask = rule.violations(chunk)
+            count = int(np.count_nonzero(mask))
+            if count:
+                report.counts[rule.name] += count
+                samples = report.samples[rule.name]
+                if len(samples) < report.sample_size:
+                    positions = np.flatnonzero(mask)[:report.sample_size - len(samples)]
+                    samples.extend((positions + report.rows).tolist())
+                invalid |= mask
+        report.rows += n
+        report.invalid_rows += int(np.count_nonzero(invalid))
+        return invalid
+
+    def validate(self, data: Union[Chunk, Iterable[Chunk]], sample_size: int = 5) -> ValidationReport:
+        """Validate one chunk or every chunk of a stream; sample rows are positions in the stream"""
+        report = ValidationReport(self, sample_size)
+        chunks = [data] if isinstance(data, (pd.DataFrame, Mapping)) else data
+        for chunk in chunks:
+            self.check(chunk, report)
+        return report
+
+    def validate_chunks(self, chunks: Iterable[Chunk], report: Optional[ValidationReport] = None,
+                        raise_on_issues: bool = True) -> Iterator[Chunk]:
+        """
+        Pass chunks through to the consumer while validating them inline. Raises
+        ValueError at the first chunk with violations unless raise_on_issues is False,
+        in which case `report` collects them.
+        """
+        report = report if report is not None else ValidationReport(self)
+        for chunk in chunks:
+            invalid = self.check(chunk, report)
+            if raise_on_issues and invalid.any():
+                logger.warning(f"{self.name} issues: {report.issues()}")
+                raise ValueError(f"{self.name} issues: {report.issues()}")
+            yield chunk
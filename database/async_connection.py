@@ -0,0 +1,242 @@
+# async_connection.py
+"""
+Asyncio counterpart of database.connection on top of asyncpg.
+
+AsyncDatabaseManager mirrors DatabaseManager: a lazily opened pool, a
+db_operation decorator, COPY-based bulk loads through a staging table and
+chunked streaming reads, with the same DatabaseMetrics surface. Decorated
+coroutines receive an asyncpg connection instead of (cursor, conn), and
+queries use asyncpg's $1, $2 placeholders.
+"""
+import asyncio
+import io
+import logging
+import time
+from contextlib import asynccontextmanager
+from functools import wraps
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional, Union
+
+import asyncpg
+from pandas import DataFrame
+
+from config.config import DB_CONFIG, DB_POOL_CONFIG
+from database.connection import DatabaseMetrics, refresh_touchpoint_funnel
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabaseManager:
+    def __init__(self, db_config: Dict[str, Any], min_connections: int = 1,
+                 max_connections: int = 10, checkout_timeout: float = 30.0,
+                 health_check_interval: float = 30.0):
+        self.db_config = db_config
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.checkout_timeout = checkout_timeout
+        # asyncpg closes connections idle for this long instead of pinging them
+        self.max_inactive_connection_lifetime = health_check_interval * 10
+        self.metrics = DatabaseMetrics()
+        self._pool: Optional[asyncpg.Pool] = None
+        self._pool_lock: Optional[asyncio.Lock] = None
+
+    async def pool(self) -> asyncpg.Pool:
+        """Connection pool, opened on first use inside the running event loop"""
+        if self._pool is None:
+            if self._pool_lock is None:
+                self._pool_lock = asyncio.Lock()
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(
+                        min_size=self.min_connections, max_size=self.max_connections,
+                        max_inactive_connection_lifetime=self.max_inactive_connection_lifetime,
+                        **self.db_config)
+                    logger.debug("Async database pool opened")
+        return self._pool
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    def pool_stats(self) -> Dict[str, Any]:
+        if self._pool is None:
+            return {'size': 0, 'idle': 0, 'active': 0}
+        size, idle = self._pool.get_size(), self._pool.get_idle_size()
+        return {'size': size, 'idle': idle, 'active': size - idle,
+                'min_size': self.min_connections, 'max_size': self.max_connections}
+
+    @asynccontextmanager
+    async def get_connection(self, autocommit: bool = False, operation: str = 'get_connection'):
+        """Pooled connection, inside a transaction unless autocommit"""
+        pool = await self.pool()
+        conn = await pool.acquire(timeout=self.checkout_timeout)
+        started = time.perf_counter()
+        try:
+            if autocommit:
+                yield conn
+                return
+            transaction = conn.transaction()
+            await transaction.start()
+            try:
+                yield conn
+            except BaseException as e:
+                await transaction.rollback()
+                self.metrics.observe_transaction(operation, time.perf_counter() - started, 'rollback')
+                logger.error(f"Transaction rolled back due to: {e}")
+                raise
+            else:
+                await transaction.commit()
+                self.metrics.observe_transaction(operation, time.perf_counter() - started, 'commit')
+        finally:
+            await pool.release(conn)
+
+    def db_operation(self, autocommit: bool = False):
+        """Decorator for async database operations, called as func(conn, *args, **kwargs)"""
+
+        def decorator(func: Callable):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                error = False
+                try:
+                    async with self.get_connection(autocommit, func.__name__) as conn:
+                        return await func(conn, *args, **kwargs)
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    self.metrics.observe_call(func.__name__, time.perf_counter() - started, error)
+
+            return wrapper
+
+        return decorator
+
+    async def copy_insert(self, table_name: str, data: Union[DataFrame, Iterable[DataFrame]],
+                          chunk_size: int = 100_000, on_conflict: Optional[str] = "DO NOTHING") -> int:
+        """
+        COPY DataFrame chunks as CSV into a staging table and merge them with
+        ON CONFLICT, like DatabaseManager.copy_insert. CSV encoding runs in a worker
+        thread so other tasks keep the event loop while a chunk is serialized.
+        """
+        if isinstance(data, DataFrame):
+            frame = data
+            data = (frame.iloc[i:i + chunk_size] for i in range(0, len(frame), chunk_size))
+
+        operation = f"copy_insert:{table_name}"
+        staging = f"{table_name}_staging" if on_conflict else table_name
+        columns = None
+        total_copied = 0
+        total_inserted = 0
+        started = time.perf_counter()
+        error = False
+        try:
+            async with self.get_connection(operation=operation) as conn:
+                for chunk in data:
+                    if chunk.empty:
+                        continue
+                    if columns is None:
+                        columns = list(chunk.columns)
+                        column_str = ', '.join(columns)
+                        if on_conflict:
+                            await conn.execute(f"""
+                            CREATE TEMP TABLE {staging} ON COMMIT DROP AS
+                            SELECT {column_str} FROM {table_name} WITH NO DATA
+                            """)
+                    payload = await asyncio.to_thread(
+                        lambda chunk=chunk: chunk.to_csv(columns=columns, index=False, header=False).encode())
+                    await conn.copy_to_table(staging, source=io.BytesIO(payload), columns=columns,
+                                             format='csv')
+                    total_copied += len(chunk)
+                    self.metrics.add(operation, rows=len(chunk), nbytes=len(payload), batches=1)
+
+                if columns is None:
+                    logger.warning("No data to insert")
+                    return 0
+                if on_conflict:
+                    status = await conn.execute(f"""
+                    INSERT INTO {table_name} ({column_str})
+                    SELECT {column_str} FROM {staging}
+                    ON CONFLICT {on_conflict}
+                    """)
+                    total_inserted = int(status.split()[-1])
+                else:
+                    total_inserted = total_copied
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.metrics.observe_call(operation, time.perf_counter() - started, error)
+
+        logger.debug(f"Copied {total_copied} rows into {table_name}, {total_inserted} inserted "
+                     f"in {time.perf_counter() - started:.2f}s")
+        return total_inserted
+
+    async def stream_query(self, query: str, *args, chunk_size: int = 50_000,
+                           dtypes: Optional[Dict[str, str]] = None) -> AsyncIterator[DataFrame]:
+        """Yield a query result as DataFrame chunks from a server-side cursor"""
+        started = time.perf_counter()
+        error = False
+        try:
+            # cursors only live inside a transaction
+            async with self.get_connection(operation='stream_query') as conn:
+                cursor = await conn.cursor(query, *args)
+                while True:
+                    rows = await cursor.fetch(chunk_size)
+                    if not rows:
+                        break
+                    self.metrics.add('stream_query', rows=len(rows), batches=1)
+                    df = DataFrame.from_records(rows, columns=list(rows[0].keys()))
+                    yield df.astype(dtypes) if dtypes else df
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.metrics.observe_call('stream_query', time.perf_counter() - started, error)
+
+
+async_db_manager = AsyncDatabaseManager(DB_CONFIG, **DB_POOL_CONFIG)
+
+
+@async_db_manager.db_operation()
+async def refresh_performance_rollups_async(conn, start_date, end_date) -> int:
+    """Async refresh_performance_rollups"""
+    return await conn.fetchval('SELECT refresh_performance_rollups($1::DATE, $2::DATE)', start_date, end_date)
+
+
+@async_db_manager.db_operation()
+async def bump_table_versions_async(conn, *tables: str):
+    """Async bump_table_versions"""
+    await conn.executemany("""
+    INSERT INTO table_versions (table_name, version, updated_at)
+    VALUES ($1, 1, NOW())
+    ON CONFLICT (table_name) DO UPDATE
+    SET version = table_versions.version + 1,
+        updated_at = NOW()
+    """, [(table,) for table in tables])
+
+
+async def load_campaign_data_async(campaigns_df: DataFrame) -> int:
+    loaded = await async_db_manager.copy_insert('campaigns', campaigns_df)
+    if loaded:
+        await bump_table_versions_async('campaigns')
+    return loaded
+
+
+async def load_performance_data_async(performance_df: DataFrame, refresh_rollups: bool = True) -> int:
+    loaded = await async_db_manager.copy_insert('daily_performance', performance_df)
+    if refresh_rollups and len(performance_df):
+        await refresh_performance_rollups_async(performance_df['date'].min(), performance_df['date'].max())
+    if loaded:
+        await bump_table_versions_async('daily_performance')
+    return loaded
+
+
+async def load_journey_data_async(journey_df: DataFrame, refresh_funnel: bool = True) -> int:
+    loaded = await async_db_manager.copy_insert('user_touchpoints', journey_df)
+    if refresh_funnel and loaded:
+        # The id-watermarked merge lives on the sync path; run it off the event loop
+        await asyncio.to_thread(refresh_touchpoint_funnel)
+    if loaded:
+        await bump_table_versions_async('user_touchpoints')
+    return loaded
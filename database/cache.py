@@ -0,0 +1,183 @@
+# cache.py
+"""
+In-process result cache for attribution credits and aggregate frames.
+
+Entries are keyed by the caller's key (model, date range, filters, ...) plus
+the data version of every table the result was computed from. The loaders bump
+those versions in table_versions, so the first lookup after a load misses and
+recomputes; entries of the superseded version are dropped as soon as the new
+version is seen. Entries also expire after a TTL, and the least recently used
+ones are evicted once the cache holds more than `max_bytes`.
+"""
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.config import CACHE_CONFIG
+from database.connection import read_table_versions
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_MISSING = object()  # miss marker, so a cached None is still a hit
+
+
+def _freeze(value) -> Hashable:
+    """Hashable form of nested call arguments (dicts, lists, sets)"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_freeze(item) for item in value))
+    return value
+
+
+def _size_of(value) -> int:
+    """Approximate memory held by a cached result, in bytes"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _copy_of(value):
+    """Callers get their own copy, so mutating a result never corrupts the cache"""
+    return value.copy() if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)) else value
+
+
+class ResultCache:
+    """Thread-safe, memory-bounded LRU cache with TTLs and table-version invalidation"""
+
+    def __init__(self, max_bytes: int = 256 * 1024 ** 2, ttl: float = 600.0,
+                 version_check_interval: float = 5.0,
+                 version_reader: Callable[[Iterable[str]], Dict[str, int]] = read_table_versions):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        self._read_versions = version_reader
+        # key -> (value, size, expires_at, versions)
+        self._entries: 'OrderedDict[Tuple, Tuple[Any, int, float, Tuple]]' = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._versions_checked: Dict[str, float] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0,
+                       'invalidations': 0, 'uncacheable': 0}
+
+    def table_versions(self, tables: Iterable[str]) -> Tuple[Tuple[str, int], ...]:
+        """Data versions of `tables`, re-read from the database at most every version_check_interval"""
+        tables = sorted(set(tables))
+        now = time.monotonic()
+        with self._lock:
+            stale = [table for table in tables
+                     if now - self._versions_checked.get(table, float('-inf')) >= self.version_check_interval]
+        if stale:
+            fresh = self._read_versions(stale)
+            with self._lock:
+                changed = {table for table, version in fresh.items()
+                           if table in self._versions and self._versions[table] != version}
+                self._versions.update(fresh)
+                self._versions_checked.update((table, now) for table in stale)
+                if changed:
+                    self._drop_versions_of(changed)
+        with self._lock:
+            return tuple((table, self._versions[table]) for table in tables)
+
+    def _drop_versions_of(self, tables):
+        """Drop entries computed from an older version of any of `tables` (lock held)"""
+        outdated = [key for key, (_, _, _, versions) in self._entries.items()
+                    if any(table in tables and version != self._versions[table] for table, version in versions)]
+        for key in outdated:
+            self._remove(key)
+        self._stats['invalidations'] += len(outdated)
+        if outdated:
+            logger.debug(f"Invalidated {len(outdated)} cached results after loads into {sorted(tables)}")
+
+    def _remove(self, key):
+        _, size, _, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key: Tuple, default=None):
+        """Cached value of a full key (caller key + versions), or `default`"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return default
+            value, _, expires_at, _ = entry
+            if time.monotonic() >= expires_at:
+                self._remove(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+        return _copy_of(value)
+
+    def put(self, key: Tuple, value, ttl: Optional[float] = None):
+        size = _size_of(value)
+        versions = key[-1]
+        with self._lock:
+            if size > self.max_bytes:
+                self._stats['uncacheable'] += 1
+                logger.debug(f"Result of {size:,} bytes exceeds the cache size, not cached")
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + (self.ttl if ttl is None else ttl), versions)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], tables: Iterable[str],
+                       ttl: Optional[float] = None):
+        """Cached result for `key` at the current versions of `tables`, computed on a miss"""
+        full_key = (_freeze(key), self.table_versions(tables))
+        value = self.get(full_key, _MISSING)
+        if value is _MISSING:
+            started = time.perf_counter()
+            value = compute()
+            logger.debug(f"Computed {key} in {time.perf_counter() - started:.3f}s")
+            self.put(full_key, value, ttl)
+            return _copy_of(value)
+        return value
+
+    def cached(self, tables: Iterable[str], ttl: Optional[float] = None):
+        """Decorator caching a function's results by its arguments and the versions of `tables`"""
+        tables = tuple(tables)
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                key = (func.__module__, func.__qualname__, _freeze(args), _freeze(kwargs))
+                return self.get_or_compute(key, lambda: func(*args, **kwargs), tables, ttl)
+            wrapper.cache = self
+            return wrapper
+        return decorator
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats['hits'] + stats['misses']
+            stats.update(entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes,
+                         hit_rate=stats['hits'] / lookups if lookups else 0.0)
+        return stats
+
+
+result_cache = ResultCache(**CACHE_CONFIG)
@@ -1,30 +1,403 @@
+import bisect
+import hashlib
+import io
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
+import threading
+import time
+import uuid
+from collections import deque
 from contextlib import contextmanager
 from functools import wraps
 import logging
-from typing import Optional, Dict, Any, List, Callable
-from config.config import DB_CONFIG
+from typing import Optional, Dict, Any, List, Callable, Iterable, Iterator, Union
+from config.config import DB_CONFIG, DB_POOL_CONFIG
 from pandas import DataFrame
+from pandas.util import hash_pandas_object
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class PoolTimeout(Exception):
+    """No pooled connection became free within the checkout timeout"""
+
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile"""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'count': self.count, 'sum': self.sum, 'p50': self.quantile(0.5),
+                'p95': self.quantile(0.95), 'p99': self.quantile(0.99),
+                'buckets': dict(zip([*map(str, self.buckets), '+Inf'], self.counts))}
+
+
+class DatabaseMetrics:
+    """
+    Thread-safe counters and histograms per database operation: call latency,
+    errors, rows, bytes and batches moved, and transaction durations by outcome.
+    Operations are the db_operation-decorated function names plus the loaders
+    ('bulk_insert:<table>', 'copy_insert:<table>') and 'stream_query'.
+    """
+
+    COUNTERS = ('calls', 'errors', 'rows', 'bytes', 'batches')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._latency: Dict[str, Histogram] = {}
+        self._transactions: Dict[tuple, Histogram] = {}  # (operation, 'commit' | 'rollback')
+
+    def _operation(self, operation: str) -> Dict[str, int]:
+        counters = self._counters.get(operation)
+        if counters is None:
+            counters = self._counters[operation] = dict.fromkeys(self.COUNTERS, 0)
+            self._latency[operation] = Histogram()
+        return counters
+
+    def observe_call(self, operation: str, seconds: float, error: bool = False):
+        with self._lock:
+            counters = self._operation(operation)
+            counters['calls'] += 1
+            counters['errors'] += error
+            self._latency[operation].observe(seconds)
+
+    def add(self, operation: str, rows: int = 0, nbytes: int = 0, batches: int = 0):
+        with self._lock:
+            counters = self._operation(operation)
+            counters['rows'] += rows
+            counters['bytes'] += nbytes
+            counters['batches'] += batches
+
+    def observe_transaction(self, operation: str, seconds: float, outcome: str):
+        with self._lock:
+            self._operation(operation)
+            self._transactions.setdefault((operation, outcome), Histogram()).observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._latency.clear()
+            self._transactions.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-operation counters, latency and transaction histograms as plain dicts"""
+        with self._lock:
+            return {
+                operation: {
+                    **counters,
+                    'latency': self._latency[operation].snapshot(),
+                    'transactions': {outcome: histogram.snapshot()
+                                     for (op, outcome), histogram in self._transactions.items()
+                                     if op == operation},
+                }
+                for operation, counters in self._counters.items()
+            }
+
+    @staticmethod
+    def _histogram_lines(name: str, labels: str, histogram: Histogram) -> List[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip([*map(str, histogram.buckets), '+Inf'], histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+        lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return lines
+
+    def prometheus_text(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = ['# HELP db_operation_seconds Latency of database operations',
+                     '# TYPE db_operation_seconds histogram']
+            for operation, histogram in sorted(self._latency.items()):
+                lines += self._histogram_lines('db_operation_seconds', f'operation="{operation}"', histogram)
+            for counter, help_text in (('calls', 'Database operation calls'),
+                                       ('errors', 'Database operations that raised'),
+                                       ('rows', 'Rows written or read'),
+                                       ('bytes', 'Bytes sent to the server'),
+                                       ('batches', 'Batches, COPY chunks and fetches')):
+                lines += [f'# HELP db_operation_{counter}_total {help_text}',
+                          f'# TYPE db_operation_{counter}_total counter']
+                lines += [f'db_operation_{counter}_total{{operation="{operation}"}} {counters[counter]}'
+                          for operation, counters in sorted(self._counters.items())]
+            lines += ['# HELP db_transaction_seconds Time from cursor open to commit or rollback',
+                      '# TYPE db_transaction_seconds histogram']
+            for (operation, outcome), histogram in sorted(self._transactions.items()):
+                lines += self._histogram_lines('db_transaction_seconds',
+                                               f'operation="{operation}",outcome="{outcome}"', histogram)
+        return '\n'.join(lines) + '\n'
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections with health checks on checkout"""
+
+    def __init__(self, db_config: Dict[str, Any], min_size: int = 1, max_size: int = 10,
+                 timeout: float = 30.0, health_check_interval: float = 30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+        self.db_config = db_config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle = deque()  # (connection, last released at)
+        self._size = 0        # open connections, idle + checked out
+        self._closed = False
+        self._condition = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_discarded': 0,
+            'health_check_failures': 0,
+        }
+
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.db_config)
+        with self._condition:
+            self._size += 1
+            self._stats['connections_created'] += 1
+        logger.debug("Database connection established")
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._condition:
+            self._size -= 1
+            self._stats['connections_discarded'] += 1
+            self._condition.notify()
+        logger.debug("Database connection closed")
+
+    def _healthy(self, conn, idle_since: float) -> bool:
+        """Cheap checks always, a round trip only for connections idle past the interval"""
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Check out a healthy connection, waiting for one when the pool is exhausted"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        waited = False
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(f"No connection available after {timeout}s "
+                                          f"(max_size={self.max_size})")
+                    waited = True
+                    self._condition.wait(remaining)
+                candidate = self._idle.pop() if self._idle else None
+                if candidate is None:
+                    self._size += 1  # reserve the slot while connecting outside the lock
+
+            if candidate is None:
+                try:
+                    conn = psycopg2.connect(**self.db_config)
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self._stats['connections_created'] += 1
+                logger.debug("Database connection established")
+                break
+
+            conn, idle_since = candidate
+            if self._healthy(conn, idle_since):
+                break
+            with self._condition:
+                self._stats['health_check_failures'] += 1
+            self._discard(conn)
+
+        with self._condition:
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time'] += time.monotonic() - started
+        return conn
+
+    def release(self, conn, discard: bool = False):
+        """Return a connection to the pool, resetting any open transaction"""
+        if not discard and not conn.closed:
+            try:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                conn.autocommit = False
+            except psycopg2.Error:
+                discard = True
+        if discard or conn.closed or self._closed:
+            self._discard(conn)
+            return
+        with self._condition:
+            self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    def close(self):
+        """Close every idle connection; checked out ones close when released"""
+        with self._condition:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool counters and current occupancy"""
+        with self._condition:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['active'] = self._size - len(self._idle)
+            stats['min_size'] = self.min_size
+            stats['max_size'] = self.max_size
+        return stats
+
+
+def chunk_digest(chunk: DataFrame) -> str:
+    """Content hash of a chunk: its column names and row values, independent of the index"""
+    digest = hashlib.sha256('\x1f'.join(map(str, chunk.columns)).encode())
+    digest.update(hash_pandas_object(chunk, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
 class DatabaseManager:
-    def __init__(self, db_config: Dict[str, Any]):
+    def __init__(self, db_config: Dict[str, Any], min_connections: int = 1,
+                 max_connections: int = 10, checkout_timeout: float = 30.0,
+                 health_check_interval: float = 30.0):
         self.db_config = db_config
+        self.pool_config = {
+            'min_size': min_connections,
+            'max_size': max_connections,
+            'timeout': checkout_timeout,
+            'health_check_interval': health_check_interval,
+        }
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.metrics = DatabaseMetrics()
+        self._current = threading.local()  # operation whose transaction get_cursor is running
+
+    @property
+    def pool(self) -> ConnectionPool:
+        """Connection pool, opened on first use so importing this module stays offline"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ConnectionPool(self.db_config, **self.pool_config)
+        return self._pool
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Checkouts, waits, wait time and active connections of the pool"""
+        return self.pool.stats()
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """Per-operation metrics plus pool statistics, for in-process inspection"""
+        return {'operations': self.metrics.snapshot(),
+                'pool': self._pool.stats() if self._pool is not None else None}
+
+    def prometheus_metrics(self) -> str:
+        """Operation metrics and pool gauges in the Prometheus text format"""
+        text = self.metrics.prometheus_text()
+        if self._pool is not None:
+            stats = self._pool.stats()
+            text += '# HELP db_pool_connections Pooled connections by state\n# TYPE db_pool_connections gauge\n'
+            text += ''.join(f'db_pool_connections{{state="{state}"}} {stats[state]}\n'
+                            for state in ('idle', 'active', 'size'))
+            text += ('# HELP db_pool_wait_seconds_total Time spent waiting for a free connection\n'
+                     '# TYPE db_pool_wait_seconds_total counter\n'
+                     f'db_pool_wait_seconds_total {stats["wait_time"]}\n')
+        return text
+
+    @contextmanager
+    def _operation(self, name: str):
+        """Attribute the enclosed calls and transactions to `name` and time them"""
+        previous = getattr(self._current, 'operation', None)
+        self._current.operation = name
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self._current.operation = previous
+            self.metrics.observe_call(name, time.perf_counter() - started, error)
+
+    def close(self):
+        """
+        Shut the pool down: idle connections close now, checked out ones when they
+        are released. The next operation opens a fresh pool (e.g. after db_config changed).
+        """
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
 
     @contextmanager
     def get_connection(self, autocommit: bool = False):
-        """Context manager for database connections"""
+        """Context manager for pooled database connections"""
         conn = None
+        broken = False
+        # released into the pool it came from, which discards it if close() ran meanwhile
+        pool = self.pool
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pool.acquire()
             if autocommit:
                 conn.autocommit = True
-            logger.info("Database connection established")
             yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            logger.error(f"Database error: {e}")
+            broken = True
+            raise
         except psycopg2.Error as e:
             logger.error(f"Database error: {e}")
             if conn:
@@ -37,8 +410,7 @@ class DatabaseManager:
             raise
         finally:
             if conn:
-                conn.close()
-                logger.info("Database connection closed")
+                pool.release(conn, discard=broken)
 
     @contextmanager
     def get_cursor(self, autocommit: bool = False, dict_cursor: bool = False):
@@ -46,16 +418,21 @@ class DatabaseManager:
         with self.get_connection(autocommit=autocommit) as conn:
             cursor_factory = psycopg2.extras.DictCursor if dict_cursor else None
             cursor = conn.cursor(cursor_factory=cursor_factory)
+            operation = getattr(self._current, 'operation', None) or 'get_cursor'
+            started = time.perf_counter()
             try:
                 yield cursor, conn
             except Exception as e:
                 conn.rollback()
+                if not autocommit:
+                    self.metrics.observe_transaction(operation, time.perf_counter() - started, 'rollback')
                 logger.error(f"Transaction rolled back due to: {e}")
                 raise
             else:
                 if not autocommit:
                     conn.commit()
-                    logger.info("Transaction committed")
+                    self.metrics.observe_transaction(operation, time.perf_counter() - started, 'commit')
+                    logger.debug("Transaction committed")
             finally:
                 cursor.close()
 
@@ -65,8 +442,9 @@ class DatabaseManager:
         def decorator(func: Callable):
             @wraps(func)
             def wrapper(*args, **kwargs):
-                with self.get_cursor(autocommit=autocommit, dict_cursor=dict_cursor) as (cursor, conn):
-                    return func(cursor, conn, *args, **kwargs)
+                with self._operation(func.__name__):
+                    with self.get_cursor(autocommit=autocommit, dict_cursor=dict_cursor) as (cursor, conn):
+                        return func(cursor, conn, *args, **kwargs)
 
             return wrapper
 
@@ -92,8 +470,9 @@ class DatabaseManager:
         """
 
         total_inserted = 0
+        operation = f"bulk_insert:{table_name}"
 
-        with self.get_cursor() as (cursor, conn):
+        with self._operation(operation), self.get_cursor() as (cursor, conn):
             try:
                 for i in range(0, len(data), batch_size):
                     batch = data[i:i + batch_size]
@@ -105,39 +484,256 @@ class DatabaseManager:
 
                     batch_count = cursor.rowcount
                     total_inserted += batch_count
-                    logger.info(f"Inserted batch {i // batch_size + 1}: {batch_count} records")
+                    self.metrics.add(operation, rows=batch_count, nbytes=len(cursor.query), batches=1)
+                    logger.debug(f"Inserted batch {i // batch_size + 1}: {batch_count} records")
 
-                logger.info(f"Total records inserted: {total_inserted}")
+                logger.debug(f"Total records inserted: {total_inserted}")
                 return total_inserted
 
             except Exception as e:
                 logger.error(f"Bulk insert failed: {e}")
                 raise
 
-db_manager = DatabaseManager(DB_CONFIG)
+    def _copy_chunks(self, cursor, table_name: str, chunks: Iterable[DataFrame],
+                     on_conflict: Optional[str], operation: str, before_merge: Optional[tuple] = None):
+        """COPY chunks into the target (or its staging table) on one cursor, returns (copied, inserted)"""
+        staging = f"{table_name}_staging" if on_conflict else table_name
+        columns = None
+        total_copied = 0
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            if columns is None:
+                columns = list(chunk.columns)
+                column_str = ', '.join(columns)
+                if on_conflict:
+                    # Only the loaded columns, so SERIAL keys and defaults stay on the target
+                    cursor.execute(f"""
+                    CREATE TEMP TABLE {staging} ON COMMIT DROP AS
+                    SELECT {column_str} FROM {table_name} WITH NO DATA
+                    """)
 
+            buffer = io.StringIO()
+            chunk.to_csv(buffer, columns=columns, index=False, header=False)
+            copied_bytes = buffer.tell()
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {staging} ({column_str}) FROM STDIN WITH (FORMAT csv)", buffer)
+            total_copied += len(chunk)
+            self.metrics.add(operation, rows=len(chunk), nbytes=copied_bytes, batches=1)
 
+        if before_merge and on_conflict:
+            # runs for an empty load too, which then replaces rows with nothing
+            cursor.execute(*before_merge)
+        if columns is None or not on_conflict:
+            return total_copied, total_copied
+        cursor.execute(f"""
+        INSERT INTO {table_name} ({column_str})
+        SELECT {column_str} FROM {staging}
+        ON CONFLICT {on_conflict}
+        """)
+        return total_copied, cursor.rowcount
 
-@db_manager.db_operation(autocommit=False, dict_cursor=True)
-def load_campaign_data(cursor, conn, campaigns_df):
-    """Load campaign data using decorated function"""
+    def copy_insert(self, table_name: str, data: Union[DataFrame, Iterable[DataFrame]],
+                    chunk_size: int = 100_000, on_conflict: str = "DO NOTHING",
+                    before_merge: Optional[tuple] = None):
+        """
+        Streaming bulk load through COPY.
+        DataFrame chunks are written as CSV into an in-memory buffer and copied into a
+        temporary staging table, which is merged into the target with ON CONFLICT in
+        a single statement. With on_conflict=None the chunks are copied straight into
+        the target. `data` may be one DataFrame or an iterable of chunks.
+        before_merge, a (query, params) tuple, runs in the same transaction right
+        before the merge, e.g. to delete the rows the load replaces.
+        """
+        if isinstance(data, DataFrame):
+            frame = data
+            data = (frame.iloc[i:i + chunk_size] for i in range(0, len(frame), chunk_size))
+
+        started = time.perf_counter()
+        operation = f"copy_insert:{table_name}"
+        with self._operation(operation), self.get_cursor() as (cursor, conn):
+            total_copied, total_inserted = self._copy_chunks(cursor, table_name, data, on_conflict, operation,
+                                                             before_merge)
+        if not total_copied:
+            logger.warning("No data to insert")
+            return 0
+
+        elapsed = time.perf_counter() - started
+        rate = total_copied / elapsed if elapsed > 0 else float('inf')
+        logger.debug(f"Copied {total_copied} rows into {table_name}, {total_inserted} inserted "
+                    f"in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+        return total_inserted
+
+    def checkpointed_copy_insert(self, table_name: str, data: Union[DataFrame, Iterable[DataFrame]],
+                                 load_id: str, chunk_size: int = 100_000,
+                                 on_conflict: str = "DO NOTHING") -> int:
+        """
+        Resumable copy_insert: every chunk is merged and committed in its own
+        transaction together with a load_checkpoints row keyed by (load_id, content
+        hash), and chunks this load_id already committed are skipped. A failed load
+        re-run under the same load_id resumes after its last committed chunk; the
+        natural-key constraints keep overlapping rows from being duplicated. Other
+        load ids never see these checkpoints, see clear_load_checkpoints.
+        """
+        if not load_id:
+            raise ValueError("A checkpointed load needs a load_id to resume under")
+        frames = [data] if isinstance(data, DataFrame) else data
+        # frames are re-sliced too, so a commit never holds more than chunk_size rows
+        data = (frame.iloc[i:i + chunk_size] for frame in frames for i in range(0, len(frame), chunk_size))
+
+        started = time.perf_counter()
+        operation = f"copy_insert:{table_name}"
+        with self.get_cursor() as (cursor, conn):
+            cursor.execute("SELECT chunk_hash FROM load_checkpoints WHERE load_id = %s AND table_name = %s",
+                           (load_id, table_name))
+            committed = {row[0] for row in cursor.fetchall()}
+
+        total_inserted = chunks_loaded = chunks_skipped = 0
+        for chunk in data:
+            if chunk.empty:
+                continue
+            digest = chunk_digest(chunk)
+            if digest in committed:
+                chunks_skipped += 1
+                continue
+            with self._operation(operation), self.get_cursor() as (cursor, conn):
+                copied, inserted = self._copy_chunks(cursor, table_name, [chunk], on_conflict, operation)
+                cursor.execute("""
+                INSERT INTO load_checkpoints (table_name, chunk_hash, load_id, rows_copied, rows_inserted)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (load_id, table_name, chunk_hash) DO NOTHING
+                """, (table_name, digest, load_id, copied, inserted))
+            committed.add(digest)
+            total_inserted += inserted
+            chunks_loaded += 1
+
+        logger.info(f"Checkpointed load {load_id} into {table_name}: {chunks_loaded} chunks committed, "
+                    f"{chunks_skipped} already loaded, {total_inserted} rows inserted "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return total_inserted
+
+    def stream_query(self, query: str, params: Optional[tuple] = None, chunk_size: int = 50_000,
+                     dtypes: Optional[Dict[str, str]] = None) -> Iterator[DataFrame]:
+        """
+        Yield the result of a query as DataFrame chunks from a named server-side cursor.
+        At most `chunk_size` rows are held client side at a time; the connection
+        stays checked out until the generator is exhausted or closed.
+        """
+        # Timed by hand: a generator suspended at yield must not leave its name on the thread
+        started = time.perf_counter()
+        error = False
+        with self.get_connection() as conn:
+            cursor = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+            cursor.itersize = chunk_size
+            try:
+                cursor.execute(query, params)
+                columns = None
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    if columns is None:
+                        columns = [desc[0] for desc in cursor.description]
+                    self.metrics.add('stream_query', rows=len(rows), batches=1)
+                    df = DataFrame.from_records(rows, columns=columns)
+                    yield df.astype(dtypes) if dtypes else df
+            except Exception:
+                error = True
+                raise
+            finally:
+                cursor.close()
+                self.metrics.observe_call('stream_query', time.perf_counter() - started, error)
+
+db_manager = DatabaseManager(DB_CONFIG, **DB_POOL_CONFIG)
+
+
+
+def load_campaign_data(campaigns_df):
+    """Load campaign data through the COPY loader"""
+    loaded = db_manager.copy_insert('campaigns', campaigns_df)
+    if loaded:
+        bump_table_versions('campaigns')
+    return loaded
 
-    data = campaigns_df.to_dict('records')
 
-    # Using bulk insert
-    return db_manager.bulk_insert('campaigns', data, batch_size=500)
 
+def _loader(load_id: Optional[str]) -> Callable:
+    """copy_insert, or its checkpointed form resumable under load_id"""
+    if load_id is None:
+        return db_manager.copy_insert
+    return lambda table_name, data: db_manager.checkpointed_copy_insert(table_name, data, load_id)
 
 
-def load_performance_data(performance_df):
-    """Load performance data using context manager"""
-    # Convert and bulk insert
-    data = performance_df.to_dict('records')
-    return db_manager.bulk_insert('daily_performance', data, batch_size=1000)
+def load_performance_data(performance_df, refresh_rollups: bool = True, load_id: Optional[str] = None):
+    """
+    Load performance data through the COPY loader and refresh the rollup periods it
+    touches. With a load_id it commits chunk by chunk and skips the chunks an
+    earlier attempt under that id committed.
+    """
+    frames = [performance_df] if isinstance(performance_df, DataFrame) else performance_df
+    dates = []
 
-def load_journey_data(journey_df):
-    data = journey_df.to_dict('records')
-    return db_manager.bulk_insert('user_touchpoints', data, batch_size=1000)
+    def track_dates(frames):
+        for frame in frames:
+            if len(frame):
+                dates.extend((frame['date'].min(), frame['date'].max()))
+            yield frame
+
+    loaded = _loader(load_id)('daily_performance', track_dates(frames))
+    if refresh_rollups and dates:
+        refresh_performance_rollups(min(dates), max(dates))
+    if loaded:
+        bump_table_versions('daily_performance')
+    return loaded
+
+
+@db_manager.db_operation(autocommit=False)
+def refresh_performance_rollups(cursor, conn, start_date, end_date) -> int:
+    """Rebuild the performance_rollups weeks and months overlapping [start_date, end_date]"""
+    cursor.execute('SELECT refresh_performance_rollups(%s::DATE, %s::DATE)', (start_date, end_date))
+    refreshed = cursor.fetchone()[0]
+    logger.debug(f"Refreshed {refreshed} rollup rows for {start_date} to {end_date}")
+    return refreshed
+
+def load_journey_data(journey_df, refresh_funnel: bool = True, load_id: Optional[str] = None):
+    """
+    Load touchpoints through the COPY loader and merge them into touchpoint_funnel,
+    so funnel reads never have to refresh it themselves
+    """
+    loaded = _loader(load_id)('user_touchpoints', journey_df)
+    if loaded:
+        if refresh_funnel:
+            refresh_touchpoint_funnel()
+        bump_table_versions('user_touchpoints')
+    return loaded
+
+
+@db_manager.db_operation(autocommit=False)
+def clear_load_checkpoints(cursor, conn, load_id: str) -> int:
+    """Forget the checkpoints of a finished load, so its id can load the same data again"""
+    cursor.execute('DELETE FROM load_checkpoints WHERE load_id = %s', (load_id,))
+    return cursor.rowcount
+
+
+@db_manager.db_operation(autocommit=False)
+def bump_table_versions(cursor, conn, *tables: str):
+    """Advance the data version of the given tables, invalidating results cached from them"""
+    psycopg2.extras.execute_values(cursor, """
+    INSERT INTO table_versions (table_name, version, updated_at)
+    VALUES %s
+    ON CONFLICT (table_name) DO UPDATE
+    SET version = table_versions.version + 1,
+        updated_at = NOW()
+    """, [(table, 1) for table in tables], template='(%s, %s, NOW())')
+
+
+@db_manager.db_operation(autocommit=True)
+def read_table_versions(cursor, conn, tables: Iterable[str]) -> Dict[str, int]:
+    """Current data version of the given tables, 0 for tables never loaded"""
+    tables = list(tables)
+    cursor.execute('select table_name, version from table_versions where table_name = ANY(%s)', (tables,))
+    versions = dict(cursor.fetchall())
+    return {table: versions.get(table, 0) for table in tables}
 
 
 # Example 3: Data quality check decorator
@@ -179,3 +775,108 @@ def read_campaign_data(cursor, conn):
     df = DataFrame.from_records(cursor.fetchall(),
                                    columns=[desc[0] for desc in cursor.description])
     return df
+
+
+CAMPAIGN_DTYPES = {
+    'platform': 'category',
+    'product': 'string',
+    'campaign_type': 'category',
+    'daily_budget': 'float64',
+    'status': 'category',
+    'created_date': 'datetime64[ns]',
+}
+
+
+def stream_campaign_data(chunk_size: int = 50_000) -> Iterator[DataFrame]:
+    """Stream campaign data in typed chunks through a server-side cursor"""
+    return db_manager.stream_query('select * from campaigns order by campaign_id',
+                                   chunk_size=chunk_size, dtypes=CAMPAIGN_DTYPES)
+
+
+@db_manager.db_operation(autocommit=True)
+def read_id_watermark(cursor, conn, pipeline: str) -> Optional[int]:
+    """Last user_touchpoints id an ingestion-ordered pipeline has processed, None before its first run"""
+    cursor.execute('select high_id from etl_watermarks where pipeline = %s', (pipeline,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def write_id_watermark(cursor, pipeline: str, high_id: int):
+    """Advance the id watermark inside the caller's transaction"""
+    cursor.execute("""
+    INSERT INTO etl_watermarks (pipeline, high_id, updated_at)
+    VALUES (%s, %s, NOW())
+    ON CONFLICT (pipeline) DO UPDATE
+    SET high_id = GREATEST(etl_watermarks.high_id, EXCLUDED.high_id),
+        updated_at = NOW()
+    """, (pipeline, high_id))
+
+
+@db_manager.db_operation(autocommit=False)
+def committed_touchpoint_id(cursor, conn) -> Optional[int]:
+    """
+    Highest user_touchpoints id such that no lower id can still be committed later.
+    SHARE mode waits out every open writer and keeps new ones from taking ids
+    until this short transaction ends.
+    """
+    cursor.execute('LOCK TABLE user_touchpoints IN SHARE MODE')
+    cursor.execute('SELECT max(id) FROM user_touchpoints')
+    return cursor.fetchone()[0]
+
+
+FUNNEL_PIPELINE = 'touchpoint_funnel'
+
+
+def refresh_touchpoint_funnel(rebuild: bool = False) -> int:
+    """
+    Merge touchpoints ingested since the funnel's id watermark into touchpoint_funnel,
+    or rebuild it from every touchpoint. Ids follow ingestion order, so late and
+    backfilled events are merged whatever their timestamp.
+    """
+    # Bound the batch up front: every id up to it is committed, later ones wait for the next run
+    bound = committed_touchpoint_id()
+    if bound is None and not rebuild:
+        return 0
+    return merge_touchpoint_funnel(bound, rebuild)
+
+
+@db_manager.db_operation(autocommit=False)
+def merge_touchpoint_funnel(cursor, conn, bound: Optional[int], rebuild: bool = False) -> int:
+    """Merge touchpoints with ids in (watermark, bound] into touchpoint_funnel in one transaction"""
+    if rebuild:
+        cursor.execute('TRUNCATE touchpoint_funnel')
+        watermark = None
+    else:
+        cursor.execute('select high_id from etl_watermarks where pipeline = %s FOR UPDATE', (FUNNEL_PIPELINE,))
+        row = cursor.fetchone()
+        watermark = row[0] if row else None
+        if watermark is not None and watermark >= bound:
+            return 0
+    if bound is None:
+        return 0
+
+    # LEAST ignores NULLs, so a stage first seen in this batch fills in and an earlier one is kept;
+    # re-merging a row is a no-op, so batches may overlap safely
+    cursor.execute("""
+    INSERT INTO touchpoint_funnel (user_id, campaign_id, platform, impression_time, view_time, click_time)
+    SELECT
+        user_id,
+        campaign_id,
+        platform,
+        MIN(timestamp) FILTER (WHERE touchpoints_type = 'impression'),
+        MIN(timestamp) FILTER (WHERE touchpoints_type = 'view'),
+        MIN(timestamp) FILTER (WHERE touchpoints_type = 'click')
+    FROM user_touchpoints
+    WHERE id > COALESCE(%s, -1) AND id <= %s
+      AND campaign_id IS NOT NULL
+    GROUP BY user_id, campaign_id, platform
+    ON CONFLICT (user_id, campaign_id, platform) DO UPDATE
+    SET impression_time = LEAST(touchpoint_funnel.impression_time, EXCLUDED.impression_time),
+        view_time = LEAST(touchpoint_funnel.view_time, EXCLUDED.view_time),
+        click_time = LEAST(touchpoint_funnel.click_time, EXCLUDED.click_time),
+        updated_at = NOW()
+    """, (watermark, bound))
+    merged = cursor.rowcount
+    write_id_watermark(cursor, FUNNEL_PIPELINE, bound)
+    logger.info(f"{'Rebuilt' if rebuild else 'Merged'} {merged} funnel rows from touchpoints up to id {bound}")
+    return merged
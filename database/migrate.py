@@ -0,0 +1,92 @@
+# migrate.py
+"""
+Versioned schema migrations on top of database/schema.sql.
+
+Migrations are the files database/migrations/NNNN_description.sql. Each one
+runs in its own transaction and is recorded in schema_migrations, so running
+this module again only applies what is new.
+
+    python -m database.migrate
+"""
+import logging
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from database.connection import db_manager
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent / 'migrations'
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+MIGRATION_LOCK_ID = 20_250_811  # pg_advisory_xact_lock key, one migrator at a time
+
+
+def discover_migrations(directory: Path = MIGRATIONS_DIR) -> List[Tuple[int, str, Path]]:
+    """(version, name, path) of every migration file, ordered by version"""
+    migrations = []
+    for path in sorted(directory.glob('*.sql')):
+        match = MIGRATION_FILE.match(path.name)
+        if not match:
+            logger.warning(f"Skipping {path.name}: not named NNNN_description.sql")
+            continue
+        migrations.append((int(match.group(1)), match.group(2), path))
+    return migrations
+
+
+@db_manager.db_operation(autocommit=False)
+def applied_versions(cursor, conn) -> List[int]:
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        applied_at TIMESTAMP DEFAULT NOW()
+    )
+    """)
+    cursor.execute('select version from schema_migrations order by version')
+    return [row[0] for row in cursor.fetchall()]
+
+
+def apply_migrations(target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations up to `target` (all when None), returns applied versions"""
+    done = set(applied_versions())
+    applied = []
+    for version, name, path in discover_migrations():
+        if version in done or (target is not None and version > target):
+            continue
+        with db_manager.get_cursor() as (cursor, conn):
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATION_LOCK_ID,))
+            # another migrator may have applied it while we waited for the lock
+            cursor.execute('select 1 from schema_migrations where version = %s', (version,))
+            if cursor.fetchone():
+                continue
+            logger.info(f"Applying migration {version:04d}_{name}")
+            cursor.execute(path.read_text())
+            cursor.execute('INSERT INTO schema_migrations (version, name) VALUES (%s, %s)',
+                           (version, name))
+        applied.append(version)
+    if not applied:
+        logger.info("Schema is up to date")
+    return applied
+
+
+@db_manager.db_operation(autocommit=False)
+def ensure_touchpoint_partitions(cursor, conn, months_ahead: int = 3) -> int:
+    """Create the monthly user_touchpoints partitions from now to `months_ahead` months out"""
+    cursor.execute("""
+    SELECT create_touchpoint_partitions(NOW()::DATE, (NOW() + make_interval(months => %s))::DATE)
+    """, (months_ahead,))
+    created = cursor.fetchone()[0]
+    if created:
+        logger.info(f"Created {created} user_touchpoints partitions")
+    return created
+
+
+if __name__ == '__main__':
+    try:
+        apply_migrations()
+        ensure_touchpoint_partitions()
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        raise
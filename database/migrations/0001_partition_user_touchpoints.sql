@@ -0,0 +1,86 @@
+-- Partition user_touchpoints by month on timestamp so month-window attribution
+-- and watermark scans only touch the partitions they need.
+--
+-- Rows of months without a partition land in the DEFAULT partition. PostgreSQL
+-- refuses to create a month's partition while DEFAULT holds rows of that month,
+-- so create_touchpoint_partitions moves them out: it creates the month as a plain
+-- table, moves its rows from DEFAULT into it and attaches it, all in the caller's
+-- transaction. Ids are kept, so id watermarks are unaffected.
+-- database.migrate keeps partitions three months ahead so this stays the exception.
+
+-- creates one partition per month in [from_month, to_month], skipping existing ones
+CREATE OR REPLACE FUNCTION create_touchpoint_partitions(from_month DATE, to_month DATE)
+RETURNS INTEGER AS $$
+DECLARE
+	month_start DATE := date_trunc('month', from_month);
+	month_end DATE;
+	created INTEGER := 0;
+	partition_name TEXT;
+BEGIN
+	WHILE month_start <= to_month LOOP
+		month_end := (month_start + INTERVAL '1 month')::DATE;
+		partition_name := format('user_touchpoints_%s', to_char(month_start, 'YYYY_MM'));
+		IF to_regclass(partition_name) IS NULL THEN
+			IF EXISTS (
+				SELECT 1 FROM user_touchpoints_default
+				WHERE timestamp >= month_start AND timestamp < month_end
+			) THEN
+				EXECUTE format('CREATE TABLE %I (LIKE user_touchpoints INCLUDING DEFAULTS)', partition_name);
+				EXECUTE format(
+					'WITH moved AS (
+						DELETE FROM user_touchpoints_default WHERE timestamp >= %L AND timestamp < %L RETURNING *
+					)
+					INSERT INTO %I SELECT * FROM moved',
+					month_start, month_end, partition_name
+				);
+				EXECUTE format(
+					'ALTER TABLE user_touchpoints ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+					partition_name, month_start, month_end
+				);
+			ELSE
+				EXECUTE format(
+					'CREATE TABLE %I PARTITION OF user_touchpoints FOR VALUES FROM (%L) TO (%L)',
+					partition_name, month_start, month_end
+				);
+			END IF;
+			created := created + 1;
+		END IF;
+		month_start := month_end;
+	END LOOP;
+	RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE user_touchpoints RENAME TO user_touchpoints_unpartitioned;
+ALTER TABLE user_touchpoints_unpartitioned RENAME CONSTRAINT user_touchpoints_pkey TO user_touchpoints_unpartitioned_pkey;
+
+-- the partition key has to be part of the primary key
+CREATE TABLE user_touchpoints(
+	id INTEGER NOT NULL DEFAULT nextval('user_touchpoints_id_seq'),
+	user_id VARCHAR(50) NOT NULL,
+	timestamp TIMESTAMP NOT NULL,
+	platform VARCHAR(20) NOT NULL,
+	campaign_id VARCHAR(50) REFERENCES campaigns(campaign_id),
+	touchpoints_type VARCHAR(30), --'impression', 'click', 'view'
+	device_type VARCHAR(20),
+	geo_location VARCHAR(50),
+	PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- rows outside every monthly partition land here instead of failing the load;
+-- create_touchpoint_partitions moves them out when their month is created
+CREATE TABLE user_touchpoints_default PARTITION OF user_touchpoints DEFAULT;
+
+SELECT create_touchpoint_partitions(
+	COALESCE(MIN(timestamp), NOW())::DATE,
+	(GREATEST(MAX(timestamp), NOW()) + INTERVAL '3 months')::DATE
+)
+FROM user_touchpoints_unpartitioned;
+
+INSERT INTO user_touchpoints (id, user_id, timestamp, platform, campaign_id, touchpoints_type, device_type, geo_location)
+SELECT id, user_id, timestamp, platform, campaign_id, touchpoints_type, device_type, geo_location
+FROM user_touchpoints_unpartitioned;
+
+-- keep the id sequence alive when the old table goes away
+ALTER SEQUENCE user_touchpoints_id_seq OWNED BY user_touchpoints.id;
+DROP TABLE user_touchpoints_unpartitioned;
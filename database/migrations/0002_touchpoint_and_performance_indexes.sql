@@ -0,0 +1,17 @@
+-- Indexes matching the extractor and attribution access patterns.
+
+-- journeys are always read ordered by (user_id, timestamp), and incremental runs look users up by id
+CREATE INDEX IF NOT EXISTS user_touchpoints_user_timestamp_idx
+	ON user_touchpoints (user_id, timestamp);
+
+-- touchpoints arrive roughly in time order, so a BRIN index prunes watermark and window scans cheaply
+CREATE INDEX IF NOT EXISTS user_touchpoints_timestamp_brin_idx
+	ON user_touchpoints USING BRIN (timestamp);
+
+-- dashboards and budget analysis scan daily_performance by date range
+CREATE INDEX IF NOT EXISTS daily_performance_date_brin_idx
+	ON daily_performance USING BRIN (date);
+
+-- the partitions were just filled by 0001, give the planner statistics to choose these indexes
+ANALYZE user_touchpoints;
+ANALYZE daily_performance;
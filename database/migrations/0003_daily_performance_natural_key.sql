@@ -0,0 +1,12 @@
+-- One row per campaign and day. Also serves (campaign_id, date) range scans and
+-- lets ON CONFLICT in the loaders skip re-loaded days instead of duplicating them.
+
+-- keep the earliest copy of any day loaded more than once
+DELETE FROM daily_performance duplicate
+USING daily_performance original
+WHERE duplicate.campaign_id = original.campaign_id
+	AND duplicate.date = original.date
+	AND duplicate.id > original.id;
+
+ALTER TABLE daily_performance
+	ADD CONSTRAINT daily_performance_campaign_date_key UNIQUE (campaign_id, date);
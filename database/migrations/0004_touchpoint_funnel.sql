@@ -0,0 +1,21 @@
+-- Persisted per (user, campaign, platform) funnel: first impression, view and click
+-- times, so funnel reads no longer aggregate the whole touchpoint table. The journey
+-- loaders keep it current through database.connection.refresh_touchpoint_funnel,
+-- which merges the touchpoints whose ids are past the funnel's etl_watermarks.high_id
+-- (0010) with LEAST. Ids follow ingestion order, so late and backfilled touchpoints
+-- are merged whatever their timestamp; refresh_touchpoint_funnel(rebuild=True)
+-- recomputes it from scratch.
+
+CREATE TABLE IF NOT EXISTS touchpoint_funnel (
+	user_id VARCHAR(50) NOT NULL,
+	campaign_id VARCHAR(50) NOT NULL,
+	platform VARCHAR(20) NOT NULL,
+	impression_time TIMESTAMP,
+	view_time TIMESTAMP,
+	click_time TIMESTAMP,
+	time_to_view INTERVAL GENERATED ALWAYS AS (view_time - impression_time) STORED,
+	time_to_click INTERVAL GENERATED ALWAYS AS (click_time - view_time) STORED,
+	total_time_to_conversion INTERVAL GENERATED ALWAYS AS (click_time - impression_time) STORED,
+	updated_at TIMESTAMP DEFAULT NOW(),
+	PRIMARY KEY (user_id, campaign_id, platform)
+);
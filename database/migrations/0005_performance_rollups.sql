@@ -0,0 +1,80 @@
+-- Pre-aggregated performance cube: daily_performance summed by platform,
+-- campaign_type, product and overall ('total'), at week and month periods, with
+-- derived CTR (%), CPC, CPM and ROAS. Dashboards read one small row set instead
+-- of joining campaigns and aggregating the campaign x day table.
+
+CREATE TABLE IF NOT EXISTS performance_rollups (
+	dimension VARCHAR(20) NOT NULL, -- 'platform' | 'campaign_type' | 'product' | 'total'
+	dimension_value VARCHAR(50) NOT NULL,
+	period VARCHAR(10) NOT NULL, -- 'week' | 'month'
+	period_start DATE NOT NULL,
+	campaigns INTEGER,
+	impressions BIGINT,
+	clicks BIGINT,
+	spend DECIMAL(16, 2),
+	conversions BIGINT,
+	revenue DECIMAL(16, 2),
+	ctr DOUBLE PRECISION GENERATED ALWAYS AS (100.0 * clicks / NULLIF(impressions, 0)) STORED,
+	cpc DOUBLE PRECISION GENERATED ALWAYS AS (spend / NULLIF(clicks, 0)) STORED,
+	cpm DOUBLE PRECISION GENERATED ALWAYS AS (1000.0 * spend / NULLIF(impressions, 0)) STORED,
+	roas DOUBLE PRECISION GENERATED ALWAYS AS (revenue / NULLIF(spend, 0)) STORED,
+	updated_at TIMESTAMP DEFAULT NOW(),
+	PRIMARY KEY (dimension, period, dimension_value, period_start)
+);
+
+-- Recomputes every week and month overlapping [from_date, to_date] from
+-- daily_performance. Periods are rebuilt rather than incremented, so a refresh is
+-- idempotent and rows skipped by the loaders' ON CONFLICT are never double counted;
+-- the cost depends on the periods touched, not on the length of the history.
+CREATE OR REPLACE FUNCTION refresh_performance_rollups(from_date DATE, to_date DATE)
+RETURNS INTEGER AS $$
+DECLARE
+	grain TEXT;
+	lower_bound DATE;
+	upper_bound DATE;
+	rollup_rows INTEGER;
+	refreshed INTEGER := 0;
+BEGIN
+	FOREACH grain IN ARRAY ARRAY['week', 'month'] LOOP
+		lower_bound := date_trunc(grain, from_date);
+		upper_bound := date_trunc(grain, to_date) + ('1 ' || grain)::INTERVAL;
+
+		DELETE FROM performance_rollups
+		WHERE period = grain AND period_start >= lower_bound AND period_start < upper_bound;
+
+		INSERT INTO performance_rollups (dimension, dimension_value, period, period_start, campaigns,
+			impressions, clicks, spend, conversions, revenue)
+		SELECT
+			CASE WHEN GROUPING(c.platform) = 0 THEN 'platform'
+				WHEN GROUPING(c.campaign_type) = 0 THEN 'campaign_type'
+				WHEN GROUPING(c.product) = 0 THEN 'product'
+				ELSE 'total' END,
+			COALESCE(CASE WHEN GROUPING(c.platform) = 0 THEN c.platform
+				WHEN GROUPING(c.campaign_type) = 0 THEN c.campaign_type
+				WHEN GROUPING(c.product) = 0 THEN c.product
+				ELSE 'all' END, 'unknown'),
+			grain,
+			date_trunc(grain, p.date)::DATE,
+			COUNT(DISTINCT p.campaign_id),
+			SUM(p.impressions),
+			SUM(p.clicks),
+			SUM(p.spend),
+			SUM(p.conversions),
+			SUM(p.revenue)
+		FROM daily_performance p
+		JOIN campaigns c ON c.campaign_id = p.campaign_id
+		WHERE p.date >= lower_bound AND p.date < upper_bound
+		GROUP BY date_trunc(grain, p.date),
+			GROUPING SETS ((c.platform), (c.campaign_type), (c.product), ());
+
+		GET DIAGNOSTICS rollup_rows = ROW_COUNT;
+		refreshed := refreshed + rollup_rows;
+	END LOOP;
+	RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- backfill from whatever is already loaded
+SELECT refresh_performance_rollups(MIN(date), MAX(date))
+FROM daily_performance
+HAVING COUNT(*) > 0;
@@ -0,0 +1,13 @@
+-- Data version per table, bumped by the loaders after every committed load.
+-- Result caches key on these versions, so a load invalidates what was computed
+-- from the previous data without the cache having to watch the tables.
+
+CREATE TABLE IF NOT EXISTS table_versions (
+	table_name VARCHAR(63) PRIMARY KEY,
+	version BIGINT NOT NULL DEFAULT 0,
+	updated_at TIMESTAMP DEFAULT NOW()
+);
+
+INSERT INTO table_versions (table_name)
+VALUES ('campaigns'), ('daily_performance'), ('user_touchpoints')
+ON CONFLICT (table_name) DO NOTHING;
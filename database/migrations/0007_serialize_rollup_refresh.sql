@@ -0,0 +1,54 @@
+-- Serialize refresh_performance_rollups. Concurrent loads (the async ingest runs
+-- one per platform) refresh overlapping weeks and months; without a lock both
+-- delete the period and the second INSERT hits the primary key.
+
+CREATE OR REPLACE FUNCTION refresh_performance_rollups(from_date DATE, to_date DATE)
+RETURNS INTEGER AS $$
+DECLARE
+	grain TEXT;
+	lower_bound DATE;
+	upper_bound DATE;
+	rollup_rows INTEGER;
+	refreshed INTEGER := 0;
+BEGIN
+	-- refreshes of overlapping periods would race between DELETE and INSERT
+	PERFORM pg_advisory_xact_lock(hashtext('refresh_performance_rollups'));
+
+	FOREACH grain IN ARRAY ARRAY['week', 'month'] LOOP
+		lower_bound := date_trunc(grain, from_date);
+		upper_bound := date_trunc(grain, to_date) + ('1 ' || grain)::INTERVAL;
+
+		DELETE FROM performance_rollups
+		WHERE period = grain AND period_start >= lower_bound AND period_start < upper_bound;
+
+		INSERT INTO performance_rollups (dimension, dimension_value, period, period_start, campaigns,
+			impressions, clicks, spend, conversions, revenue)
+		SELECT
+			CASE WHEN GROUPING(c.platform) = 0 THEN 'platform'
+				WHEN GROUPING(c.campaign_type) = 0 THEN 'campaign_type'
+				WHEN GROUPING(c.product) = 0 THEN 'product'
+				ELSE 'total' END,
+			COALESCE(CASE WHEN GROUPING(c.platform) = 0 THEN c.platform
+				WHEN GROUPING(c.campaign_type) = 0 THEN c.campaign_type
+				WHEN GROUPING(c.product) = 0 THEN c.product
+				ELSE 'all' END, 'unknown'),
+			grain,
+			date_trunc(grain, p.date)::DATE,
+			COUNT(DISTINCT p.campaign_id),
+			SUM(p.impressions),
+			SUM(p.clicks),
+			SUM(p.spend),
+			SUM(p.conversions),
+			SUM(p.revenue)
+		FROM daily_performance p
+		JOIN campaigns c ON c.campaign_id = p.campaign_id
+		WHERE p.date >= lower_bound AND p.date < upper_bound
+		GROUP BY date_trunc(grain, p.date),
+			GROUPING SETS ((c.platform), (c.campaign_type), (c.product), ());
+
+		GET DIAGNOSTICS rollup_rows = ROW_COUNT;
+		refreshed := refreshed + rollup_rows;
+	END LOOP;
+	RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
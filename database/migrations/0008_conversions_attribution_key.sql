@@ -0,0 +1,27 @@
+-- One row per conversion, attribution model and credited campaign, written in
+-- bulk by attribution.conversions. credit is the share of the conversion the
+-- model gives the campaign (it sums to 1 per conversion and model), and the
+-- unique key lets a re-run upsert instead of duplicating rows. The key includes
+-- conversion_type: credits of different conversion types are written, and
+-- replaced, independently of each other.
+
+ALTER TABLE conversions
+	ADD COLUMN IF NOT EXISTS credit DOUBLE PRECISION;
+
+-- keep the earliest copy of any credit written more than once
+DELETE FROM conversions duplicate
+USING conversions original
+WHERE duplicate.user_id = original.user_id
+	AND duplicate.conversion_timestamp = original.conversion_timestamp
+	AND duplicate.conversion_type = original.conversion_type
+	AND duplicate.attribution_model = original.attribution_model
+	AND duplicate.attributed_campaign_id = original.attributed_campaign_id
+	AND duplicate.id > original.id;
+
+ALTER TABLE conversions
+	ADD CONSTRAINT conversions_attribution_key
+	UNIQUE (user_id, conversion_timestamp, conversion_type, attribution_model, attributed_campaign_id);
+
+INSERT INTO table_versions (table_name)
+VALUES ('conversions')
+ON CONFLICT (table_name) DO NOTHING;
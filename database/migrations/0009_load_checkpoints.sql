@@ -0,0 +1,37 @@
+-- Natural keys and chunk checkpoints for resumable loads.
+-- A touchpoint is identified by (user_id, timestamp, campaign_id, touchpoints_type),
+-- so ON CONFLICT DO NOTHING in the loaders skips re-loaded rows instead of
+-- duplicating them under a fresh SERIAL id. daily_performance already has its
+-- (campaign_id, date) key from 0003. The key includes the partition key, as
+-- unique indexes on a partitioned table must.
+-- Requires PostgreSQL 15 or newer for NULLS NOT DISTINCT: campaign_id and
+-- touchpoints_type may be NULL, and plain UNIQUE would let such rows repeat.
+
+-- keep the earliest copy of any touchpoint loaded more than once
+DELETE FROM user_touchpoints
+WHERE (id, timestamp) IN (
+	SELECT id, timestamp
+	FROM (
+		SELECT id, timestamp,
+			ROW_NUMBER() OVER (PARTITION BY user_id, timestamp, campaign_id, touchpoints_type ORDER BY id) AS copy
+		FROM user_touchpoints
+	) copies
+	WHERE copy > 1
+);
+
+ALTER TABLE user_touchpoints
+	ADD CONSTRAINT user_touchpoints_natural_key
+	UNIQUE NULLS NOT DISTINCT (user_id, timestamp, campaign_id, touchpoints_type);
+
+-- one row per committed chunk of a checkpointed load, keyed by its load run and the
+-- chunk's content hash; a re-run under the same load_id skips the chunks recorded
+-- here, while a new load (e.g. after a truncate) copies everything again
+CREATE TABLE IF NOT EXISTS load_checkpoints (
+	load_id VARCHAR(100) NOT NULL,
+	table_name VARCHAR(63) NOT NULL,
+	chunk_hash CHAR(64) NOT NULL,
+	rows_copied INTEGER,
+	rows_inserted INTEGER,
+	committed_at TIMESTAMP DEFAULT NOW(),
+	PRIMARY KEY (load_id, table_name, chunk_hash)
+);
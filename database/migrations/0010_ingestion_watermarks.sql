@@ -0,0 +1,8 @@
+-- Incremental readers of user_touchpoints (incremental attribution, the funnel
+-- refresh, the memmap snapshot) track the id sequence, which follows ingestion
+-- order, instead of event time. Late or backfilled touchpoints get new ids even
+-- when their timestamp is behind the last batch, so they are still picked up.
+-- high_watermark is no longer written and only kept nullable.
+
+ALTER TABLE etl_watermarks ADD COLUMN IF NOT EXISTS high_id BIGINT;
+ALTER TABLE etl_watermarks ALTER COLUMN high_watermark DROP NOT NULL;
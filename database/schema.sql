@@ -2,7 +2,7 @@
 CREATE TABLE campaigns (
 	campaign_id VARCHAR(50) PRIMARY KEY,
 	platform VARCHAR(20) NOT NULL, -- google | facebook
-	product VARCHAR(20) NOT NULL -- to tie different campaign together
+	product VARCHAR(20) NOT NULL, -- to tie different campaign together
 	campaign_name VARCHAR(100),
 	campaign_type VARCHAR(50),
 	daily_budget DECIMAL(10, 2),
@@ -19,7 +19,7 @@ CREATE TABLE daily_performance(
 	impressions INTEGER,
 	clicks INTEGER,
 	spend DECIMAL(10, 2),
-	conversion INTEGER,
+	conversions INTEGER,
 	revenue DECIMAL(10, 2),
 	cpc DECIMAL(8,4),
 	cpm DECIMAL(8,4),
@@ -47,4 +47,31 @@ CREATE TABLE conversions (
 	conversion_type VARCHAR(30), -- 'purchase', 'signup', 'lead'
 	attributed_campaign_id VARCHAR(50),
 	attribution_model VARCHAR(30) -- 'first touch', 'last touch', 'linear'
-);
\ No newline at end of file
+);
+
+--etl watermarks table, highest source timestamp each incremental pipeline has processed
+CREATE TABLE etl_watermarks (
+	pipeline VARCHAR(50) PRIMARY KEY,
+	high_watermark TIMESTAMP NOT NULL,
+	updated_at TIMESTAMP DEFAULT NOW()
+);
+
+--user journey state table, one row per user for incremental attribution
+CREATE TABLE user_journey_state (
+	user_id VARCHAR(50) PRIMARY KEY,
+	touchpoint_count INTEGER NOT NULL,
+	first_touch_time TIMESTAMP NOT NULL,
+	last_touch_time TIMESTAMP NOT NULL,
+	converted BOOLEAN NOT NULL DEFAULT FALSE,
+	conversion_timestamp TIMESTAMP,
+	updated_at TIMESTAMP DEFAULT NOW()
+);
+
+--campaign attribution credits table, running totals maintained by incremental runs
+CREATE TABLE campaign_attribution_credits (
+	campaign_id VARCHAR(50) NOT NULL,
+	attribution_model VARCHAR(30) NOT NULL,
+	credit DOUBLE PRECISION NOT NULL DEFAULT 0,
+	updated_at TIMESTAMP DEFAULT NOW(),
+	PRIMARY KEY (campaign_id, attribution_model)
+);
@@ -1,37 +1,181 @@
+import logging
+from datetime import datetime
+from typing import Iterator, List, Optional
+
 from pandas import DataFrame
-from database.connection import db_manager
+from database.connection import db_manager, refresh_touchpoint_funnel
 
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-@db_manager.db_operation(autocommit=True, dict_cursor=True)
-def extract_touch_points_data(conn, cursor) -> DataFrame:
-    query = """
-    WITH ordered_events AS (
-    SELECT 
-        user_id,
-        campaign,
-        platform,
-        touchpoint_type,
-        timestamp,
-        ROW_NUMBER() OVER (PARTITION BY user_id, campaign, platform ORDER BY timestamp) as rn
-    FROM events
-)
-SELECT 
+TOUCHPOINT_DTYPES = {
+    'user_id': 'string',
+    'timestamp': 'datetime64[ns]',
+    'platform': 'category',
+    'campaign_id': 'category',
+    'touchpoints_type': 'category',
+    'device_type': 'category',
+    'geo_location': 'category',
+}
+
+TOUCH_POINTS_QUERY = """
+SELECT
     user_id,
-    campaign,
+    campaign_id AS campaign,
     platform,
-    MIN(CASE WHEN touchpoint_type = 'impression' THEN timestamp END) AS impression_time,
-    MIN(CASE WHEN touchpoint_type = 'view' THEN timestamp END) AS view_time,
-    MIN(CASE WHEN touchpoint_type = 'click' THEN timestamp END) AS click_time,
-    (MIN(CASE WHEN touchpoint_type = 'view' THEN timestamp END) - 
-     MIN(CASE WHEN touchpoint_type = 'impression' THEN timestamp END)) AS time_to_view,
-    (MIN(CASE WHEN touchpoint_type = 'click' THEN timestamp END) - 
-     MIN(CASE WHEN touchpoint_type = 'view' THEN timestamp END)) AS time_to_click,
-    (MIN(CASE WHEN touchpoint_type = 'click' THEN timestamp END) - 
-     MIN(CASE WHEN touchpoint_type = 'impression' THEN timestamp END)) AS total_time_to_conversion
-FROM ordered_events
-GROUP BY user_id, campaign, platform;
+    impression_time,
+    view_time,
+    click_time,
+    time_to_view,
+    time_to_click,
+    total_time_to_conversion
+FROM touchpoint_funnel
+"""
+
+
+@db_manager.db_operation(autocommit=True, dict_cursor=True)
+def read_touch_points_data(cursor, conn) -> DataFrame:
+    cursor.execute(TOUCH_POINTS_QUERY)
+    return DataFrame.from_records(cursor.fetchall(),
+                                  columns=[desc[0] for desc in cursor.description])
+
+
+def extract_touch_points_data(refresh: bool = False) -> DataFrame:
+    """
+    Per (user, campaign, platform) funnel times as of the last refresh. The journey
+    loaders refresh the funnel; refresh=True brings it up to date first, which waits
+    for in-flight touchpoint loads.
+    """
+    if refresh:
+        refresh_touchpoint_funnel()
+    return read_touch_points_data()
+
+
+def stream_touch_points_data(chunk_size: int = 50_000, refresh: bool = False) -> Iterator[DataFrame]:
+    """Funnel extract streamed in chunks through a server-side cursor"""
+    if refresh:
+        refresh_touchpoint_funnel()
+    return db_manager.stream_query(TOUCH_POINTS_QUERY, chunk_size=chunk_size)
+
+
+def stream_user_touchpoints(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                            chunk_size: int = 50_000) -> Iterator[DataFrame]:
+    """
+    Raw touchpoints in [start, end) as typed chunks ordered by (user_id, timestamp),
+    ready for attribution.models.attribute_chunks
+    """
+    query = """
+    SELECT user_id, timestamp, platform, campaign_id, touchpoints_type, device_type, geo_location
+    FROM user_touchpoints
+    WHERE timestamp >= COALESCE(%s, '-infinity'::timestamp)
+      AND timestamp < COALESCE(%s, 'infinity'::timestamp)
+    ORDER BY user_id, timestamp
+    """
+    return db_manager.stream_query(query, (start, end), chunk_size=chunk_size,
+                                   dtypes=TOUCHPOINT_DTYPES)
+
 
+def stream_touchpoints_ingested(after_id: Optional[int] = None, up_to_id: Optional[int] = None,
+                                chunk_size: int = 50_000) -> Iterator[DataFrame]:
+    """All touchpoint columns with ids in (after_id, up_to_id] as typed chunks in timestamp order"""
+    query = """
+    SELECT user_id, timestamp, platform, campaign_id, touchpoints_type, device_type, geo_location
+    FROM user_touchpoints
+    WHERE id > COALESCE(%s::bigint, -1) AND id <= COALESCE(%s::bigint, 9223372036854775807)
+    ORDER BY timestamp
     """
-    cursor.execute(query)
-    return DataFrame(cursor.fetchall())
+    return db_manager.stream_query(query, (after_id, up_to_id), chunk_size=chunk_size,
+                                   dtypes=TOUCHPOINT_DTYPES)
+
+
+@db_manager.db_operation(autocommit=True, dict_cursor=True)
+def extract_touchpoints_ingested(cursor, conn, after_id: Optional[int], up_to_id: int) -> DataFrame:
+    """Touchpoints with ids in (after_id, up_to_id], i.e. ingested since the id watermark"""
+    cursor.execute("""
+    SELECT user_id, timestamp, platform, campaign_id, touchpoints_type
+    FROM user_touchpoints
+    WHERE id > COALESCE(%s::bigint, -1) AND id <= %s
+    ORDER BY user_id, timestamp
+    """, (after_id, up_to_id))
+    return DataFrame.from_records(cursor.fetchall(),
+                                  columns=[desc[0] for desc in cursor.description])
+
+
+@db_manager.db_operation(autocommit=True, dict_cursor=True)
+def extract_user_touchpoints(cursor, conn, user_ids: List[str], up_to_id: int) -> DataFrame:
+    """Journey history of the given users as of the id watermark `up_to_id`"""
+    cursor.execute("""
+    SELECT user_id, timestamp, platform, campaign_id, touchpoints_type
+    FROM user_touchpoints
+    WHERE user_id = ANY(%s) AND id <= %s
+    ORDER BY user_id, timestamp
+    """, (list(user_ids), up_to_id))
+    return DataFrame.from_records(cursor.fetchall(),
+                                  columns=[desc[0] for desc in cursor.description])
+
+
+ROLLUP_DIMENSIONS = ('platform', 'campaign_type', 'product', 'total')
+
+ROLLUP_DTYPES = {
+    'dimension_value': 'category',
+    'period_start': 'datetime64[ns]',
+    'spend': 'float64',
+    'revenue': 'float64',
+}
 
+
+@db_manager.db_operation(autocommit=True, dict_cursor=True)
+def read_performance_rollups(cursor, conn, dimension: str = 'platform', period: str = 'week',
+                             start: Optional[datetime] = None, end: Optional[datetime] = None) -> DataFrame:
+    """Pre-aggregated performance by dimension and week/month, periods starting in [start, end]"""
+    if dimension not in ROLLUP_DIMENSIONS:
+        raise ValueError(f"Unknown rollup dimension {dimension}, expected one of {ROLLUP_DIMENSIONS}")
+    if period not in ('week', 'month'):
+        raise ValueError(f"Unknown rollup period {period}, expected 'week' or 'month'")
+    cursor.execute("""
+    SELECT dimension_value, period_start, campaigns, impressions, clicks, spend, conversions, revenue,
+           ctr, cpc, cpm, roas
+    FROM performance_rollups
+    WHERE dimension = %s AND period = %s
+      AND period_start >= COALESCE(%s, '-infinity'::date)
+      AND period_start <= COALESCE(%s, 'infinity'::date)
+    ORDER BY period_start, dimension_value
+    """, (dimension, period, start, end))
+    df = DataFrame.from_records(cursor.fetchall(), columns=[desc[0] for desc in cursor.description])
+    return df.astype(ROLLUP_DTYPES).rename(columns={'dimension_value': dimension})
+
+
+CAMPAIGN_PERFORMANCE_DTYPES = {
+    'campaign_id': 'category',
+    'date': 'datetime64[ns]',
+    'spend': 'float64',
+    'revenue': 'float64',
+    'conversions': 'float64',
+}
+
+
+@db_manager.db_operation(autocommit=True, dict_cursor=True)
+def extract_campaign_performance(cursor, conn, start: Optional[datetime] = None,
+                                 end: Optional[datetime] = None) -> DataFrame:
+    """Daily spend, revenue and conversions per campaign for dates in [start, end)"""
+    cursor.execute("""
+    SELECT campaign_id, date, spend, revenue, conversions
+    FROM daily_performance
+    WHERE date >= COALESCE(%s, '-infinity'::date)
+      AND date < COALESCE(%s, 'infinity'::date)
+    ORDER BY campaign_id, date
+    """, (start, end))
+    df = DataFrame.from_records(cursor.fetchall(), columns=[desc[0] for desc in cursor.description])
+    return df.astype(CAMPAIGN_PERFORMANCE_DTYPES)
+
+
+@db_manager.db_operation(autocommit=True, dict_cursor=True)
+def extract_campaigns(cursor, conn) -> DataFrame:
+    """Campaign attributes with the current daily budget"""
+    cursor.execute("""
+    SELECT campaign_id, platform, product, campaign_type, daily_budget, status
+    FROM campaigns
+    ORDER BY campaign_id
+    """)
+    df = DataFrame.from_records(cursor.fetchall(), columns=[desc[0] for desc in cursor.description])
+    return df.astype({'daily_budget': 'float64'})
@@ -0,0 +1,298 @@
+# snapshot.py
+"""
+Local columnar snapshot of user_touchpoints, partitioned by day.
+
+Every day is a directory of .npy files, one per column, holding the
+TouchpointStore encoding: int64 user keys, int64 epoch-nanosecond timestamps
+and integer codes for the categorical columns. Category and user dictionaries
+are append-only, so codes written earlier stay valid as new values show up.
+manifest.json is the commit point: it records the row count of every day and
+the id watermark, and is replaced atomically after the partition files, so a
+crash mid-sync leaves rows beyond the recorded counts that readers ignore.
+
+sync() appends the touchpoints ingested since the watermark. Ids follow
+ingestion order, so late events land in their (older) day partitions too.
+Reads memory-map the files, so repeated experiments and validation runs read
+the page cache instead of the database.
+
+    python -m etl.extractors.snapshot --cache-dir .cache/touchpoints --validate
+"""
+import argparse
+import json
+import logging
+import os
+import re
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from attribution.touchpoint_store import CATEGORICAL_COLUMNS, TouchpointStore, UserDictionary
+from config.config import SNAPSHOT_CONFIG
+from data.generators.user_journey_generator import JOURNEY_RULES
+from data.validation import RuleSet, ValidationReport
+from database.connection import committed_touchpoint_id
+from etl.extractors.extract import stream_touchpoints_ingested
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fixed per column so appending new categories never rewrites old partitions
+CODE_DTYPES = {
+    'platform': np.int8,
+    'campaign_id': np.int32,
+    'touchpoints_type': np.int8,
+    'device_type': np.int8,
+    'geo_location': np.int32,
+}
+NUMBERED_USER = re.compile(r'^(\D*)(\d+)$')
+
+
+class TouchpointSnapshot:
+    """Day-partitioned, memory-mapped touchpoint cache"""
+
+    def __init__(self, cache_dir=SNAPSHOT_CONFIG['cache_dir']):
+        self.root = Path(cache_dir)
+        self.manifest = self._read_manifest()
+        self._user_index: Optional[pd.Index] = None
+
+    def _read_manifest(self) -> Dict:
+        path = self.root / 'manifest.json'
+        if path.exists():
+            with open(path) as f:
+                manifest = json.load(f)
+            if 'high_id' not in manifest:
+                raise ValueError(f"{path} is not a touchpoint snapshot manifest; "
+                                 f"point cache_dir at an empty or snapshot directory")
+            return manifest
+        # users: {'prefix', 'width'} stores the id numbers as keys,
+        # {'labels': True} stores codes into users.npy
+        return {'high_id': None, 'users': None,
+                'categories': {column: [] for column in CATEGORICAL_COLUMNS}, 'days': {}}
+
+    def _write_manifest(self):
+        tmp = self.root / 'manifest.json.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp, self.root / 'manifest.json')
+
+    @property
+    def watermark(self) -> Optional[int]:
+        """Last user_touchpoints id in the snapshot"""
+        return self.manifest['high_id']
+
+    @property
+    def days(self) -> List[str]:
+        return sorted(self.manifest['days'])
+
+    @property
+    def n_rows(self) -> int:
+        return sum(self.manifest['days'].values())
+
+    def _day_dir(self, day: str) -> Path:
+        return self.root / f'day={day}'
+
+    # -- encoding --------------------------------------------------------------------------
+
+    def _user_keys(self, user_ids: pd.Series) -> np.ndarray:
+        """int64 key per row: the id number for <prefix><number> ids, else a users.npy code"""
+        codes, uniques = pd.factorize(user_ids)
+        uniques = pd.Index(np.asarray(uniques, dtype=object))
+        users = self.manifest['users']
+        if users is None:
+            _, dictionary = UserDictionary.encode(pd.Series(uniques))
+            users = self.manifest['users'] = (
+                {'prefix': dictionary.prefix, 'width': dictionary.width} if dictionary.numbered
+                else {'labels': True})
+
+        if 'prefix' in users:
+            numbers = uniques.str.extract(NUMBERED_USER)
+            numbered = UserDictionary(np.zeros(0, np.int64), users['prefix'], users['width'])
+            if numbers[0].eq(users['prefix']).all():
+                numbered.numbers = numbers[1].astype(np.int64).to_numpy()
+            if len(numbered.numbers) != len(uniques) or not numbered.decode().equals(uniques):
+                raise ValueError(f"User ids no longer match {users['prefix']}<number>; "
+                                 f"rebuild the snapshot at {self.root}")
+            return numbered.numbers[codes]
+
+        labels_path = self.root / 'users.npy'
+        if self._user_index is None:
+            self._user_index = pd.Index(np.load(labels_path).astype(str) if labels_path.exists() else [])
+        new = uniques.difference(self._user_index)
+        if len(new):
+            self._user_index = self._user_index.append(pd.Index(new))
+            np.save(labels_path, self._user_index.to_numpy(dtype=str))
+        return self._user_index.get_indexer(uniques).astype(np.int64)[codes]
+
+    def _encode(self, chunk: pd.DataFrame) -> Dict[str, np.ndarray]:
+        arrays = {'user': self._user_keys(chunk['user_id']),
+                  'timestamp': pd.to_datetime(chunk['timestamp']).to_numpy(dtype='datetime64[ns]').view(np.int64)}
+        for column in CATEGORICAL_COLUMNS:
+            known = self.manifest['categories'][column]
+            categories = pd.Index(known)
+            values = chunk[column].astype(object)
+            new = pd.Index(values.dropna().unique()).difference(categories)
+            if len(new):
+                known.extend(new.tolist())
+                categories = pd.Index(known)
+                if len(known) > np.iinfo(CODE_DTYPES[column]).max:
+                    raise ValueError(f"{column} has more categories than {CODE_DTYPES[column].__name__} codes")
+            arrays[column] = categories.get_indexer(values).astype(CODE_DTYPES[column])
+        return arrays
+
+    # -- writing ---------------------------------------------------------------------------
+
+    def _flush_day(self, day: str, parts: List[Dict[str, np.ndarray]]):
+        """Append buffered rows to one day partition, each file replaced atomically"""
+        day_dir = self._day_dir(day)
+        day_dir.mkdir(parents=True, exist_ok=True)
+        existing = self.manifest['days'].get(day, 0)
+        added = sum(len(part['timestamp']) for part in parts)
+        for column in ('user', 'timestamp', *CATEGORICAL_COLUMNS):
+            path = day_dir / f'{column}.npy'
+            pieces = [part[column] for part in parts]
+            if existing:
+                pieces.insert(0, np.load(path, mmap_mode='r')[:existing])
+            tmp = day_dir / f'{column}.tmp.npy'
+            np.save(tmp, np.concatenate(pieces))
+            os.replace(tmp, path)
+        self.manifest['days'][day] = existing + added
+
+    def append(self, chunks: Iterable[pd.DataFrame], high_id: Optional[int] = None) -> int:
+        """
+        Append touchpoint chunks, buffering each day until the stream moves past it.
+        Chunks in timestamp order write every partition once. `high_id` is the last
+        user_touchpoints id the chunks cover, committed with the manifest.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        pending: Dict[str, List[Dict[str, np.ndarray]]] = {}
+        added = 0
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            arrays = self._encode(chunk)
+            days = arrays['timestamp'].astype('datetime64[ns]').astype('datetime64[D]')
+            for day in np.unique(days):
+                rows = days == day
+                pending.setdefault(str(day), []).append({column: values[rows] for column, values in arrays.items()})
+            added += len(chunk)
+
+            first_day = str(days.min())
+            for day in [day for day in pending if day < first_day]:
+                self._flush_day(day, pending.pop(day))
+        for day in sorted(pending):
+            self._flush_day(day, pending[day])
+        if high_id is not None:
+            self.manifest['high_id'] = max(high_id, self.manifest['high_id'] or high_id)
+        self._write_manifest()
+        return added
+
+    def sync(self, chunk_size: int = SNAPSHOT_CONFIG['chunk_size']) -> int:
+        """Append the touchpoints ingested since the snapshot watermark from the database"""
+        # every id up to the bound is committed, so nothing below the new watermark can show up later
+        bound = committed_touchpoint_id()
+        if bound is None or (self.watermark is not None and bound <= self.watermark):
+            logger.info(f"Snapshot {self.root} is up to date at id {self.watermark}")
+            return 0
+        added = self.append(stream_touchpoints_ingested(self.watermark, bound, chunk_size=chunk_size), bound)
+        logger.info(f"Snapshot {self.root}: +{added} rows, {self.n_rows} rows over {len(self.days)} days, "
+                    f"watermark id {self.watermark}")
+        return added
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.manifest = self._read_manifest()
+        self._user_index = None
+
+    # -- reading ---------------------------------------------------------------------------
+
+    def _days_between(self, start: Optional[date], end: Optional[date]) -> List[str]:
+        start = str(pd.Timestamp(start).date()) if start is not None else None
+        end = str(pd.Timestamp(end).date()) if end is not None else None
+        return [day for day in self.days if (start is None or day >= start) and (end is None or day < end)]
+
+    def day_arrays(self, day: str) -> Dict[str, np.ndarray]:
+        """Read-only memory-mapped columns of one day, no copy"""
+        rows = self.manifest['days'][day]
+        return {column: np.load(self._day_dir(day) / f'{column}.npy', mmap_mode='r')[:rows]
+                for column in ('user', 'timestamp', *CATEGORICAL_COLUMNS)}
+
+    def iter_days(self, start: Optional[date] = None,
+                  end: Optional[date] = None) -> Iterator[Tuple[str, Dict[str, np.ndarray]]]:
+        """(day, memory-mapped columns) for the days in [start, end)"""
+        for day in self._days_between(start, end):
+            yield day, self.day_arrays(day)
+
+    def iter_columns(self, start: Optional[date] = None,
+                     end: Optional[date] = None) -> Iterator[Dict[str, object]]:
+        """
+        One mapping of `user_touchpoints` column name to values per day in [start, end),
+        for RuleSet.validate: user keys and timestamps are the memory-mapped arrays,
+        categorical columns are Categoricals over the stored codes
+        """
+        for _, arrays in self.iter_days(start, end):
+            columns = {'user_id': arrays['user'], 'timestamp': arrays['timestamp'].view('datetime64[ns]')}
+            columns.update((column, pd.Categorical.from_codes(arrays[column], categories=self.categories(column),
+                                                              validate=False))
+                           for column in CATEGORICAL_COLUMNS)
+            yield columns
+
+    def validate(self, rule_set: RuleSet = JOURNEY_RULES, start: Optional[date] = None,
+                 end: Optional[date] = None) -> ValidationReport:
+        """Validate the days in [start, end) straight from the memory-mapped columns"""
+        return rule_set.validate(self.iter_columns(start, end))
+
+    def categories(self, column: str) -> pd.Index:
+        return pd.Index(self.manifest['categories'][column])
+
+    def user_dictionary(self, keys: np.ndarray) -> UserDictionary:
+        """Dictionary over the sorted distinct user keys"""
+        users = self.manifest['users']
+        if users is not None and 'prefix' in users:
+            return UserDictionary(keys, users['prefix'], users['width'])
+        labels = np.load(self.root / 'users.npy', mmap_mode='r')
+        return UserDictionary(labels=labels[keys].astype(str).astype(object))
+
+    def read(self, start: Optional[date] = None, end: Optional[date] = None) -> TouchpointStore:
+        """
+        Touchpoints of the days in [start, end) as a TouchpointStore, gathered from
+        the memory-mapped columns. Grouping rows by user is the only copy made; no
+        value is parsed or decoded.
+        """
+        parts = [arrays for _, arrays in self.iter_days(start, end)]
+        if not parts:
+            return TouchpointStore.concat([])
+        columns = parts[0] if len(parts) == 1 else {
+            column: np.concatenate([part[column] for part in parts]) for column in parts[0]}
+        keys, user = np.unique(columns['user'], return_inverse=True)
+        store = TouchpointStore(user.astype(np.int32), columns['timestamp'],
+                                {column: columns[column] for column in CATEGORICAL_COLUMNS},
+                                {column: self.categories(column) for column in CATEGORICAL_COLUMNS},
+                                self.user_dictionary(keys))
+        return store.sorted()
+
+    def to_frame(self, start: Optional[date] = None, end: Optional[date] = None) -> pd.DataFrame:
+        return self.read(start, end).to_frame()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sync the local touchpoint snapshot')
+    parser.add_argument('--cache-dir', default=SNAPSHOT_CONFIG['cache_dir'])
+    parser.add_argument('--rebuild', action='store_true', help='drop the snapshot and extract everything')
+    parser.add_argument('--chunk-size', type=int, default=SNAPSHOT_CONFIG['chunk_size'])
+    parser.add_argument('--validate', action='store_true', help='check the journey rules on the snapshot')
+    args = parser.parse_args()
+
+    snapshot = TouchpointSnapshot(args.cache_dir)
+    if args.rebuild:
+        snapshot.clear()
+    try:
+        snapshot.sync(args.chunk_size)
+        if args.validate:
+            report = snapshot.validate()
+            logger.info(f"{report.rows} touchpoints validated: {report.issues() or 'no issues'}")
+    except Exception as e:
+        logger.error(f"Snapshot sync failed: {e}")
+        raise
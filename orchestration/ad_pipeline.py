@@ -0,0 +1,220 @@
+# ad_pipeline.py
+"""
+The synthetic ad dataset as a DAG: generate -> validate -> load -> extract -> attribute.
+
+The Facebook and Google branches are independent and run side by side, and
+journeys start as soon as the campaigns are loaded and read back. Generation
+and attribution run in worker processes. Validation, loads and extraction
+run in threads. Every generator gets its own seed derived from --seed, so the
+same seed and end date reproduce the same frames. Unchanged steps are then
+served from the cache. Loads always run. They are checkpointed under a load id
+derived from the arguments, so a re-run of a failed run skips the chunks it
+already committed; the checkpoints are dropped once every load succeeded, and
+after that the natural keys turn a reload into a no-op. Extraction is keyed on
+the user_touchpoints data version, so it only re-reads after a load changed
+something.
+
+    python -m orchestration.ad_pipeline --seed 7 --end-date 2026-09-01 --users 100000
+"""
+import argparse
+import hashlib
+import logging
+import random
+import zlib
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from attribution import models as attribution_models
+from attribution.models import run_attribution
+from config.config import DAG_CONFIG
+from data import validation
+from data.generators import facebook_ads_generator as facebook
+from data.generators import google_ads_generator as google
+from data.generators import user_journey_generator as journeys
+from database.connection import (clear_load_checkpoints, load_campaign_data, load_journey_data,
+                                 load_performance_data, read_campaign_data)
+from etl.extractors import extract
+from etl.extractors.extract import TOUCHPOINT_DTYPES, stream_user_touchpoints
+from orchestration.dag import DAG
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GENERATORS = {
+    'facebook': (facebook, facebook.generate_facebook_campaigns, facebook.generate_facebook_performance_vectorized),
+    'google_ads': (google, google.generate_google_campaigns, google.generate_google_performance_vectorized),
+}
+
+
+def task_seed(seed: int, name: str) -> np.random.SeedSequence:
+    """Seed of one task, independent of which other tasks run"""
+    return np.random.SeedSequence([seed, zlib.crc32(name.encode())])
+
+
+def _raise_on_issues(kind: str, issues):
+    if issues:
+        logger.warning(f"{kind} issues: {issues}")
+        raise ValueError(f"{kind} issues: {issues}")
+
+
+# -- tasks -------------------------------------------------------------------------------------
+
+def generate_campaigns(platform: str, num_campaigns: int, seed: int) -> pd.DataFrame:
+    module, generate, _ = GENERATORS[platform]
+    # the campaign generators draw from the global random and Faker state
+    platform_seed = int(task_seed(seed, f'{platform}_campaigns').generate_state(1)[0])
+    random.seed(platform_seed)
+    module.fake.seed_instance(platform_seed)
+    return generate(num_campaigns)
+
+
+def generate_performance(platform: str, campaigns: pd.DataFrame, days: int, seed: int, end_date) -> pd.DataFrame:
+    _, _, generate = GENERATORS[platform]
+    return generate(campaigns, days, task_seed(seed, f'{platform}_performance'), pd.Timestamp(end_date).date())
+
+
+def validate_platform(platform: str, campaigns: pd.DataFrame, performance: pd.DataFrame):
+    module = GENERATORS[platform][0]
+    _raise_on_issues(f'{platform} campaign', module.validate_campaign_data(campaigns))
+    _raise_on_issues(f'{platform} performance', module.validate_performance_data(performance))
+
+
+def load_campaigns(facebook_campaigns: pd.DataFrame, google_campaigns: pd.DataFrame) -> int:
+    return load_campaign_data(pd.concat([facebook_campaigns, google_campaigns], ignore_index=True))
+
+
+def load_performance(performance: pd.DataFrame, load_id: str) -> int:
+    return load_performance_data(performance, load_id=load_id)
+
+
+def read_campaigns() -> pd.DataFrame:
+    campaigns = read_campaign_data()
+    return campaigns.sort_values('campaign_id', ignore_index=True).astype({'daily_budget': 'float64'})
+
+
+def generate_journeys(read_campaigns: pd.DataFrame, num_users: int, seed: int, end_date) -> pd.DataFrame:
+    return pd.concat(journeys.generate_user_journeys_batch(
+        read_campaigns, num_users, seed=task_seed(seed, 'journeys'), users_per_chunk=num_users,
+        end_time=pd.Timestamp(end_date)), ignore_index=True)
+
+
+def validate_journeys(generate_journeys: pd.DataFrame):
+    _raise_on_issues('journey', journeys.validate_journey_data(generate_journeys))
+
+
+def load_journeys(generate_journeys: pd.DataFrame, load_id: str) -> int:
+    return load_journey_data(generate_journeys, load_id=load_id)
+
+
+def clear_checkpoints(load_id: str) -> int:
+    return clear_load_checkpoints(load_id)
+
+
+def extract_touchpoints() -> pd.DataFrame:
+    chunks = list(stream_user_touchpoints())
+    if not chunks:
+        return pd.DataFrame(columns=list(TOUCHPOINT_DTYPES)).astype(TOUCHPOINT_DTYPES)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def attribute(extract_touchpoints: pd.DataFrame, models: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    return run_attribution(extract_touchpoints, models)
+
+
+# Module-level functions per platform, so process tasks pickle by reference
+def facebook_performance(facebook_campaigns, **params):
+    return generate_performance('facebook', facebook_campaigns, **params)
+
+
+def google_performance(google_campaigns, **params):
+    return generate_performance('google_ads', google_campaigns, **params)
+
+
+def validate_facebook(facebook_campaigns, facebook_performance):
+    validate_platform('facebook', facebook_campaigns, facebook_performance)
+
+
+def validate_google(google_campaigns, google_performance):
+    validate_platform('google_ads', google_campaigns, google_performance)
+
+
+def load_facebook_performance(facebook_performance, load_id):
+    return load_performance(facebook_performance, load_id)
+
+
+def load_google_performance(google_performance, load_id):
+    return load_performance(google_performance, load_id)
+
+
+GENERATED_PERFORMANCE = {'facebook': facebook_performance, 'google_ads': google_performance}
+VALIDATE = {'facebook': validate_facebook, 'google_ads': validate_google}
+LOAD_PERFORMANCE = {'facebook': load_facebook_performance, 'google_ads': load_google_performance}
+
+
+def build_pipeline(num_facebook_campaigns: int = 20, num_google_campaigns: int = 20, days: int = 30,
+                   num_users: int = 10000, seed: int = 0, end_date=None,
+                   models: Optional[Iterable[str]] = None, cache_dir: str = DAG_CONFIG['cache_dir']) -> DAG:
+    end_date = str(pd.Timestamp(end_date or pd.Timestamp.now()).normalize().date())
+    # the same arguments regenerate the same chunks, so they resume the same load
+    load_id = 'ad_pipeline-' + hashlib.sha256(repr((num_facebook_campaigns, num_google_campaigns, days,
+                                                    num_users, seed, end_date)).encode()).hexdigest()[:16]
+    dag = DAG('ad_pipeline', cache_dir)
+    campaign_counts = {'facebook': num_facebook_campaigns, 'google_ads': num_google_campaigns}
+    # the tasks here are thin wrappers, so the modules doing the work are part of their cache keys
+    for platform, (module, _, _) in GENERATORS.items():
+        short = 'google' if platform == 'google_ads' else platform
+        dag.add(f'{short}_campaigns', generate_campaigns, executor='process', code_deps=(module,),
+                params={'platform': platform, 'num_campaigns': campaign_counts[platform], 'seed': seed})
+        dag.add(f'{short}_performance', GENERATED_PERFORMANCE[platform], deps=(f'{short}_campaigns',),
+                executor='process', code_deps=(module,),
+                params={'days': days, 'seed': seed, 'end_date': end_date})
+        dag.add(f'validate_{short}', VALIDATE[platform], deps=(f'{short}_campaigns', f'{short}_performance'),
+                code_deps=(module, validation))
+        dag.add(f'load_{short}_performance', LOAD_PERFORMANCE[platform], deps=(f'{short}_performance',),
+                after=('load_campaigns', f'validate_{short}'), params={'load_id': load_id}, cache=False)
+    dag.add('load_campaigns', load_campaigns, deps=('facebook_campaigns', 'google_campaigns'),
+            after=('validate_facebook', 'validate_google'), cache=False)
+    dag.add('read_campaigns', read_campaigns, after=('load_campaigns',), tables=('campaigns',),
+            code_deps=(read_campaign_data,))
+    dag.add('generate_journeys', generate_journeys, deps=('read_campaigns',), executor='process',
+            code_deps=(journeys,), params={'num_users': num_users, 'seed': seed, 'end_date': end_date})
+    dag.add('validate_journeys', validate_journeys, deps=('generate_journeys',),
+            code_deps=(journeys, validation))
+    dag.add('load_journeys', load_journeys, deps=('generate_journeys',), after=('validate_journeys',),
+            params={'load_id': load_id}, cache=False)
+    dag.add('clear_checkpoints', clear_checkpoints, params={'load_id': load_id}, cache=False,
+            after=('load_facebook_performance', 'load_google_performance', 'load_journeys'))
+    dag.add('extract_touchpoints', extract_touchpoints, after=('load_journeys',), tables=('user_touchpoints',),
+            code_deps=(extract,))
+    dag.add('attribute', attribute, deps=('extract_touchpoints',), executor='process',
+            code_deps=(attribution_models,), params={'models': list(models) if models else None})
+    return dag
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the ad attribution pipeline as a cached DAG')
+    parser.add_argument('--facebook-campaigns', type=int, default=20)
+    parser.add_argument('--google-campaigns', type=int, default=20)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--end-date', default=None, help='defaults to today, which changes the data daily')
+    parser.add_argument('--models', nargs='+', default=None)
+    parser.add_argument('--workers', type=int, default=DAG_CONFIG['workers'])
+    parser.add_argument('--targets', nargs='+', default=None, help='run only these tasks and their upstream')
+    parser.add_argument('--force', nargs='+', default=(), help='re-run these tasks even when cached')
+    parser.add_argument('--cache-dir', default=DAG_CONFIG['cache_dir'])
+    args = parser.parse_args()
+
+    dag = build_pipeline(args.facebook_campaigns, args.google_campaigns, args.days, args.users, args.seed,
+                         args.end_date, args.models, args.cache_dir)
+    try:
+        run = dag.run(args.targets, args.workers, args.force)
+        run.report()
+        if 'attribute' in run.results:
+            print(run.output('attribute').to_string(index=False))
+    except Exception as e:
+        logger.error(f"Pipeline failed: {e}")
+        raise
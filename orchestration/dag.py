@@ -0,0 +1,338 @@
+# dag.py
+"""
+Small in-process DAG runner.
+
+Tasks are plain functions. The outputs of a task's `deps` are passed to it as
+keyword arguments named after those tasks. Tasks listed in `after` only have
+to finish first. Every task whose dependencies are done is submitted right
+away, so independent branches run concurrently. Thread tasks share one pool
+(database and I/O work). Process tasks go to a spawned process pool (CPU-bound
+generation and attribution), so they must be module-level functions.
+
+A task's cache key hashes:
+- its name and params
+- the source of the module defining it and of every module or function in
+  its `code_deps`, so editing a helper that a thin task wraps invalidates it
+- the content hashes of its inputs (its `deps`; `after` tasks are not part of it)
+- for tasks declaring `tables`, their data versions from table_versions
+
+When the key is on disk, the task is skipped and its pickled output is only
+read if a downstream task actually runs. Tasks with cache=False, such as
+loads, always run. After every run each task keeps only its `keep` most
+recently used entries; older keys and the outputs nothing points to anymore
+are deleted.
+
+    dag = DAG('example')
+    dag.add('numbers', make_numbers, params={'n': 10}, executor='process')
+    dag.add('total', add_up, deps=('numbers',))
+    run = dag.run(workers=4)
+    run.report()
+"""
+import hashlib
+import inspect
+import logging
+import multiprocessing
+import os
+import pickle
+import time
+from types import ModuleType
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+import pandas as pd
+
+from config.config import DAG_CONFIG
+from database.connection import chunk_digest, read_table_versions
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EXECUTORS = ('thread', 'process')
+
+CodeDep = Union[ModuleType, Callable]
+
+
+def output_digest(value: Any) -> str:
+    """Content hash of a task output; frames hash their values, anything else its pickle"""
+    if isinstance(value, pd.DataFrame):
+        return chunk_digest(value)
+    return hashlib.sha256(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+def _source(obj: CodeDep) -> str:
+    try:
+        return inspect.getsource(obj)
+    except (OSError, TypeError):
+        return f"{getattr(obj, '__module__', '')}.{getattr(obj, '__qualname__', getattr(obj, '__name__', obj))}"
+
+
+def _source_digest(func: Callable, code_deps: Sequence[CodeDep] = ()) -> str:
+    """Hash of the module defining `func` and of every module or function in `code_deps`"""
+    digest = hashlib.sha256()
+    for obj in (inspect.getmodule(func) or func, *code_deps):
+        digest.update(_source(obj).encode())
+        digest.update(b'\x1e')
+    return digest.hexdigest()
+
+
+class Task:
+    def __init__(self, name: str, func: Callable, deps: Sequence[str] = (), after: Sequence[str] = (),
+                 params: Optional[Dict[str, Any]] = None, cache: bool = True,
+                 tables: Sequence[str] = (), code_deps: Sequence[CodeDep] = (), executor: str = 'thread'):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor {executor}, expected one of {EXECUTORS}")
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)      # outputs passed as keyword arguments
+        self.after = tuple(after)    # ordering only
+        self.params = params or {}
+        self.cache = cache
+        self.tables = tuple(tables)  # their data versions are part of the cache key
+        self.code_deps = tuple(code_deps)  # their source is part of the cache key
+        self.executor = executor
+
+    @property
+    def upstream(self) -> tuple:
+        return self.deps + self.after
+
+
+class TaskResult:
+    def __init__(self, name: str, status: str, executor: str, started: float = 0.0,
+                 seconds: float = 0.0, digest: Optional[str] = None, rows: Optional[int] = None,
+                 error: Optional[BaseException] = None):
+        self.name = name
+        self.status = status  # 'ran' | 'cached' | 'failed' | 'skipped'
+        self.executor = executor
+        self.started = started
+        self.seconds = seconds
+        self.digest = digest
+        self.rows = rows
+        self.error = error
+
+
+class DagRun:
+    """Results of one run, in completion order, with a timing report"""
+
+    def __init__(self, dag: 'DAG', results: Dict[str, TaskResult], outputs: Dict[str, Any],
+                 wall_seconds: float):
+        self.dag = dag
+        self.results = results
+        self._outputs = outputs
+        self.wall_seconds = wall_seconds
+
+    @property
+    def ok(self) -> bool:
+        return all(result.status in ('ran', 'cached') for result in self.results.values())
+
+    def output(self, name: str) -> Any:
+        if name not in self._outputs:
+            self._outputs[name] = self.dag.load_cached(name, self.results[name].digest)
+        return self._outputs[name]
+
+    def timings(self) -> pd.DataFrame:
+        return pd.DataFrame([{'task': r.name, 'status': r.status, 'executor': r.executor,
+                              'start': r.started, 'seconds': r.seconds, 'rows': r.rows}
+                             for r in self.results.values()]).set_index('task')
+
+    def report(self):
+        for result in sorted(self.results.values(), key=lambda r: r.started):
+            rows = f"{result.rows:>12,} rows" if result.rows is not None else ' ' * 17
+            logger.info(f"{result.name:<24} {result.status:<8} {result.executor:<8} "
+                        f"+{result.started:>7.2f}s {result.seconds:>8.2f}s  {rows}")
+        busy = sum(result.seconds for result in self.results.values())
+        counts = pd.Series([result.status for result in self.results.values()]).value_counts().to_dict()
+        logger.info(f"{self.dag.name}: {counts} in {self.wall_seconds:.2f}s wall, "
+                    f"{busy:.2f}s of task time ({busy / self.wall_seconds if self.wall_seconds else 0:.1f}x)")
+
+
+class DAG:
+    def __init__(self, name: str, cache_dir: str = DAG_CONFIG['cache_dir'], keep: int = DAG_CONFIG['keep']):
+        self.name = name
+        self.cache_dir = Path(cache_dir) / name
+        self.keep = keep  # cache entries kept per task, most recently used first
+        self.tasks: Dict[str, Task] = {}
+
+    def add(self, name: str, func: Callable, **options) -> Task:
+        if name in self.tasks:
+            raise ValueError(f"Task {name} is already defined in {self.name}")
+        task = self.tasks[name] = Task(name, func, **options)
+        return task
+
+    def task(self, name: Optional[str] = None, **options):
+        """Decorator form of add(); the task is named after the function by default"""
+        def decorator(func):
+            self.add(name or func.__name__, func, **options)
+            return func
+        return decorator
+
+    def _plan(self, targets: Optional[Iterable[str]]) -> List[str]:
+        """Topological order of the targets and everything upstream of them"""
+        order, state = [], {}
+
+        def visit(name, path):
+            if name not in self.tasks:
+                raise ValueError(f"Unknown task {name} (needed by {path[-1] if path else 'the run'})")
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Cycle in {self.name}: {' -> '.join([*path, name])}")
+            state[name] = 'visiting'
+            for upstream in self.tasks[name].upstream:
+                visit(upstream, [*path, name])
+            state[name] = 'done'
+            order.append(name)
+
+        for name in (targets or self.tasks):
+            visit(name, [])
+        return order
+
+    # -- cache -----------------------------------------------------------------------------
+
+    def _key(self, task: Task, digests: Dict[str, str]) -> str:
+        parts = [task.name, _source_digest(task.func, task.code_deps), repr(sorted(task.params.items())),
+                 *(f"{name}={digests[name]}" for name in task.deps)]
+        if task.tables:
+            parts.append(repr(sorted(read_table_versions(task.tables).items())))
+        return hashlib.sha256('\x1e'.join(parts).encode()).hexdigest()
+
+    def _cache_path(self, name: str, key: str) -> Path:
+        return self.cache_dir / name / key
+
+    def cached_digest(self, name: str, key: str) -> Optional[str]:
+        path = self._cache_path(name, key).with_suffix('.digest')
+        if not path.exists():
+            return None
+        digest = path.read_text()
+        # A pointer whose output was deleted is a miss, the task runs and rewrites both
+        if not (self.cache_dir / name / f'{digest}.pkl').exists():
+            return None
+        path.touch()  # recency for prune_cache
+        return digest
+
+    def load_cached(self, name: str, digest: str) -> Any:
+        with open(self.cache_dir / name / f'{digest}.pkl', 'rb') as f:
+            return pickle.load(f)
+
+    def _store(self, name: str, key: str, digest: str, output: Any):
+        """Output by content digest, key -> digest pointer written last so a crash leaves no bad entry"""
+        directory = self.cache_dir / name
+        directory.mkdir(parents=True, exist_ok=True)
+        output_path = directory / f'{digest}.pkl'
+        if not output_path.exists():
+            tmp = output_path.with_suffix('.tmp')
+            with open(tmp, 'wb') as f:
+                pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, output_path)
+        pointer = self._cache_path(name, key).with_suffix('.digest')
+        pointer.with_suffix('.tmp').write_text(digest)
+        os.replace(pointer.with_suffix('.tmp'), pointer)
+
+    def prune_cache(self, keep: Optional[int] = None) -> int:
+        """Keep the `keep` most recently used keys of every task, delete the rest, returns files deleted"""
+        keep = self.keep if keep is None else keep
+        deleted = 0
+        for directory in (path for path in self.cache_dir.glob('*') if path.is_dir()):
+            pointers = sorted(directory.glob('*.digest'), key=lambda path: path.stat().st_mtime, reverse=True)
+            for pointer in pointers[keep:]:
+                pointer.unlink()
+                deleted += 1
+            referenced = {pointer.read_text() for pointer in pointers[:keep]}
+            for output in directory.glob('*.pkl'):
+                if output.stem not in referenced:
+                    output.unlink()
+                    deleted += 1
+        return deleted
+
+    def clear_cache(self):
+        for path in sorted(self.cache_dir.rglob('*'), reverse=True):
+            path.unlink() if path.is_file() else path.rmdir()
+
+    # -- execution -------------------------------------------------------------------------
+
+    def run(self, targets: Optional[Iterable[str]] = None, workers: Optional[int] = DAG_CONFIG['workers'],
+            force: Iterable[str] = (), raise_on_failure: bool = True) -> DagRun:
+        """
+        Run the targets (default: every task) and their upstream tasks. Tasks in
+        `force` run even when cached. Failed tasks skip everything downstream of
+        them; independent branches still finish.
+        """
+        plan = self._plan(targets)
+        force = set(force)
+        workers = workers or os.cpu_count() or 1
+        uses_processes = any(self.tasks[name].executor == 'process' for name in plan)
+        threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=self.name)
+        # spawned, not forked, so workers never inherit pooled database connections
+        processes = (ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+                     if uses_processes else None)
+
+        started = time.perf_counter()
+        results: Dict[str, TaskResult] = {}
+        outputs: Dict[str, Any] = {}
+        digests: Dict[str, str] = {}
+        running: Dict[Future, tuple] = {}
+        waiting = list(plan)
+
+        def output(name):
+            if name not in outputs:
+                outputs[name] = self.load_cached(name, digests[name])
+            return outputs[name]
+
+        try:
+            while waiting or running:
+                for name in list(waiting):
+                    task = self.tasks[name]
+                    upstream = [results.get(dep) for dep in task.upstream]
+                    if any(result is None for result in upstream):
+                        continue
+                    waiting.remove(name)
+                    if any(result.status in ('failed', 'skipped') for result in upstream):
+                        results[name] = TaskResult(name, 'skipped', task.executor,
+                                                   time.perf_counter() - started)
+                        continue
+
+                    key = self._key(task, digests)
+                    digest = self.cached_digest(name, key) if task.cache and name not in force else None
+                    if digest is not None:
+                        digests[name] = digest
+                        results[name] = TaskResult(name, 'cached', task.executor,
+                                                   time.perf_counter() - started, digest=digest)
+                        continue
+                    kwargs = {**task.params, **{dep: output(dep) for dep in task.deps}}
+                    pool = processes if task.executor == 'process' else threads
+                    running[pool.submit(task.func, **kwargs)] = (name, key, time.perf_counter())
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, key, submitted = running.pop(future)
+                    task = self.tasks[name]
+                    seconds = time.perf_counter() - submitted
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        logger.error(f"Task {name} failed after {seconds:.2f}s: {e}")
+                        results[name] = TaskResult(name, 'failed', task.executor, submitted - started,
+                                                   seconds, error=e)
+                        continue
+                    digest = output_digest(value)
+                    outputs[name], digests[name] = value, digest
+                    if task.cache:
+                        self._store(name, key, digest, value)
+                    results[name] = TaskResult(name, 'ran', task.executor, submitted - started, seconds,
+                                               digest, len(value) if isinstance(value, pd.DataFrame) else None)
+        finally:
+            threads.shutdown(wait=True, cancel_futures=True)
+            if processes is not None:
+                processes.shutdown(wait=True, cancel_futures=True)
+
+        pruned = self.prune_cache()
+        if pruned:
+            logger.info(f"Pruned {pruned} stale cache files from {self.cache_dir}")
+        run = DagRun(self, results, outputs, time.perf_counter() - started)
+        failed = [name for name, result in results.items() if result.status == 'failed']
+        if failed and raise_on_failure:
+            run.report()
+            raise RuntimeError(f"{self.name} tasks failed: {failed}") from results[failed[0]].error
+        return run
@@ -0,0 +1,9 @@
+from orchestration import ad_pipeline
+
+
+def test_an_empty_extract_attributes_to_an_empty_frame(monkeypatch):
+    monkeypatch.setattr(ad_pipeline, 'stream_user_touchpoints', lambda: iter([]))
+    touchpoints = ad_pipeline.extract_touchpoints()
+    assert list(touchpoints.columns) == list(ad_pipeline.TOUCHPOINT_DTYPES)
+    credits = ad_pipeline.attribute(touchpoints, ['linear', 'markov'])
+    assert credits.empty and list(credits.columns) == ['campaign_id', 'linear', 'markov']
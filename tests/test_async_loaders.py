@@ -0,0 +1,39 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from database import async_connection
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    bumped = []
+    inserted = {'rows': 0}
+
+    async def copy_insert(table_name, data):
+        return inserted['rows']
+
+    async def bump_table_versions_async(*tables):
+        bumped.extend(tables)
+
+    monkeypatch.setattr(async_connection.async_db_manager, 'copy_insert', copy_insert)
+    monkeypatch.setattr(async_connection, 'bump_table_versions_async', bump_table_versions_async)
+    monkeypatch.setattr(async_connection, 'refresh_touchpoint_funnel', lambda: 0)
+    return inserted, bumped
+
+
+def test_versions_are_bumped_only_when_rows_were_inserted(loads):
+    inserted, bumped = loads
+    frame = pd.DataFrame({'campaign_id': ['a']})
+    loaders = [async_connection.load_campaign_data_async,
+               lambda df: async_connection.load_performance_data_async(df, refresh_rollups=False),
+               async_connection.load_journey_data_async]
+    for load in loaders:
+        assert asyncio.run(load(frame)) == 0
+    assert bumped == []
+
+    inserted['rows'] = 1
+    for load in loaders:
+        asyncio.run(load(frame))
+    assert bumped == ['campaigns', 'daily_performance', 'user_touchpoints']
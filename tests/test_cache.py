@@ -0,0 +1,84 @@
+import pandas as pd
+
+from database.cache import ResultCache
+
+
+class Versions:
+    """Stands in for read_table_versions"""
+
+    def __init__(self):
+        self.versions = {}
+        self.reads = 0
+
+    def __call__(self, tables):
+        self.reads += 1
+        return {table: self.versions.get(table, 0) for table in tables}
+
+
+def counting(value):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return value
+    return compute, calls
+
+
+def test_none_results_are_cached():
+    cache = ResultCache(version_check_interval=0, version_reader=Versions())
+    compute, calls = counting(None)
+    assert cache.get_or_compute('empty', compute, ['conversions']) is None
+    assert cache.get_or_compute('empty', compute, ['conversions']) is None
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_a_load_invalidates_results_of_that_table():
+    versions = Versions()
+    cache = ResultCache(version_check_interval=0, version_reader=versions)
+    touchpoints, touchpoint_calls = counting(1)
+    performance, performance_calls = counting(2)
+    cache.get_or_compute('credits', touchpoints, ['user_touchpoints'])
+    cache.get_or_compute('spend', performance, ['daily_performance'])
+
+    versions.versions['user_touchpoints'] = 1
+    cache.get_or_compute('credits', touchpoints, ['user_touchpoints'])
+    cache.get_or_compute('spend', performance, ['daily_performance'])
+    assert len(touchpoint_calls) == 2 and len(performance_calls) == 1
+    assert cache.stats()['invalidations'] == 1 and cache.stats()['entries'] == 2
+
+
+def test_versions_are_reread_only_after_the_check_interval():
+    versions = Versions()
+    cache = ResultCache(version_check_interval=3600, version_reader=versions)
+    compute, calls = counting(1)
+    cache.get_or_compute('credits', compute, ['user_touchpoints'])
+    versions.versions['user_touchpoints'] = 1
+    cache.get_or_compute('credits', compute, ['user_touchpoints'])
+    assert versions.reads == 1 and len(calls) == 1
+
+
+def test_ttl_and_size_bound():
+    cache = ResultCache(max_bytes=10_000, ttl=0, version_check_interval=0, version_reader=Versions())
+    compute, calls = counting(1)
+    cache.get_or_compute('short', compute, [])
+    cache.get_or_compute('short', compute, [])
+    assert len(calls) == 2 and cache.stats()['expirations'] == 1
+
+    cache = ResultCache(max_bytes=10_000, version_check_interval=0, version_reader=Versions())
+    for i in range(5):
+        cache.get_or_compute(i, lambda: pd.DataFrame({'x': range(300)}), [])
+    assert cache.stats()['bytes'] <= 10_000 and cache.stats()['evictions'] > 0
+
+
+def test_decorated_results_are_copies():
+    cache = ResultCache(version_check_interval=0, version_reader=Versions())
+
+    @cache.cached(tables=['daily_performance'])
+    def frame(n, columns=('x',)):
+        return pd.DataFrame({column: range(n) for column in columns})
+
+    first = frame(3, columns=['x', 'y'])
+    first['x'] = -1
+    assert frame(3, columns=['x', 'y'])['x'].tolist() == [0, 1, 2]
+    assert cache.stats()['hits'] == 1
@@ -0,0 +1,93 @@
+from contextlib import contextmanager
+
+import pandas as pd
+import pytest
+
+from database.connection import DatabaseManager, chunk_digest
+
+
+class FakeCheckpoints:
+    """Stands in for the database: load_checkpoints rows and the chunks merged into the target"""
+
+    def __init__(self):
+        self.rows = set()  # (load_id, table_name, chunk_hash)
+        self.loaded = []
+        self.fail_after = None
+
+    def cursor(self):
+        checkpoints = self
+
+        class Cursor:
+            def execute(self, query, params=None):
+                if 'SELECT chunk_hash' in query:
+                    load_id, table_name = params
+                    self.result = [(digest,) for lid, table, digest in checkpoints.rows
+                                   if (lid, table) == (load_id, table_name)]
+                elif 'INSERT INTO load_checkpoints' in query:
+                    table_name, digest, load_id = params[:3]
+                    checkpoints.rows.add((load_id, table_name, digest))
+
+            def fetchall(self):
+                return self.result
+
+        return Cursor()
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    checkpoints = FakeCheckpoints()
+    manager = DatabaseManager({})
+
+    @contextmanager
+    def get_cursor(autocommit=False, dict_cursor=False):
+        yield checkpoints.cursor(), None
+
+    def copy_chunks(cursor, table_name, chunks, on_conflict, operation):
+        chunks = list(chunks)
+        if checkpoints.fail_after is not None and len(checkpoints.loaded) >= checkpoints.fail_after:
+            raise RuntimeError('connection lost')
+        checkpoints.loaded.extend(chunks)
+        rows = sum(len(chunk) for chunk in chunks)
+        return rows, rows
+
+    monkeypatch.setattr(manager, 'get_cursor', get_cursor)
+    monkeypatch.setattr(manager, '_copy_chunks', copy_chunks)
+    manager.checkpoints = checkpoints
+    return manager
+
+
+def frame(n=500):
+    return pd.DataFrame({'user_id': [f'user_{i:06d}' for i in range(n)], 'value': range(n)})
+
+
+def test_chunk_digest_ignores_the_index_only():
+    df = frame(10)
+    assert chunk_digest(df) == chunk_digest(df.set_axis(range(100, 110)))
+    assert chunk_digest(df) != chunk_digest(df.assign(value=df['value'] + 1))
+    assert chunk_digest(df) != chunk_digest(df.rename(columns={'value': 'other'}))
+    assert chunk_digest(df) != chunk_digest(df.iloc[::-1])
+
+
+def test_resume_skips_committed_chunks(manager):
+    manager.checkpoints.fail_after = 3
+    with pytest.raises(RuntimeError):
+        manager.checkpointed_copy_insert('user_touchpoints', frame(), 'run-1', chunk_size=100)
+    assert len(manager.checkpoints.loaded) == 3
+
+    manager.checkpoints.fail_after = None
+    inserted = manager.checkpointed_copy_insert('user_touchpoints', frame(), 'run-1', chunk_size=100)
+    assert inserted == 200
+    assert [chunk['value'].iloc[0] for chunk in manager.checkpoints.loaded] == [0, 100, 200, 300, 400]
+
+
+def test_checkpoints_are_scoped_to_the_load_id(manager):
+    assert manager.checkpointed_copy_insert('user_touchpoints', frame(), 'run-1', chunk_size=100) == 500
+    assert manager.checkpointed_copy_insert('user_touchpoints', frame(), 'run-1', chunk_size=100) == 0
+    # e.g. after the table was truncated: a new load copies everything again
+    assert manager.checkpointed_copy_insert('user_touchpoints', frame(), 'run-2', chunk_size=100) == 500
+    assert manager.checkpointed_copy_insert('daily_performance', frame(), 'run-1', chunk_size=100) == 500
+
+
+def test_a_load_id_is_required(manager):
+    with pytest.raises(ValueError, match='load_id'):
+        manager.checkpointed_copy_insert('user_touchpoints', frame(), None)
@@ -0,0 +1,78 @@
+import threading
+from types import SimpleNamespace
+
+import psycopg2.extensions
+import pytest
+
+from database import connection
+from database.connection import ConnectionPool, DatabaseManager, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.info = SimpleNamespace(transaction_status=psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+
+    def rollback(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture(autouse=True)
+def fake_connect(monkeypatch):
+    opened = []
+
+    def connect(**config):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(connection.psycopg2, 'connect', connect)
+    return opened
+
+
+def test_connections_are_reused(fake_connect):
+    pool = ConnectionPool({}, min_size=1, max_size=2)
+    first = pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+    assert len(fake_connect) == 1
+
+
+def test_exhausted_pool_times_out():
+    pool = ConnectionPool({}, min_size=0, max_size=1, timeout=0.05)
+    pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_waiters_get_released_connections():
+    pool = ConnectionPool({}, min_size=0, max_size=1, timeout=5)
+    conn = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    pool.release(conn)
+    waiter.join(5)
+    assert acquired == [conn]
+
+
+def test_connection_released_after_close_is_closed_not_pooled(fake_connect):
+    manager = DatabaseManager({}, min_connections=1)
+    with manager.get_connection() as conn:
+        old_pool = manager._pool
+        manager.close()
+        assert manager._pool is None
+    assert conn.closed
+    assert old_pool.stats()['size'] == 0
+
+    # the next operation opens a fresh pool that never saw the old connection
+    with manager.get_connection() as fresh:
+        assert fresh is not conn
+    assert conn not in [idle for idle, _ in manager._pool._idle]
@@ -0,0 +1,41 @@
+import pandas as pd
+
+from attribution import conversions
+from attribution.conversions import CONVERSIONS_REPLACED, conversion_credits
+from attribution.models import build_journeys
+
+
+def touchpoints():
+    return pd.DataFrame({
+        'user_id': ['u1', 'u1', 'u1', 'u2', 'u2', 'u3'],
+        'timestamp': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-03',
+                                     '2024-01-01', '2024-01-04', '2024-01-02']),
+        'campaign_id': ['a', 'b', 'a', 'c', 'c', 'a'],
+        'touchpoints_type': ['impression', 'view', 'click', 'impression', 'click', 'impression'],
+    })
+
+
+def test_credits_sum_to_one_per_conversion():
+    credits = conversion_credits(build_journeys(touchpoints()), ['first_touch', 'last_touch', 'linear'])
+    totals = credits.groupby(['attribution_model', 'user_id'])['credit'].sum()
+    assert (totals.round(12) == 1).all()
+    assert set(credits['user_id']) == {'u1', 'u2'}
+    linear = credits[credits['attribution_model'] == 'linear'].set_index(['user_id', 'attributed_campaign_id'])
+    assert linear['credit'].round(12).to_dict() == {('u1', 'a'): round(2 / 3, 12), ('u1', 'b'): round(1 / 3, 12),
+                                                    ('u2', 'c'): 1.0}
+
+
+def test_write_replaces_the_window_in_the_same_transaction(monkeypatch):
+    written = {}
+
+    def copy_insert(table_name, rows, on_conflict, before_merge):
+        written.update(table=table_name, rows=pd.concat([chunk for chunk in rows if len(chunk)]), before_merge=before_merge)
+        return len(written['rows'])
+
+    monkeypatch.setattr(conversions, 'stream_user_touchpoints', lambda start, end, chunk_size: [touchpoints()])
+    monkeypatch.setattr(conversions.db_manager, 'copy_insert', copy_insert)
+    monkeypatch.setattr(conversions, 'bump_table_versions', lambda *tables: None)
+
+    start, end = pd.Timestamp('2024-01-01'), pd.Timestamp('2024-02-01')
+    assert conversions.write_conversions(start, end, ['linear']) == 3
+    assert written['before_merge'] == (CONVERSIONS_REPLACED, (['linear'], 'click', start, end))
@@ -0,0 +1,178 @@
+import importlib.util
+import itertools
+
+import pandas as pd
+import pytest
+
+from orchestration.dag import DAG
+
+calls = []
+counter = itertools.count()
+
+
+def numbers(n):
+    calls.append('numbers')
+    return pd.DataFrame({'x': range(n)})
+
+
+def total(numbers):
+    calls.append('total')
+    return int(numbers['x'].sum())
+
+
+def double(total):
+    calls.append('double')
+    return total * 2
+
+
+def fails(numbers):
+    raise ValueError('boom')
+
+
+def never(fails):
+    calls.append('never')
+
+
+def tick():
+    return next(counter)
+
+
+def square(n):
+    return n * n
+
+
+def pipeline(tmp_path, n=10, **options):
+    dag = DAG('test', tmp_path, **options)
+    dag.add('numbers', numbers, params={'n': n})
+    dag.add('total', total, deps=('numbers',))
+    dag.add('double', double, deps=('total',))
+    return dag
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+def test_outputs_flow_by_name_and_reruns_are_cached(tmp_path):
+    run = pipeline(tmp_path).run(workers=2)
+    assert calls == ['numbers', 'total', 'double']
+    assert run.output('double') == 90 and run.ok
+
+    calls.clear()
+    cached = pipeline(tmp_path).run(workers=2)
+    assert calls == []
+    assert {result.status for result in cached.results.values()} == {'cached'}
+    assert cached.output('double') == 90
+    assert cached.output('numbers')['x'].tolist() == list(range(10))
+
+
+def test_changed_params_rerun_only_what_changed(tmp_path):
+    pipeline(tmp_path).run()
+    calls.clear()
+    run = pipeline(tmp_path, n=4).run()
+    assert calls == ['numbers', 'total', 'double']
+    assert run.output('double') == 12
+
+    # same total from different numbers: double is served from the cache
+    dag = pipeline(tmp_path, n=4)
+    dag.tasks['numbers'].params = {'n': 4}
+    calls.clear()
+    dag.run(force=('numbers',))
+    assert calls == ['numbers']
+
+
+def test_targets_and_force(tmp_path):
+    run = pipeline(tmp_path).run(targets=['total'])
+    assert set(run.results) == {'numbers', 'total'}
+    calls.clear()
+    pipeline(tmp_path).run(force=('total',))
+    assert calls == ['total', 'double']
+
+
+def test_code_deps_invalidate_wrappers(tmp_path):
+    helper_path = tmp_path / 'helper_module.py'
+    helper_path.write_text('def scale(x):\n    return x * 2\n')
+    spec = importlib.util.spec_from_file_location('helper_module', helper_path)
+    helper = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(helper)
+
+    def build():
+        dag = DAG('code', tmp_path / 'cache')
+        dag.add('scaled', lambda: helper.scale(21), code_deps=(helper,))
+        return dag
+
+    assert build().run().output('scaled') == 42
+    assert build().run().results['scaled'].status == 'cached'
+
+    helper_path.write_text('def scale(x):\n    return x * 3\n')
+    spec.loader.exec_module(helper)
+    run = build().run()
+    assert run.results['scaled'].status == 'ran'
+    assert run.output('scaled') == 63
+
+
+def test_ordering_only_upstream_is_not_in_the_key(tmp_path):
+    def build():
+        dag = DAG('after', tmp_path)
+        dag.add('tick', tick, cache=False)
+        dag.add('numbers', numbers, params={'n': 3}, after=('tick',))
+        return dag
+
+    build().run()
+    run = build().run()
+    assert run.results['tick'].status == 'ran'
+    assert run.results['numbers'].status == 'cached'
+
+
+def test_failure_skips_downstream_only(tmp_path):
+    dag = pipeline(tmp_path)
+    dag.add('fails', fails, deps=('numbers',))
+    dag.add('never', never, deps=('fails',))
+    run = dag.run(raise_on_failure=False)
+    statuses = {name: result.status for name, result in run.results.items()}
+    assert statuses == {'numbers': 'ran', 'total': 'ran', 'double': 'ran', 'fails': 'failed', 'never': 'skipped'}
+    assert 'never' not in calls and not run.ok
+
+    with pytest.raises(RuntimeError, match=r"\['fails'\]"):
+        dag.run()
+
+
+def test_process_tasks(tmp_path):
+    dag = DAG('processes', tmp_path)
+    dag.add('square', square, params={'n': 12}, executor='process')
+    assert dag.run(workers=1).output('square') == 144
+
+
+def test_cycles_and_unknown_tasks_are_rejected(tmp_path):
+    dag = DAG('cycle', tmp_path)
+    dag.add('a', tick, after=('b',))
+    dag.add('b', tick, after=('a',))
+    with pytest.raises(ValueError, match='Cycle in cycle: a -> b -> a'):
+        dag.run()
+    with pytest.raises(ValueError, match='Unknown task'):
+        dag.run(targets=['c'])
+    with pytest.raises(ValueError, match='already defined'):
+        dag.add('a', tick)
+
+
+def test_prune_keeps_the_most_recent_entries(tmp_path):
+    for n in range(5):
+        pipeline(tmp_path, n=n, keep=2).run()
+    numbers_dir = tmp_path / 'test' / 'numbers'
+    assert len(list(numbers_dir.glob('*.digest'))) == 2
+    assert len(list(numbers_dir.glob('*.pkl'))) == 2
+    calls.clear()
+    pipeline(tmp_path, n=4, keep=2).run()
+    assert calls == []
+
+
+def test_a_pointer_without_its_output_is_a_miss(tmp_path):
+    pipeline(tmp_path).run()
+    for output in (tmp_path / 'test' / 'total').glob('*.pkl'):
+        output.unlink()
+    calls.clear()
+    run = pipeline(tmp_path).run()
+    assert calls == ['total']
+    assert run.results['total'].status == 'ran' and run.results['double'].status == 'cached'
+    assert run.output('double') == 90
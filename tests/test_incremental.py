@@ -0,0 +1,98 @@
+import pandas as pd
+import pytest
+
+from attribution import incremental
+from attribution.incremental import PIPELINE_NAME, credit_journeys, run_incremental_attribution
+
+
+class FakeWarehouse:
+    """Stands in for user_touchpoints, user_journey_state, campaign_attribution_credits and etl_watermarks"""
+
+    def __init__(self):
+        self.touchpoints = pd.DataFrame(columns=['id', 'user_id', 'timestamp', 'campaign_id', 'touchpoints_type'])
+        self.state = pd.DataFrame(columns=incremental.STATE_COLUMNS)
+        self.credits = {}
+        self.watermark = None
+
+    def load(self, *rows):
+        start = len(self.touchpoints) + 1
+        new = pd.DataFrame(rows, columns=['user_id', 'timestamp', 'campaign_id', 'touchpoints_type'])
+        new.insert(0, 'id', range(start, start + len(new)))
+        new['timestamp'] = pd.to_datetime(new['timestamp'])
+        self.touchpoints = pd.concat([self.touchpoints, new], ignore_index=True) if start > 1 else new
+
+    def select(self, mask):
+        rows = self.touchpoints[mask].sort_values(['user_id', 'timestamp'])
+        return rows.drop(columns='id').reset_index(drop=True)
+
+    def commit(self, state_df, deltas_df, high_id, pipeline=PIPELINE_NAME):
+        kept = self.state[~self.state['user_id'].isin(state_df['user_id'])]
+        self.state = pd.concat([kept, state_df]) if len(kept) else state_df
+        for row in deltas_df.itertuples(index=False):
+            key = (row.campaign_id, row.attribution_model)
+            self.credits[key] = self.credits.get(key, 0.0) + row.credit
+        self.watermark = max(high_id, self.watermark or 0)
+
+
+@pytest.fixture
+def warehouse(monkeypatch):
+    db = FakeWarehouse()
+    ids = lambda: db.touchpoints['id']  # noqa: E731
+    monkeypatch.setattr(incremental, 'read_id_watermark', lambda pipeline: db.watermark)
+    monkeypatch.setattr(incremental, 'committed_touchpoint_id',
+                        lambda: int(ids().max()) if len(db.touchpoints) else None)
+    monkeypatch.setattr(incremental, 'extract_touchpoints_ingested',
+                        lambda after, up_to: db.select((ids() > (after or 0)) & (ids() <= up_to)))
+    monkeypatch.setattr(incremental, 'extract_user_touchpoints',
+                        lambda users, up_to: db.select(db.touchpoints['user_id'].isin(users) & (ids() <= up_to)))
+    monkeypatch.setattr(incremental, 'read_journey_state',
+                        lambda users: db.state[db.state['user_id'].isin(users)])
+    monkeypatch.setattr(incremental, 'commit_incremental_run', db.commit)
+    return db
+
+
+def recomputed(db):
+    full = credit_journeys(db.select(db.touchpoints['id'] > 0))
+    return {(row.campaign_id, row.attribution_model): row.credit for row in full.itertuples(index=False)}
+
+
+def assert_totals_match_a_full_run(db):
+    totals = {key: credit for key, credit in db.credits.items() if round(credit, 12)}
+    assert totals == pytest.approx(recomputed(db))
+
+
+def test_late_rows_of_a_later_load_are_credited(warehouse):
+    warehouse.load(('u1', '2024-01-10', 'a', 'impression'),
+                   ('u1', '2024-01-12', 'a', 'click'),
+                   ('u2', '2024-01-11', 'b', 'impression'))
+    run_incremental_attribution()
+    assert warehouse.credits[('a', 'first_touch')] == 1.0
+    assert_totals_match_a_full_run(warehouse)
+
+    # every row of the second load is at or behind the first run's max timestamp
+    warehouse.load(('u1', '2024-01-01', 'b', 'impression'),   # before u1's credited conversion
+                   ('u2', '2024-01-05', 'c', 'click'),        # converts u2 ahead of its first touch
+                   ('u3', '2024-01-12', 'c', 'click'),        # equal to the old event-time watermark
+                   ('u1', '2024-01-20', 'c', 'impression'))   # after u1's conversion, no change
+    deltas = run_incremental_attribution()
+    assert set(deltas['attribution_model']) == set(incremental.ATTRIBUTION_MODELS)
+    assert warehouse.credits[('a', 'first_touch')] == 0.0
+    assert warehouse.credits[('b', 'first_touch')] == 1.0
+    assert warehouse.credits[('c', 'last_touch')] == 2.0
+    assert_totals_match_a_full_run(warehouse)
+
+    state = warehouse.state.set_index('user_id')
+    assert state.loc['u1', 'first_touch_time'] == pd.Timestamp('2024-01-01')
+    assert state.loc['u1', 'last_touch_time'] == pd.Timestamp('2024-01-20')
+    assert state.loc['u1', 'touchpoint_count'] == 4
+    assert state.loc['u2', 'conversion_timestamp'] == pd.Timestamp('2024-01-05')
+    assert warehouse.watermark == 7
+
+
+def test_a_run_without_new_ids_does_nothing(warehouse):
+    assert run_incremental_attribution().empty
+    warehouse.load(('u1', '2024-01-10', 'a', 'click'))
+    run_incremental_attribution()
+    credits = dict(warehouse.credits)
+    assert run_incremental_attribution().empty
+    assert warehouse.credits == credits
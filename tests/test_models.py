@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+from attribution.models import (build_journeys, collapse_paths, first_touch_credit, last_touch_credit,
+                               linear_credit, markov_credit, markov_removal_effects, markov_transition_matrix,
+                               position_based_credit, shapley_credit, time_decay_credit)
+
+
+def journeys(*paths, unit='min'):
+    """
+    One user per path of channels, one touch per `unit`; a path ending in '*'
+    converts on its last touch
+    """
+    rows = []
+    for user, path in enumerate(paths):
+        converts = path.endswith('*')
+        channels = path.rstrip('*')
+        for position, channel in enumerate(channels):
+            converted_here = converts and position == len(channels) - 1
+            rows.append((f'user_{user:06d}', position, channel, 'click' if converted_here else 'impression'))
+    df = pd.DataFrame(rows, columns=['user_id', 'step', 'campaign_id', 'touchpoints_type'])
+    df['timestamp'] = pd.Timestamp('2024-01-01') + pd.to_timedelta(df['step'], unit=unit)
+    return build_journeys(df)
+
+
+def per_journey(j, credit):
+    """Row credits split into one rounded list per journey"""
+    return [np.round(part, 12).tolist() for part in np.split(credit, j.starts[1:])]
+
+
+# four-, three-, two- and one-touch conversions; the open journey is dropped by converting()
+RULE_JOURNEYS = ('abcd*', 'abc*', 'ab*', 'd*', 'ca')
+
+
+def test_first_and_last_touch_credit():
+    j = journeys(*RULE_JOURNEYS).converting()
+    assert per_journey(j, first_touch_credit(j)) == [[1, 0, 0, 0], [1, 0, 0], [1, 0], [1]]
+    assert per_journey(j, last_touch_credit(j)) == [[0, 0, 0, 1], [0, 0, 1], [0, 1], [1]]
+
+
+def test_linear_credit():
+    j = journeys(*RULE_JOURNEYS).converting()
+    third = round(1 / 3, 12)
+    assert per_journey(j, linear_credit(j)) == [[0.25] * 4, [third] * 3, [0.5, 0.5], [1]]
+
+
+def test_position_based_credit():
+    j = journeys(*RULE_JOURNEYS).converting()
+    assert per_journey(j, position_based_credit(j)) == [[0.4, 0.1, 0.1, 0.4], [0.4, 0.2, 0.4], [0.5, 0.5], [1]]
+    # without a middle the two touches share pro rata, a single touch takes everything
+    assert per_journey(j, position_based_credit(j, first_weight=0.3, last_weight=0.5)) == [
+        [0.3, 0.1, 0.1, 0.5], [0.3, 0.2, 0.5], [0.375, 0.625], [1]]
+
+
+def test_time_decay_credit_halves_per_half_life():
+    # one touch a week: weights 1/8, 1/4, 1/2, 1 against the conversion
+    j = journeys(*RULE_JOURNEYS, unit='W').converting()
+    assert per_journey(j, time_decay_credit(j)) == [
+        [round(w / 1.875, 12) for w in (0.125, 0.25, 0.5, 1)],
+        [round(w / 1.75, 12) for w in (0.25, 0.5, 1)],
+        [round(1 / 3, 12), round(2 / 3, 12)], [1]]
+    # a two-week half-life weighs the same touches 2^-1/2 apart
+    two_touch = per_journey(j, time_decay_credit(j, half_life_days=14))[2]
+    assert two_touch == [round(2 ** -0.5 / (1 + 2 ** -0.5), 12), round(1 / (1 + 2 ** -0.5), 12)]
+
+
+def by_channel(journeys, credit):
+    return dict(zip(journeys.channels, np.round(credit, 12)))
+
+
+def test_markov_credit_sums_to_conversions():
+    j = journeys('ab*', 'ba', 'cab*', 'c', 'bc*', 'a')
+    credit = markov_credit(j)
+    assert credit.sum().round(12) == 3
+    assert (credit >= 0).all()
+
+
+def test_markov_credit_is_symmetric_and_ignores_dead_ends():
+    j = journeys('a*', 'b*', 'a', 'b', 'c')
+    removal_effects, base = markov_removal_effects(j)
+    assert round(base, 12) == 0.4
+    assert by_channel(j, markov_credit(j)) == {'a': 1.0, 'b': 1.0, 'c': 0.0}
+
+
+def test_markov_removal_effect_of_a_required_channel_is_one():
+    # every converting path runs through b
+    j = journeys('ab*', 'b*', 'a', 'cb*')
+    removal_effects, _ = markov_removal_effects(j)
+    assert by_channel(j, removal_effects)['b'] == 1.0
+    assert by_channel(j, removal_effects)['a'] < 1.0
+
+
+def random_journeys(n_users=300, n_channels=6, seed=0):
+    rng = np.random.default_rng(seed)
+    paths = []
+    for _ in range(n_users):
+        path = ''.join(rng.choice(list('abcdef'[:n_channels]), size=rng.integers(1, 5)))
+        paths.append(path + '*' if rng.random() < 0.3 else path)
+    return journeys(*paths)
+
+
+def removed_by_resolving(j, channel):
+    """Conversion probability from START with `channel` sent to NULL, one full solve per channel"""
+    n_channels = len(j.channels)
+    transitions = markov_transition_matrix(*collapse_paths(j), n_channels).toarray()
+    if channel is not None:
+        transitions[channel + 1] = 0.0
+        transitions[channel + 1, n_channels + 2] = 1.0
+    transient = transitions[:n_channels + 1, :n_channels + 1]
+    return np.linalg.solve(np.eye(n_channels + 1) - transient, transitions[:n_channels + 1, n_channels + 1])[0]
+
+
+def test_removal_effects_match_a_solve_per_removed_channel():
+    j = random_journeys()
+    base = removed_by_resolving(j, None)
+    expected = [1 - removed_by_resolving(j, channel) / base for channel in range(len(j.channels))]
+    for dense_fill_ratio in (0.0, 10.0):  # dense inverse, chunked sparse solves
+        removal_effects, solved_base = markov_removal_effects(j, chunk_size=2, dense_fill_ratio=dense_fill_ratio)
+        np.testing.assert_allclose(solved_base, base)
+        np.testing.assert_allclose(removal_effects, expected, atol=1e-12)
+
+
+def test_shapley_credit_of_a_two_channel_game():
+    # v({a}) = 1/2, v({b}) = 0, v({a, b}) = 1: the {a, b} conversion splits 3/4 to a, 1/4 to b
+    j = journeys('ab*', 'a', 'a*', 'b')
+    assert by_channel(j, shapley_credit(j)) == {'a': 1.75, 'b': 0.25}
+
+
+def test_shapley_credit_is_symmetric_and_sums_to_conversions():
+    j = journeys('ab*', 'ba*', 'a', 'b', 'c')
+    assert by_channel(j, shapley_credit(j)) == {'a': 1.0, 'b': 1.0, 'c': 0.0}
+
+    j = random_journeys(seed=1)
+    assert shapley_credit(j).sum().round(12) == j.converted.sum()
+
+
+def test_sampled_shapley_approaches_the_exact_values():
+    j = random_journeys(seed=2)
+    exact = shapley_credit(j)
+    sampled = shapley_credit(j, max_exact_channels=1, n_samples=4000, seed=0)
+    assert sampled.sum().round(12) == exact.sum().round(12)
+    np.testing.assert_allclose(sampled, exact, rtol=0.05)
@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl.extractors.snapshot import TouchpointSnapshot
+
+
+def touchpoints(user_ids, timestamps, types):
+    return pd.DataFrame({
+        'user_id': user_ids,
+        'timestamp': pd.to_datetime(timestamps),
+        'platform': 'facebook',
+        'campaign_id': 'fb_1',
+        'touchpoints_type': types,
+        'device_type': 'mobile',
+        'geo_location': 'US',
+    })
+
+
+def test_late_rows_land_in_their_day(tmp_path):
+    snapshot = TouchpointSnapshot(tmp_path)
+    snapshot.append([touchpoints(['user_000001', 'user_000002'], ['2024-01-02 10:00', '2024-01-03 09:00'],
+                                 ['impression', 'click'])], high_id=2)
+    assert snapshot.days == ['2024-01-02', '2024-01-03']
+
+    # ingested later, dated before everything above
+    snapshot.append([touchpoints(['user_000003'], ['2024-01-01 08:00'], ['click'])], high_id=3)
+    reopened = TouchpointSnapshot(tmp_path)
+    assert reopened.watermark == 3
+    assert reopened.days == ['2024-01-01', '2024-01-02', '2024-01-03']
+    assert reopened.to_frame()['user_id'].astype(str).tolist() == ['user_000001', 'user_000002', 'user_000003']
+
+
+def test_non_ascii_user_labels_round_trip(tmp_path):
+    snapshot = TouchpointSnapshot(tmp_path)
+    snapshot.append([touchpoints(['josé', 'zoë'], ['2024-01-01', '2024-01-01'], ['click', 'view'])], high_id=2)
+    snapshot.append([touchpoints(['müller'], ['2024-01-02'], ['click'])], high_id=3)
+    frame = TouchpointSnapshot(tmp_path).to_frame()
+    assert sorted(frame['user_id'].astype(str)) == ['josé', 'müller', 'zoë']
+
+
+def test_a_foreign_manifest_is_refused_and_left_alone(tmp_path):
+    (tmp_path / 'manifest.json').write_text(json.dumps({'name': 'something else'}))
+    (tmp_path / 'data.csv').write_text('x\n')
+    with pytest.raises(ValueError, match='not a touchpoint snapshot manifest'):
+        TouchpointSnapshot(tmp_path)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['data.csv', 'manifest.json']
+
+
+def test_validate_reads_the_memory_mapped_days(tmp_path):
+    snapshot = TouchpointSnapshot(tmp_path)
+    snapshot.append([touchpoints(['user_000001', 'user_000002', 'user_000003'],
+                                 ['2024-01-01', '2024-01-01', '2024-01-02'], ['click', 'clicked', None])])
+    columns = next(snapshot.iter_columns())
+    assert isinstance(columns['user_id'], np.memmap)
+    report = snapshot.validate()
+    assert report.rows == 3
+    assert report.issues() == ['2 touchpoints with a missing or unknown touchpoints_type']
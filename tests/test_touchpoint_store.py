@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from attribution.models import attribute, build_journeys
+from attribution.touchpoint_store import TouchpointStore, UserDictionary
+
+
+def touchpoints(user_ids, campaigns, types, minutes=None):
+    minutes = range(len(user_ids)) if minutes is None else minutes
+    return pd.DataFrame({
+        'user_id': user_ids,
+        'timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(list(minutes), unit='min'),
+        'platform': ['facebook' if c in ('a', 'b') else 'google_ads' for c in campaigns],
+        'campaign_id': campaigns,
+        'touchpoints_type': types,
+    })
+
+
+def test_numbered_ids_use_an_integer_dictionary():
+    codes, users = UserDictionary.encode(pd.Series(['user_000010', 'user_000002', 'user_000010']))
+    assert users.numbered
+    assert users.numbers.tolist() == [2, 10]
+    assert codes.tolist() == [1, 0, 1]
+    assert users.decode().tolist() == ['user_000002', 'user_000010']
+
+
+def test_irregular_ids_fall_back_to_labels():
+    codes, users = UserDictionary.encode(pd.Series(['user_02', 'user_2', 'bob']))
+    assert not users.numbered
+    assert users.decode(codes).tolist() == ['user_02', 'user_2', 'bob']
+
+
+def test_null_user_id_is_rejected():
+    df = touchpoints(['user_000001', None, 'user_000002'], ['a', 'b', 'a'], ['impression', 'click', 'click'])
+    with pytest.raises(ValueError, match='1 touchpoints have no user_id'):
+        TouchpointStore.from_frame(df)
+    with pytest.raises(ValueError, match='no user_id'):
+        UserDictionary.encode(pd.Series(['x', np.nan]))
+
+
+def test_round_trip_keeps_missing_categories():
+    df = touchpoints(['user_000003', 'user_000001', 'user_000001', 'user_000002'],
+                     ['a', None, 'c', 'b'], ['impression', 'click', None, 'click'])
+    store = TouchpointStore.from_frame(df)
+    assert store.codes['campaign_id'].dtype == np.int8
+    decoded = store.to_frame(user_id_dtype='object')
+    expected = df.sort_values(['user_id', 'timestamp'], ignore_index=True)
+    for column in expected:
+        assert decoded[column].astype(object).where(decoded[column].notna(), None).tolist() == \
+            expected[column].astype(object).where(expected[column].notna(), None).tolist()
+
+
+def test_concat_unions_dictionaries():
+    first = TouchpointStore.from_frame(touchpoints(['user_000005', 'user_000001'], ['a', 'b'],
+                                                   ['impression', 'click']))
+    second = TouchpointStore.from_frame(touchpoints(['user_000003', 'user_000005'], ['c', 'a'],
+                                                    ['click', 'click'], minutes=[5, 6]))
+    merged = TouchpointStore.concat([first, second]).to_frame(user_id_dtype='object')
+    assert merged['user_id'].tolist() == ['user_000001', 'user_000003', 'user_000005', 'user_000005']
+    assert merged['campaign_id'].astype(str).tolist() == ['b', 'c', 'a', 'a']
+
+
+def test_store_journeys_match_frame_journeys():
+    rng = np.random.default_rng(0)
+    n = 400
+    df = touchpoints([f'user_{u:06d}' for u in rng.integers(0, 60, n)], rng.choice(list('abcd'), n),
+                     rng.choice(['impression', 'click'], n, p=[0.8, 0.2]), minutes=rng.permutation(n))
+    models = ['first_touch', 'last_touch', 'linear', 'markov', 'shapley']
+    from_frame = attribute(build_journeys(df), models).set_index('campaign_id').sort_index()
+    from_store = attribute(TouchpointStore.from_frame(df).journeys(), models).set_index('campaign_id')
+    pd.testing.assert_frame_equal(from_store.sort_index(), from_frame, check_index_type=False, atol=1e-9)